@@ -0,0 +1,210 @@
+"""
+Материализованные права доступа пользователей
+
+Связи пользователь-чат и пользователь-группа шаблонов загружаются из базы
+двумя запросами и хранятся как frozenset в обе стороны (пользователь -> чаты,
+чат -> пользователи и т.д.). Выдача и отзыв доступа, удаление пользователя
+или чата обновляют структуру точечно из DatabaseManager, поэтому проверка
+прав - это проверка вхождения в множество без обращения к базе.
+
+У каждого пользователя есть версия прав, которая увеличивается при любом
+изменении его доступа: по ней зависимые кэши понимают, что данные устарели.
+"""
+
+import logging
+import threading
+
+from database import db
+from cache_registry import cache_registry
+
+logger = logging.getLogger(__name__)
+
+EMPTY = frozenset()
+
+
+class AccessControl:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._user_chats = {}
+        self._user_groups = {}
+        self._chat_users = {}
+        self._group_users = {}
+        self._user_versions = {}
+        # Поколение меняется при полной перезагрузке прав
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ===== ЗАГРУЗКА =====
+
+    def ensure_loaded(self):
+        """Загружает связи доступа из базы при первом обращении (при ошибке - исключение)"""
+        if self._loaded:
+            self.hits += 1
+            return
+        self.misses += 1
+        with self._lock:
+            if self._loaded:
+                return
+            links = db.load_access_links()
+            if links is None:
+                # Без связей все пользователи остались бы без доступа: структура
+                # остается незагруженной, следующее обращение повторит загрузку
+                raise RuntimeError("Не удалось загрузить связи доступа")
+            chat_links, group_links = links
+            self._user_chats, self._chat_users = _build_maps(chat_links)
+            self._user_groups, self._group_users = _build_maps(group_links)
+            self._loaded = True
+            logger.info(
+                f"✅ Права доступа загружены: {len(chat_links)} связей с чатами, "
+                f"{len(group_links)} связей с группами"
+            )
+
+    def reload(self):
+        """Сбрасывает структуру; права будут перечитаны при следующем обращении"""
+        with self._lock:
+            self._loaded = False
+            self._user_chats = {}
+            self._user_groups = {}
+            self._chat_users = {}
+            self._group_users = {}
+            self._generation += 1
+
+    # ===== ИЗМЕНЕНИЯ (вызываются из DatabaseManager после commit) =====
+    # grant_* приходят только для активных пользователей и чатов - как в load_access_links
+
+    def _bump(self, user_id):
+        self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+
+    def grant_chat(self, user_id, chat_id):
+        with self._lock:
+            if self._loaded:
+                _add_link(self._user_chats, user_id, chat_id)
+                _add_link(self._chat_users, chat_id, user_id)
+            self._bump(user_id)
+
+    def revoke_chat(self, user_id, chat_id):
+        with self._lock:
+            if self._loaded:
+                _remove_link(self._user_chats, user_id, chat_id)
+                _remove_link(self._chat_users, chat_id, user_id)
+            self._bump(user_id)
+
+    def grant_group(self, user_id, group_id):
+        with self._lock:
+            if self._loaded:
+                _add_link(self._user_groups, user_id, group_id)
+                _add_link(self._group_users, group_id, user_id)
+            self._bump(user_id)
+
+    def revoke_group(self, user_id, group_id):
+        with self._lock:
+            if self._loaded:
+                _remove_link(self._user_groups, user_id, group_id)
+                _remove_link(self._group_users, group_id, user_id)
+            self._bump(user_id)
+
+    def remove_user(self, user_id):
+        """Убирает все связи удаленного пользователя"""
+        with self._lock:
+            if self._loaded:
+                for chat_id in self._user_chats.pop(user_id, EMPTY):
+                    _remove_link(self._chat_users, chat_id, user_id)
+                for group_id in self._user_groups.pop(user_id, EMPTY):
+                    _remove_link(self._group_users, group_id, user_id)
+            self._bump(user_id)
+
+    def remove_chat(self, chat_id):
+        """Убирает все связи удаленного чата"""
+        with self._lock:
+            if not self._loaded:
+                self._generation += 1
+                return
+            for user_id in self._chat_users.pop(chat_id, EMPTY):
+                _remove_link(self._user_chats, user_id, chat_id)
+                self._bump(user_id)
+
+    # ===== ЧТЕНИЕ =====
+
+    def get_user_chats(self, user_id):
+        """frozenset ID чатов, к которым у пользователя есть доступ"""
+        self.ensure_loaded()
+        return self._user_chats.get(user_id, EMPTY)
+
+    def get_user_groups(self, user_id):
+        """frozenset ID групп шаблонов, к которым у пользователя есть доступ"""
+        self.ensure_loaded()
+        return self._user_groups.get(user_id, EMPTY)
+
+    def get_chat_users(self, chat_id):
+        """frozenset ID пользователей с доступом к чату"""
+        self.ensure_loaded()
+        return self._chat_users.get(chat_id, EMPTY)
+
+    def get_group_users(self, group_id):
+        """frozenset ID пользователей с доступом к группе шаблонов"""
+        self.ensure_loaded()
+        return self._group_users.get(group_id, EMPTY)
+
+    def can_access_chat(self, user_id, chat_id):
+        return chat_id in self.get_user_chats(user_id)
+
+    def can_access_group(self, user_id, group_id):
+        return group_id in self.get_user_groups(user_id)
+
+    def get_user_version(self, user_id):
+        """Версия прав пользователя (поколение, счетчик), меняется при каждом изменении его доступа"""
+        return self._generation, self._user_versions.get(user_id, 0)
+
+    def stats(self):
+        """Размеры структуры прав"""
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'size': len(self._user_chats) + len(self._user_groups),
+                'hits': self.hits,
+                'misses': self.misses,
+                'users_with_chats': len(self._user_chats),
+                'users_with_groups': len(self._user_groups),
+                'chats': len(self._chat_users),
+                'groups': len(self._group_users),
+                'chat_links': sum(len(chats) for chats in self._user_chats.values()),
+                'group_links': sum(len(groups) for groups in self._user_groups.values()),
+            }
+
+
+def _build_maps(links):
+    """Строит прямое и обратное отображение из пар (слева, справа)"""
+    forward = {}
+    reverse = {}
+    for left, right in links:
+        forward.setdefault(left, set()).add(right)
+        reverse.setdefault(right, set()).add(left)
+    return (
+        {key: frozenset(values) for key, values in forward.items()},
+        {key: frozenset(values) for key, values in reverse.items()},
+    )
+
+
+def _add_link(index, key, value):
+    index[key] = index.get(key, EMPTY) | {value}
+
+
+def _remove_link(index, key, value):
+    values = index.get(key, EMPTY) - {value}
+    if values:
+        index[key] = values
+    else:
+        index.pop(key, None)
+
+
+# Глобальный экземпляр прав доступа
+acl = AccessControl()
+
+cache_registry.register(
+    'acl',
+    acl.stats,
+    acl.reload,
+    lambda: (acl._user_chats, acl._user_groups, acl._chat_users, acl._group_users)
+)
@@ -1,15 +1,40 @@
 import json
 import os
+import threading
+import time
 from database import db
+from cache_utils import TTLCache
+from cache_registry import cache_registry
+
+# Размер и время жизни кэша ролей пользователей
+ROLE_CACHE_SIZE = int(os.environ.get('ROLE_CACHE_SIZE', 4096))
+ROLE_CACHE_TTL = int(os.environ.get('ROLE_CACHE_TTL', 300))
 
 class AuthManager:
     def __init__(self):
         self.superadmin_id = 812934047  # Ваш ID суперадминистратора
         self.roles = ['guest', 'user', 'admin', 'superadmin']
+        # Роли сбрасываются из DatabaseManager при любом изменении пользователя
+        self.role_cache = TTLCache(maxsize=ROLE_CACHE_SIZE, ttl=ROLE_CACHE_TTL)
+        # Версии ролей: сброс, пришедший во время чтения из базы, не дает
+        # положить в кэш прочитанную до него роль. Каждый сброс получает номер
+        # из общего счетчика; для пользователя хранится номер и время его
+        # последнего сброса, для полного сброса - номер в _role_flushed.
+        # Записи старше ROLE_CACHE_TTL удаляются: чтение, начатое так давно,
+        # в кэш уже не попадает
+        self._role_lock = threading.Lock()
+        self._role_seq = 0
+        self._role_flushed = 0
+        self._role_invalidated = {}
         print("🔐 AuthManager инициализирован")
 
     def get_user_role(self, user_id):
-        """Возвращает роль пользователя"""
+        """Возвращает роль пользователя (из кэша ролей, если она там есть)"""
+        role = self.role_cache.get(user_id, None)
+        if role is not None:
+            return role
+
+        token = self._begin_role_read()
         try:
             conn = db.get_connection()
             if not conn:
@@ -24,16 +49,59 @@ class AuthManager:
             conn.close()
             
             if result:
-                return result[0]
+                role = result[0]
             else:
                 # Если пользователь не найден, создаем запись гостя
                 self._create_user_record(user_id, 'Неизвестный', 'guest')
-                return 'guest'
+                role = 'guest'
+
+            self._cache_role(user_id, role, token)
+            return role
                 
         except Exception as e:
             print(f"❌ Ошибка получения роли пользователя {user_id}: {e}")
             return 'guest'
 
+    def invalidate_role(self, user_id=None):
+        """Сбрасывает закэшированную роль пользователя (без user_id - все роли)"""
+        with self._role_lock:
+            self._role_seq += 1
+            if user_id is None:
+                self._role_flushed = self._role_seq
+                self._role_invalidated = {}
+                self.role_cache.clear()
+                return
+
+            now = time.monotonic()
+            if len(self._role_invalidated) >= ROLE_CACHE_SIZE:
+                self._prune_role_versions(now)
+            self._role_invalidated[user_id] = (self._role_seq, now)
+            self.role_cache.invalidate(user_id)
+
+    def _prune_role_versions(self, now):
+        expired = now - ROLE_CACHE_TTL
+        self._role_invalidated = {
+            user_id: entry for user_id, entry in self._role_invalidated.items() if entry[1] > expired
+        }
+
+    def _begin_role_read(self):
+        """Отметка начала чтения роли из базы: (номер последнего сброса, время)"""
+        return self._role_seq, time.monotonic()
+
+    def _cache_role(self, user_id, role, token):
+        """Кладет роль в кэш, если с начала чтения ее не сбрасывали"""
+        seq, started_at = token
+        with self._role_lock:
+            if time.monotonic() - started_at >= ROLE_CACHE_TTL:
+                return False
+            if self._role_flushed > seq:
+                return False
+            entry = self._role_invalidated.get(user_id)
+            if entry is not None and entry[0] > seq:
+                return False
+            self.role_cache.set(user_id, role)
+            return True
+
     def _create_user_record(self, user_id, username, role='guest'):
         """Создает запись пользователя в базе данных"""
         try:
@@ -56,6 +124,7 @@ class AuthManager:
             conn.commit()
             cursor.close()
             conn.close()
+            self.invalidate_role(user_id)
             
             print(f"✅ Создана запись пользователя {user_id} с ролью {role}")
             return True
@@ -105,13 +174,14 @@ class AuthManager:
     def get_user_permissions(self, user_id):
         """Возвращает все разрешения пользователя"""
         role = self.get_user_role(user_id)
+        is_admin = role in ['admin', 'superadmin']
         
         permissions = {
             'role': role,
-            'manage_users': self.can_manage_users(user_id),
+            'manage_users': is_admin,
             'manage_templates': self.can_manage_templates(user_id),
             'manage_tasks': self.can_manage_tasks(user_id),
-            'access_admin_panel': self.can_access_admin_panel(user_id),
+            'access_admin_panel': is_admin,
             'is_superadmin': self.is_superadmin(user_id)
         }
         
@@ -254,7 +324,7 @@ class AuthManager:
                 'chat_access_count': chat_access,
                 'group_access_count': group_access,
                 'is_superadmin': self.is_superadmin(user_id),
-                'is_admin': self.is_admin(user_id)
+                'is_admin': role in ['admin', 'superadmin']
             }
             
             return stats
@@ -287,6 +357,13 @@ class AuthManager:
 # Глобальный экземпляр менеджера аутентификации
 auth_manager = AuthManager()
 
+cache_registry.register(
+    'roles',
+    auth_manager.role_cache.stats,
+    auth_manager.invalidate_role,
+    auth_manager.role_cache.snapshot
+)
+
 # Инициализация при импорте
 print("🔐 AuthManager загружен и готов к работе")
 auth_manager.initialize_superadmin()
\ No newline at end of file
@@ -4,38 +4,35 @@
 
 from database import db
 from auth_manager import auth_manager
+from acl_manager import acl
 
 def is_admin(user_id):
     """Проверяет, является ли пользователь администратором"""
     return auth_manager.is_admin(user_id)
 
 def get_user_access_groups(user_id):
-    """Возвращает список ID групп, к которым у пользователя есть доступ"""
+    """Возвращает frozenset ID групп, к которым у пользователя есть доступ"""
     try:
-        user_groups = db.get_user_template_group_access(user_id)
-        return [group['id'] for group in user_groups]
+        return acl.get_user_groups(user_id)
     except Exception as e:
         print(f"❌ Ошибка получения групп доступа пользователя {user_id}: {e}")
-        return []
+        return frozenset()
 
 def get_user_accessible_chats(user_id):
-    """Возвращает список чатов, к которым у пользователя есть доступ"""
+    """Возвращает frozenset ID чатов, к которым у пользователя есть доступ"""
     try:
-        user_chats = db.get_user_chat_access(user_id)
-        return [chat['chat_id'] for chat in user_chats]
+        return acl.get_user_chats(user_id)
     except Exception as e:
         print(f"❌ Ошибка получения чатов доступа пользователя {user_id}: {e}")
-        return []
+        return frozenset()
 
 def can_user_access_group(user_id, group_id):
     """Проверяет, есть ли у пользователя доступ к группе"""
-    accessible_groups = get_user_access_groups(user_id)
-    return group_id in accessible_groups
+    return group_id in get_user_access_groups(user_id)
 
 def can_user_access_chat(user_id, chat_id):
     """Проверяет, есть ли у пользователя доступ к чату"""
-    accessible_chats = get_user_accessible_chats(user_id)
-    return chat_id in accessible_chats
+    return chat_id in get_user_accessible_chats(user_id)
 
 def get_all_authorized_users():
     """Возвращает всех авторизованных пользователей"""
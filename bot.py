@@ -98,26 +98,12 @@ async def run_bot():
     try:
         logger.info("Initializing bot...")
         
-        # Инициализация сервисов
-        from database import db
-        db.init_database()
-        logger.info("Database initialized")
-        
-        # Обновление структуры БД
-        try:
-            from database_updater import update_database_structure
-            update_database_structure()
-            logger.info("Database structure updated")
-        except Exception as e:
-            logger.error(f"Database update error: {e}")
-        
-        # Миграция структуры БД для шаблонов
-        try:
-            from database_migration import migrate_templates_table
-            migrate_templates_table()
-            logger.info("Database migration completed")
-        except Exception as e:
-            logger.error(f"Database migration error: {e}")
+        # Инициализация схемы БД (для актуальной базы - один запрос)
+        from schema_migrations import run_migrations
+        if run_migrations():
+            logger.info("Database schema is up to date")
+        else:
+            logger.error("Database migrations failed")
         
         # Инициализация файлов
         try:
@@ -160,7 +146,7 @@ async def run_bot():
         
         from telegram.ext import CommandHandler, MessageHandler, filters
         from handlers.start_handlers import start, help_command, my_id, now, update_menu
-        from handlers.admin_handlers import admin_stats, check_access
+        from handlers.admin_handlers import admin_stats, cache_stats, check_access, db_indexes, db_queries
         from handlers.basic_handlers import handle_text, cancel
         from handlers.template_handlers import get_template_conversation_handler
         from handlers.enhanced_task_handlers import get_enhanced_task_conversation_handler
@@ -180,6 +166,9 @@ async def run_bot():
         application.add_handler(CommandHandler("update_menu", update_menu))
         application.add_handler(CommandHandler("admin_stats", admin_stats))
         application.add_handler(CommandHandler("check_access", check_access))
+        application.add_handler(CommandHandler("db_indexes", db_indexes))
+        application.add_handler(CommandHandler("db_queries", db_queries))
+        application.add_handler(CommandHandler("cache_stats", cache_stats))
         application.add_handler(CommandHandler("cancel", cancel))
         
         # Отладочные команды
@@ -197,6 +186,18 @@ async def run_bot():
         start_scheduler()
         logger.info("Scheduler started")
         
+        # Слушатель инвалидации кэшей от других экземпляров бота
+        from cache_bus import cache_bus
+        cache_bus.start()
+        
+        # Очередь исходящих сообщений с лимитами Telegram
+        from send_queue import send_queue
+        send_queue.start()
+        
+        # Фоновая пакетная запись отметок выполнения задач
+        from task_bookkeeping import task_bookkeeper
+        task_bookkeeper.start()
+        
         logger.info("Bot is ready and running!")
         
         # ЯВНОЕ УПРАВЛЕНИЕ APPLICATION - чтобы все корутины были properly awaited
@@ -218,6 +219,24 @@ async def run_bot():
         raise
     finally:
         # КОРРЕКТНАЯ ОСТАНОВКА - все корутины properly awaited
+        try:
+            from send_queue import send_queue
+            await send_queue.stop()
+        except Exception as e:
+            logger.error(f"Error stopping send queue: {e}")
+        
+        try:
+            from task_bookkeeping import task_bookkeeper
+            await task_bookkeeper.stop()
+        except Exception as e:
+            logger.error(f"Error stopping task bookkeeper: {e}")
+        
+        try:
+            from cache_bus import cache_bus
+            await cache_bus.stop()
+        except Exception as e:
+            logger.error(f"Error stopping cache bus: {e}")
+        
         if application:
             try:
                 await application.updater.stop()
@@ -226,6 +245,14 @@ async def run_bot():
                 logger.info("Bot stopped correctly")
             except Exception as e:
                 logger.error(f"Error stopping bot: {e}")
+        
+        try:
+            from database import db
+            from database_async import async_db
+            async_db.shutdown()
+            db.close_pool()
+        except Exception as e:
+            logger.error(f"Error closing database pool: {e}")
 
 def start_bot():
     """Запускает бота в отдельном event loop"""
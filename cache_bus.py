@@ -0,0 +1,243 @@
+"""
+Шина инвалидации кэшей между экземплярами бота (PostgreSQL LISTEN/NOTIFY)
+
+Методы записи DatabaseManager в той же транзакции публикуют короткое событие
+об изменении (pg_notify доставляется только после commit). Каждый экземпляр
+бота слушает канал на отдельном соединении в event loop и применяет чужие
+события к своим кэшам: репозиторию задач, кэшу шаблонов, ролям, правам
+доступа и file_id изображений. Собственные события пропускаются - локальные
+кэши уже обновлены.
+
+Если соединение слушателя оборвалось, события за время разрыва потеряны,
+поэтому после переподключения все кэши сбрасываются целиком.
+
+События применяются строго по одному в порядке получения: их ставит в очередь
+обработчик соединения, а разбирает единственный обработчик очереди.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+# Канал уведомлений
+CACHE_BUS_CHANNEL = 'bot_cache'
+
+# Пауза перед переподключением слушателя, секунды
+CACHE_BUS_RECONNECT_DELAY = float(os.environ.get('CACHE_BUS_RECONNECT_DELAY', 5))
+
+# Идентификатор этого экземпляра бота, чтобы не применять свои события повторно
+INSTANCE_ID = uuid.uuid4().hex[:12]
+
+# Методы ACL, которые можно вызвать событием 'acl' (публикует DatabaseManager)
+ACL_EVENT_OPS = frozenset({
+    'grant_chat', 'revoke_chat', 'grant_group', 'revoke_group', 'remove_user', 'remove_chat',
+})
+
+
+def publish(cursor, event, *args):
+    """Публикует событие в текущей транзакции; доставляется после commit"""
+    payload = json.dumps({'s': INSTANCE_ID, 'e': event, 'a': list(args)}, default=str)
+    cursor.execute('SELECT pg_notify(%s, %s)', (CACHE_BUS_CHANNEL, payload))
+
+
+def apply_event(event, args):
+    """Применяет событие другого экземпляра к локальным кэшам"""
+    if event == 'task':
+        # Пакетные записи публикуют одно событие с несколькими ID
+        from task_repository import task_repository
+        for task_id in args:
+            task_repository.refresh(task_id)
+    elif event == 'tasks':
+        from task_repository import task_repository
+        task_repository.reload()
+    elif event == 'template':
+        from template_cache import template_cache
+        template_cache.invalidate(args[0])
+    elif event == 'templates':
+        from template_cache import template_cache
+        template_cache.invalidate()
+    elif event == 'telegram_file':
+        from telegram_file_cache import telegram_file_cache
+        telegram_file_cache.forget(args[0])
+    elif event == 'role':
+        from auth_manager import auth_manager
+        auth_manager.invalidate_role(args[0])
+    elif event == 'acl':
+        if not args or args[0] not in ACL_EVENT_OPS:
+            logger.warning(f"⚠️ Недопустимая операция ACL в шине кэшей: {args[:1]}")
+            return
+        from acl_manager import acl
+        getattr(acl, args[0])(*args[1:])
+    else:
+        logger.warning(f"⚠️ Неизвестное событие шины кэшей: {event}")
+
+
+def reset_all_caches():
+    """Сбрасывает все локальные кэши (после потери событий)"""
+    from task_repository import task_repository
+    from template_cache import template_cache
+    from auth_manager import auth_manager
+    from acl_manager import acl
+    from keyboards.keyboard_cache import clear_keyboard_cache
+    from telegram_file_cache import telegram_file_cache
+
+    task_repository.reload()
+    template_cache.invalidate()
+    auth_manager.invalidate_role()
+    acl.reload()
+    clear_keyboard_cache()
+    telegram_file_cache.reload()
+
+
+class CacheBusListener:
+    def __init__(self):
+        self._task = None
+        self._consumer = None
+        self._queue = None
+        self.received = 0
+        self.applied = 0
+        self.reconnects = 0
+
+    def start(self):
+        """Запускает слушателя в текущем event loop"""
+        if self._task is None or self._task.done():
+            loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+            self._consumer = loop.create_task(self._consume())
+            self._task = loop.create_task(self._run())
+            logger.info(f"✅ Шина кэшей запущена (экземпляр {INSTANCE_ID})")
+
+    async def stop(self):
+        """Останавливает слушателя"""
+        if self._task is not None:
+            for task in (self._task, self._consumer):
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            self._task = None
+            self._consumer = None
+            self._queue = None
+            logger.info("✅ Шина кэшей остановлена")
+
+    def _connect(self):
+        from database import db
+
+        conn = psycopg2.connect(
+            db.connection_string,
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=3
+        )
+        conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        cursor.execute(f'LISTEN {CACHE_BUS_CHANNEL}')
+        cursor.close()
+        return conn
+
+    async def _run(self):
+        from database_async import async_db
+
+        loop = asyncio.get_running_loop()
+        connected_before = False
+
+        while True:
+            conn = None
+            try:
+                conn = await async_db.run(self._connect)
+                if connected_before:
+                    # Пока слушатель был отключен, события могли потеряться;
+                    # сброс идет через ту же очередь, после ранее полученных событий
+                    self.reconnects += 1
+                    self._queue.put_nowait(None)
+                    logger.info("🔄 Шина кэшей переподключена, локальные кэши будут сброшены")
+                connected_before = True
+
+                failed = loop.create_future()
+                loop.add_reader(conn.fileno(), self._on_readable, conn, failed)
+                try:
+                    await failed
+                finally:
+                    loop.remove_reader(conn.fileno())
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка слушателя шины кэшей: {e}")
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+            await asyncio.sleep(CACHE_BUS_RECONNECT_DELAY)
+
+    def _on_readable(self, conn, failed):
+        try:
+            conn.poll()
+            while conn.notifies:
+                self._dispatch(conn.notifies.pop(0).payload)
+        except Exception as e:
+            if not failed.done():
+                failed.set_exception(e)
+
+    def _dispatch(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"⚠️ Некорректное событие шины кэшей: {payload[:200]}")
+            return
+
+        self.received += 1
+        if message.get('s') == INSTANCE_ID:
+            return
+
+        self._queue.put_nowait((message.get('e'), message.get('a', [])))
+
+    async def _consume(self):
+        """
+        Применяет события из очереди по одному: следующее событие не начнет
+        применяться, пока не завершилось предыдущее
+        """
+        from database_async import async_db
+
+        while True:
+            item = await self._queue.get()
+            try:
+                # Применение может читать базу (задачи), поэтому выполняется в пуле потоков
+                if item is None:
+                    await async_db.run(reset_all_caches)
+                else:
+                    await async_db.run(apply_event, *item)
+                    self.applied += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка применения события шины кэшей: {e}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        """Счетчики слушателя"""
+        return {
+            'instance': INSTANCE_ID,
+            'running': self._task is not None and not self._task.done(),
+            'received': self.received,
+            'applied': self.applied,
+            'queued': self._queue.qsize() if self._queue else 0,
+            'reconnects': self.reconnects,
+        }
+
+
+# Глобальный экземпляр слушателя шины кэшей
+cache_bus = CacheBusListener()
@@ -0,0 +1,104 @@
+"""
+Реестр кэшей процесса
+
+Каждый кэш регистрируется здесь под коротким именем вместе с функцией
+статистики, функцией сброса и объектом, по которому оценивается занимаемая
+память. Реестр используется командой /cache_stats: она показывает размер,
+попадания, промахи и вытеснения всех кэшей и позволяет сбросить любой из них.
+"""
+
+import logging
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Ограничение обхода при оценке памяти, чтобы отчет не тормозил на больших кэшах
+MEMORY_ESTIMATE_MAX_OBJECTS = 200000
+
+
+def estimate_memory(root):
+    """Приблизительный размер объекта в байтах (sys.getsizeof по всему графу)"""
+    seen = set()
+    stack = [root]
+    total = 0
+
+    while stack and len(seen) < MEMORY_ESTIMATE_MAX_OBJECTS:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        try:
+            total += sys.getsizeof(obj)
+        except TypeError:
+            continue
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+            stack.append(obj.__dict__)
+
+    return total
+
+
+class CacheRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._caches = {}
+
+    def register(self, name, stats, flush, memory_root=None):
+        """
+        Регистрирует кэш: stats() возвращает словарь статистики, flush()
+        сбрасывает кэш, memory_root() возвращает объект для оценки памяти
+        """
+        with self._lock:
+            self._caches[name] = {
+                'stats': stats,
+                'flush': flush,
+                'memory_root': memory_root,
+            }
+
+    def names(self):
+        """Имена зарегистрированных кэшей"""
+        with self._lock:
+            return sorted(self._caches)
+
+    def report(self, with_memory=True):
+        """Статистика всех кэшей: {имя: словарь статистики}"""
+        with self._lock:
+            caches = dict(self._caches)
+
+        report = {}
+        for name in sorted(caches):
+            cache = caches[name]
+            try:
+                stats = dict(cache['stats']())
+                if with_memory and cache['memory_root'] is not None:
+                    stats['memory_bytes'] = estimate_memory(cache['memory_root']())
+            except Exception as e:
+                stats = {'error': str(e)}
+            report[name] = stats
+        return report
+
+    def flush(self, name=None):
+        """Сбрасывает кэш по имени или все кэши; возвращает имена сброшенных"""
+        with self._lock:
+            if name is None:
+                targets = dict(self._caches)
+            elif name in self._caches:
+                targets = {name: self._caches[name]}
+            else:
+                return []
+
+        for cache_name, cache in targets.items():
+            cache['flush']()
+            logger.info(f"🧹 Кэш {cache_name} сброшен")
+        return sorted(targets)
+
+
+# Глобальный реестр кэшей
+cache_registry = CacheRegistry()
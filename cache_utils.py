@@ -0,0 +1,79 @@
+"""
+Общие утилиты кэширования
+
+TTLCache - потокобезопасный LRU-кэш ограниченного размера, в котором каждая
+запись живет не дольше ttl секунд. Используется для небольших горячих данных
+(роли пользователей и т.п.), которые меняются редко, а читаются на каждом
+сообщении.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Маркер отсутствия значения (None может быть допустимым значением)
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=MISSING):
+        """Возвращает значение по ключу или default, если его нет или оно устарело"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Кладет значение в кэш, вытесняя самые давно использованные записи"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Удаляет запись по ключу"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Удаляет все записи"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Размер кэша и счетчики попаданий"""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def snapshot(self):
+        """Копия содержимого (для оценки занимаемой памяти)"""
+        with self._lock:
+            return dict(self._data)
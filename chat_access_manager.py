@@ -3,7 +3,8 @@
 """
 
 import logging
-from user_chat_manager import user_chat_manager
+from database_async import async_db
+from acl_manager import acl
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +27,7 @@ class ChatAccessManager:
         """Возвращает чаты, к которым у пользователя есть доступ"""
         try:
             # Получаем чаты, к которым у пользователя есть доступ в системе
-            accessible_chats = user_chat_manager.get_user_chat_access(user_id)
+            accessible_chats = await async_db.get_user_chat_access(user_id)
             
             if not accessible_chats:
                 return []
@@ -43,12 +44,7 @@ class ChatAccessManager:
         """Проверяет, может ли пользователь отправлять сообщения в указанный чат"""
         try:
             # Проверяем доступ в системе
-            has_system_access = any(
-                chat['chat_id'] == chat_id 
-                for chat in user_chat_manager.get_user_chat_access(user_id)
-            )
-            
-            if not has_system_access:
+            if not acl.can_access_chat(user_id, chat_id):
                 return False
             
             # Временно возвращаем True
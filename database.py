@@ -1,174 +1,415 @@
 import os
 import psycopg2
+from psycopg2.extras import execute_values
 import json
+import threading
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
 import logging
 
+from database_pool import ConnectionPool, PooledConnection
+from database_stats import InstrumentedCursor, query_stats
+from cache_bus import publish
+
+# Размеры пула соединений (можно переопределить переменными окружения)
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+
+# Сколько строк серверный курсор передает за одно обращение в iter_* методах
+DB_ITERSIZE = int(os.environ.get('DB_ITERSIZE', 1000))
+
+# Явные списки колонок: порядок совпадает с разбором строк в _row_to_template/_row_to_task
+TEMPLATE_COLUMNS = 'id, name, group_name, text, image_path, created_by, created_at'
+TASK_COLUMNS = (
+    'id, template_id, template_name, template_text, template_image, group_name, '
+    'created_by, created_at, is_active, is_test, last_executed, next_execution, '
+    'target_chat_id, schedule_type, times, week_days, month_days, frequency, misfire_policy'
+)
+GROUP_COLUMNS = 'id, name, allowed_users'
+
+# Колонки задач, которые можно обновлять точечно через update_task_fields
+TASK_UPDATABLE_FIELDS = {
+    'template_id', 'template_name', 'template_text', 'template_image', 'group_name',
+    'created_by', 'is_active', 'is_test', 'last_executed', 'next_execution',
+    'target_chat_id', 'schedule_type', 'times', 'week_days', 'month_days', 'frequency',
+    'misfire_policy'
+}
+TASK_JSONB_FIELDS = {'times', 'week_days', 'month_days'}
+
+# Управляемые вторичные индексы: (имя, таблица, определение).
+# Поиск доступов по user_id обслуживают UNIQUE(user_id, ...) в таблицах доступа,
+# поэтому здесь только обратные направления (по chat_id и group_id).
+# Индексы создаются миграциями (schema_migrations.py): новый индекс добавляется
+# сюда и в новую миграцию.
+INDEXES = [
+    # Планировщик: ближайшие активные не тестовые задачи
+    ('idx_tasks_due', 'tasks',
+     'ON tasks (next_execution) WHERE is_active AND NOT is_test'),
+    # Активные задачи группы
+    ('idx_tasks_active_group', 'tasks',
+     'ON tasks (group_name) WHERE is_active'),
+    # Задачи, отправляющие в конкретный чат
+    ('idx_tasks_target_chat', 'tasks',
+     'ON tasks (target_chat_id)'),
+    # Шаблоны группы в порядке создания
+    ('idx_templates_group_created', 'templates',
+     'ON templates (group_name, created_at DESC)'),
+    # Поиск шаблона по имени внутри группы
+    ('idx_templates_group_name', 'templates',
+     'ON templates (group_name, name)'),
+    # Пользователи с доступом к чату
+    ('idx_user_chat_access_chat', 'user_chat_access',
+     'ON user_chat_access (chat_id)'),
+    # Пользователи с доступом к группе шаблонов
+    ('idx_user_template_group_access_group', 'user_template_group_access',
+     'ON user_template_group_access (group_id)'),
+]
+
+# Таблица с таким числом строк и преобладанием последовательных сканирований
+# попадает в отчет как кандидат на новый индекс
+INDEX_REPORT_MIN_ROWS = 1000
+
+
+def _format_timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+def _row_to_template(row):
+    """Преобразует строку таблицы templates в словарь шаблона"""
+    return {
+        'id': row[0],
+        'name': row[1],
+        'group': row[2],
+        'text': row[3],
+        'image': row[4],
+        'created_by': row[5],
+        'created_at': _format_timestamp(row[6])
+    }
+
+
+def _row_to_group(row):
+    """Преобразует строку таблицы template_groups в (ID, словарь группы)"""
+    allowed_users = row[2] or []
+    if isinstance(allowed_users, (str, bytes, bytearray)):
+        try:
+            allowed_users = json.loads(allowed_users)
+        except ValueError:
+            allowed_users = []
+    return row[0], {
+        'name': row[1],
+        'allowed_users': allowed_users
+    }
+
+
+def _row_to_task(row):
+    """Преобразует строку таблицы tasks в объект TaskData"""
+    from task_models import TaskData
+
+    return TaskData.from_dict({
+        'id': row[0],
+        'template_id': row[1],
+        'template_name': row[2],
+        'template_text': row[3],
+        'template_image': row[4],
+        'group_name': row[5],
+        'created_by': row[6],
+        'created_at': _format_timestamp(row[7]),
+        'is_active': row[8],
+        'is_test': row[9],
+        'last_executed': _format_timestamp(row[10]),
+        'next_execution': _format_timestamp(row[11]),
+        'target_chat_id': row[12],
+        'schedule_type': row[13],
+        'times': row[14],
+        'week_days': row[15],
+        'month_days': row[16],
+        'frequency': row[17],
+        'misfire_policy': row[18]
+    })
+
+# Upsert-запросы для psycopg2.extras.execute_values: одна строка VALUES на запись
+TEMPLATE_UPSERT_SQL = '''
+    INSERT INTO templates (id, name, group_name, text, image_path, created_by)
+    VALUES %s
+    ON CONFLICT (id) DO UPDATE SET
+        name = EXCLUDED.name,
+        group_name = EXCLUDED.group_name,
+        text = EXCLUDED.text,
+        image_path = EXCLUDED.image_path,
+        created_by = EXCLUDED.created_by
+    RETURNING id
+'''
+
+TASK_UPSERT_SQL = f'''
+    INSERT INTO tasks (id, template_id, template_name, template_text, template_image,
+                       group_name, created_by, is_active, is_test, last_executed,
+                       next_execution, target_chat_id, schedule_type, times, week_days,
+                       month_days, frequency, misfire_policy)
+    VALUES %s
+    ON CONFLICT (id) DO UPDATE SET
+        template_id = EXCLUDED.template_id,
+        template_name = EXCLUDED.template_name,
+        template_text = EXCLUDED.template_text,
+        template_image = EXCLUDED.template_image,
+        group_name = EXCLUDED.group_name,
+        created_by = EXCLUDED.created_by,
+        is_active = EXCLUDED.is_active,
+        is_test = EXCLUDED.is_test,
+        last_executed = EXCLUDED.last_executed,
+        next_execution = EXCLUDED.next_execution,
+        target_chat_id = EXCLUDED.target_chat_id,
+        schedule_type = EXCLUDED.schedule_type,
+        times = EXCLUDED.times,
+        week_days = EXCLUDED.week_days,
+        month_days = EXCLUDED.month_days,
+        frequency = EXCLUDED.frequency,
+        misfire_policy = EXCLUDED.misfire_policy
+    RETURNING {TASK_COLUMNS}
+'''
+
+# Сколько строк отправлять в одном INSERT при пакетном сохранении
+UPSERT_PAGE_SIZE = 500
+
+# Пакетная отметка выполнения задач: одна строка VALUES на задачу.
+# NULL в last_executed/is_active оставляет текущее значение,
+# update_next = FALSE оставляет next_execution без изменений
+TASK_EXECUTION_UPDATE_SQL = '''
+    UPDATE tasks SET
+        last_executed = COALESCE(v.last_executed, tasks.last_executed),
+        next_execution = CASE WHEN v.update_next THEN v.next_execution ELSE tasks.next_execution END,
+        is_active = COALESCE(v.is_active, tasks.is_active)
+    FROM (VALUES %s) AS v(id, last_executed, next_execution, update_next, is_active)
+    WHERE tasks.id = v.id
+    RETURNING tasks.id
+'''
+TASK_EXECUTION_UPDATE_TEMPLATE = '(%s, %s::timestamp, %s::timestamp, %s::boolean, %s::boolean)'
+
+# Сколько ID задач помещать в одно событие шины кэшей (payload NOTIFY до 8000 байт)
+NOTIFY_IDS_PER_EVENT = 200
+
+
+def _template_values(template_data):
+    """Значения шаблона в порядке колонок TEMPLATE_UPSERT_SQL"""
+    return (
+        template_data.get('id'),
+        template_data.get('name', ''),
+        template_data.get('group', ''),
+        template_data.get('text', ''),
+        template_data.get('image'),
+        template_data.get('created_by')
+    )
+
+
+def _task_values(task_data):
+    """Значения задачи (TaskData или словарь) в порядке колонок TASK_UPSERT_SQL"""
+    from task_models import TaskData
+
+    data_dict = task_data.to_dict() if isinstance(task_data, TaskData) else task_data
+    return (
+        data_dict.get('id'),
+        data_dict.get('template_id'),
+        data_dict.get('template_name', ''),
+        data_dict.get('template_text', ''),
+        data_dict.get('template_image'),
+        data_dict.get('group_name', ''),
+        data_dict.get('created_by'),
+        data_dict.get('is_active', True),
+        data_dict.get('is_test', False),
+        data_dict.get('last_executed'),
+        data_dict.get('next_execution'),
+        data_dict.get('target_chat_id'),
+        data_dict.get('schedule_type'),
+        data_dict.get('times', '[]'),
+        data_dict.get('week_days', '[]'),
+        data_dict.get('month_days', '[]'),
+        data_dict.get('frequency', 'weekly'),
+        data_dict.get('misfire_policy') or 'once'
+    )
+
+
+def _task_filters(active=None, group_name=None, user_id=None):
+    """Собирает WHERE для выборки задач по активности, группе и доступу пользователя"""
+    conditions = []
+    params = []
+    if active is not None:
+        conditions.append('is_active = %s')
+        params.append(active)
+    if group_name is not None:
+        conditions.append('group_name = %s')
+        params.append(group_name)
+    if user_id is not None:
+        # Только группы, к которым пользователю выдан доступ
+        conditions.append(
+            'EXISTS (SELECT 1 FROM user_template_group_access a '
+            'WHERE a.user_id = %s AND a.group_id = tasks.group_name)'
+        )
+        params.append(user_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where, params
+
+
+def _invalidate_templates(template_ids=None):
+    """Сообщает кэшу шаблонов об изменении (без ID - сброс всего кэша)"""
+    from template_cache import template_cache
+
+    if template_ids is None:
+        template_cache.invalidate()
+    else:
+        for template_id in template_ids:
+            template_cache.invalidate(template_id)
+
+
+def _invalidate_user_role(user_id):
+    """Сбрасывает закэшированную роль пользователя в AuthManager"""
+    from auth_manager import auth_manager
+
+    auth_manager.invalidate_role(user_id)
+
+
+def _update_acl(action, *args):
+    """Передает изменение прав доступа в материализованный ACL"""
+    from acl_manager import acl
+
+    getattr(acl, action)(*args)
+
+
+def _dedupe_by_id(rows):
+    """Оставляет последнюю строку для каждого id: ON CONFLICT не обновляет строку дважды за запрос"""
+    return list({row[0]: row for row in rows}.values())
+
+
 class DatabaseManager:
     def __init__(self):
         self.connection_string = os.environ.get('DATABASE_URL')
         if not self.connection_string:
             logging.error("❌ DATABASE_URL не найден в переменных окружения")
             print("❌ DATABASE_URL не найден в переменных окружения")
+        self._pool = None
+        self._pool_lock = threading.Lock()
+    
+    def _get_pool(self):
+        """Возвращает пул соединений, создавая его при первом обращении"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self.connection_string,
+                        minconn=DB_POOL_MIN,
+                        maxconn=DB_POOL_MAX,
+                        cursor_factory=InstrumentedCursor
+                    )
+        return self._pool
     
     def get_connection(self):
-        """Возвращает соединение с базой данных"""
+        """Возвращает соединение из пула (close() возвращает его обратно в пул)"""
         try:
-            conn = psycopg2.connect(self.connection_string)
-            return conn
+            pool = self._get_pool()
+            return PooledConnection(pool, pool.acquire())
         except Exception as e:
             logging.error(f"❌ Ошибка подключения к базе данных: {e}")
             print(f"❌ Ошибка подключения к базе данных: {e}")
             return None
     
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер соединения из пула: коммит при успехе, откат при ошибке"""
+        with self._get_pool().connection() as conn:
+            yield conn
+    
+    def get_pool_stats(self):
+        """Возвращает статистику пула соединений"""
+        if self._pool is None:
+            return {}
+        return self._pool.stats()
+    
+    def get_query_stats(self, limit=None):
+        """Возвращает статистику запросов: общие показатели и агрегаты по запросам"""
+        return {
+            'summary': query_stats.summary(),
+            'queries': query_stats.snapshot(limit)
+        }
+    
+    def reset_query_stats(self):
+        """Сбрасывает статистику запросов"""
+        query_stats.reset()
+    
+    def close_pool(self):
+        """Закрывает все соединения пула"""
+        if self._pool is not None:
+            self._pool.close_all()
+            self._pool = None
+    
     def init_database(self):
-        """Инициализирует все таблицы в базе данных"""
-        print("🔄 Инициализация базы данных...")
-        
+        """Создает и обновляет схему базы данных через версионные миграции"""
+        from schema_migrations import run_migrations
+        return run_migrations()
+
+    # ===== ИНДЕКСЫ =====
+
+    def get_index_report(self):
+        """
+        Отчет по индексам: отсутствующие управляемые индексы, индексы без
+        сканирований и таблицы, которые читаются в основном последовательно
+        """
         conn = self.get_connection()
         if not conn:
-            print("❌ Не удалось подключиться к базе данных для инициализации")
-            return False
-        
+            return {}
+            
         try:
             cursor = conn.cursor()
             
-            # ==== ТАБЛИЦА ШАБЛОНОВ (УПРОЩЕННАЯ) ====
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS templates (
-                    id VARCHAR(20) PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    group_name TEXT NOT NULL,
-                    text TEXT,
-                    image_path TEXT,
-                    created_by BIGINT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            print("✅ Таблица 'templates' создана/проверена")
-            
-            # ===== ТАБЛИЦА ГРУПП ШАБЛОНОВ =====
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS template_groups (
-                    id VARCHAR(50) PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    allowed_users JSONB DEFAULT '[]'::jsonb
-                )
-            ''')
-            print("✅ Таблица 'template_groups' создана/проверена")
-            
-            # ===== ТАБЛИЦА ПОЛЬЗОВАТЕЛЕЙ =====
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY,
-                    username TEXT,
-                    full_name TEXT NOT NULL,
-                    role TEXT DEFAULT 'guest',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE
-                )
-            ''')
-            print("✅ Таблица 'users' создана/проверена")
-            
-            # ===== ТАБЛИЦА TELEGRAM ЧАТОВ =====
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS telegram_chats (
-                    chat_id BIGINT PRIMARY KEY,
-                    chat_name TEXT NOT NULL,
-                    original_name TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE
-                )
-            ''')
-            print("✅ Таблица 'telegram_chats' создана/проверена")
-            
-            # ===== ТАБЛИЦА СВЯЗИ ПОЛЬЗОВАТЕЛЕЙ И TELEGRAM ЧАТОВ =====
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_chat_access (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
-                    chat_id BIGINT REFERENCES telegram_chats(chat_id) ON DELETE CASCADE,
-                    granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, chat_id)
-                )
-            ''')
-            print("✅ Таблица 'user_chat_access' создана/проверена")
-            
-            # ===== ТАБЛИЦА СВЯЗИ ПОЛЬЗОВАТЕЛЕЙ И ГРУПП ШАБЛОНОВ =====
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_template_group_access (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
-                    group_id VARCHAR(50) REFERENCES template_groups(id) ON DELETE CASCADE,
-                    granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, group_id)
-                )
-            ''')
-            print("✅ Таблица 'user_template_group_access' создана/проверена")
-            
-            # ===== ТАБЛИЦА ЗАДАЧ (ОБНОВЛЕННАЯ) =====
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id VARCHAR(20) PRIMARY KEY,
-                    template_id VARCHAR(20),
-                    template_name TEXT NOT NULL,
-                    template_text TEXT,
-                    template_image TEXT,
-                    group_name TEXT NOT NULL,
-                    created_by BIGINT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    is_test BOOLEAN DEFAULT FALSE,
-                    last_executed TIMESTAMP,
-                    next_execution TIMESTAMP,
-                    target_chat_id BIGINT,
-                    -- Новые поля для расписания
-                    schedule_type TEXT CHECK (schedule_type IN ('week_days', 'month_days')),
-                    times JSONB DEFAULT '[]'::jsonb,
-                    week_days JSONB DEFAULT '[]'::jsonb,
-                    month_days JSONB DEFAULT '[]'::jsonb,
-                    frequency TEXT DEFAULT 'weekly' CHECK (frequency IN ('weekly', 'biweekly', 'monthly'))
-                )
-            ''')
-            print("✅ Таблица 'tasks' создана/проверена")
-            
-            # ===== ДАННЫЕ ПО УМОЛЧАНИЮ =====
-            
-            # Группы шаблонов по умолчанию
             cursor.execute('''
-                INSERT INTO template_groups (id, name, allowed_users) 
-                VALUES 
-                ('hongqi', '🚗 Hongqi', '[]'::jsonb),
-                ('turbomatiz', '🚙 TurboMatiz', '[]'::jsonb)
-                ON CONFLICT (id) DO NOTHING
+                SELECT s.relname, s.indexrelname, s.idx_scan,
+                       pg_relation_size(s.indexrelid), i.indisunique
+                FROM pg_stat_user_indexes s
+                JOIN pg_index i ON i.indexrelid = s.indexrelid
+                ORDER BY s.relname, s.indexrelname
             ''')
-            print("✅ Группы шаблонов по умолчанию добавлены")
+            indexes = [
+                {
+                    'table': row[0],
+                    'name': row[1],
+                    'scans': row[2],
+                    'size_bytes': row[3],
+                    'unique': row[4]
+                }
+                for row in cursor.fetchall()
+            ]
             
-            # Администратор по умолчанию
             cursor.execute('''
-                INSERT INTO users (user_id, username, full_name, role) 
-                VALUES (812934047, 'admin', 'Administrator', 'admin')
-                ON CONFLICT (user_id) DO NOTHING
+                SELECT relname, seq_scan, COALESCE(idx_scan, 0), n_live_tup
+                FROM pg_stat_user_tables
+                ORDER BY relname
             ''')
-            print("✅ Администратор по умолчанию добавлен")
+            tables = cursor.fetchall()
             
-            conn.commit()
             cursor.close()
             conn.close()
             
-            print("✅ База данных полностью инициализирована")
-            return True
+            existing = {index['name'] for index in indexes}
+            return {
+                'indexes': indexes,
+                # Объявлены в INDEXES, но отсутствуют в базе
+                'missing': [name for name, table, definition in INDEXES if name not in existing],
+                # Ни одного сканирования с момента сброса статистики; уникальные
+                # индексы и первичные ключи нужны для ограничений, поэтому не учитываются
+                'unused': [index for index in indexes if index['scans'] == 0 and not index['unique']],
+                # Большие таблицы, где последовательных сканирований больше, чем индексных
+                'seq_scan_tables': [
+                    {'table': name, 'seq_scan': seq_scan, 'idx_scan': idx_scan, 'rows': rows}
+                    for name, seq_scan, idx_scan, rows in tables
+                    if rows >= INDEX_REPORT_MIN_ROWS and seq_scan > idx_scan
+                ]
+            }
             
         except Exception as e:
-            print(f"❌ Ошибка инициализации базы данных: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"❌ Ошибка получения отчета по индексам: {e}")
             try:
-                conn.rollback()
                 conn.close()
             except:
                 pass
-            return False
+            return {}
 
     # ... остальные методы остаются без изменений до методов для задач
     
@@ -186,53 +427,20 @@ class DatabaseManager:
         try:
             cursor = conn.cursor()
             
-            # Подготавливаем данные (упрощенные)
-            template_id = template_data.get('id')
-            name = template_data.get('name', '')
-            group_name = template_data.get('group', '')
-            text = template_data.get('text', '')
-            image_path = template_data.get('image')
-            created_by = template_data.get('created_by')
-            
-            print(f"📊 Данные для сохранения шаблона:")
-            print(f"   ID: {template_id}")
-            print(f"   Name: {name}")
-            print(f"   Group: {group_name}")
-            print(f"   Text: {text[:50]}...")
-            print(f"   Created_by: {created_by}")
-            
-            cursor.execute('''
-                INSERT INTO templates (id, name, group_name, text, image_path, created_by)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    name = EXCLUDED.name,
-                    group_name = EXCLUDED.group_name,
-                    text = EXCLUDED.text,
-                    image_path = EXCLUDED.image_path,
-                    created_by = EXCLUDED.created_by
-            ''', (
-                template_id,
-                name,
-                group_name,
-                text,
-                image_path,
-                created_by
-            ))
+            # RETURNING подтверждает запись без отдельного SELECT
+            saved = execute_values(cursor, TEMPLATE_UPSERT_SQL, [_template_values(template_data)], fetch=True)
             
+            publish(cursor, 'template', template_data.get('id'))
             conn.commit()
-            
-            # Проверим что действительно сохранилось
-            cursor.execute('SELECT COUNT(*) FROM templates WHERE id = %s', (template_id,))
-            count = cursor.fetchone()[0]
-            
             cursor.close()
             conn.close()
             
-            if count > 0:
-                print(f"✅ Шаблон {template_id} успешно сохранен в базе данных (проверено: {count} записей)")
+            if saved:
+                _invalidate_templates([saved[0][0]])
+                print(f"✅ Шаблон {saved[0][0]} успешно сохранен в базе данных")
                 return True
             else:
-                print(f"❌ Шаблон {template_id} не был сохранен в базу данных")
+                print(f"❌ Шаблон {template_data.get('id')} не был сохранен в базу данных")
                 return False
             
         except Exception as e:
@@ -246,6 +454,50 @@ class DatabaseManager:
                 pass
             return False
 
+    def save_templates(self, templates):
+        """
+        Сохраняет список шаблонов пакетно: один INSERT ... ON CONFLICT на
+        UPSERT_PAGE_SIZE строк, все в одной транзакции.
+        Возвращает список ID сохраненных шаблонов (пустой при ошибке).
+        """
+        rows = _dedupe_by_id([_template_values(template) for template in templates])
+        if not rows:
+            return []
+        
+        print(f"💾 Пакетное сохранение шаблонов: {len(rows)}")
+        
+        conn = self.get_connection()
+        if not conn:
+            print("❌ Не удалось подключиться к базе данных для сохранения шаблонов")
+            return []
+            
+        try:
+            cursor = conn.cursor()
+            
+            saved = execute_values(cursor, TEMPLATE_UPSERT_SQL, rows, page_size=UPSERT_PAGE_SIZE, fetch=True)
+            
+            publish(cursor, 'templates')
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            saved_ids = [row[0] for row in saved]
+            # Пакет перечитывается целиком при следующем чтении кэша
+            _invalidate_templates()
+            print(f"✅ Сохранено шаблонов: {len(saved_ids)}")
+            return saved_ids
+            
+        except Exception as e:
+            print(f"❌ Ошибка пакетного сохранения шаблонов: {e}")
+            import traceback
+            traceback.print_exc()
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return []
+
     def load_templates(self):
         """Загружает все шаблоны из базы данных"""
         print("📂 Загрузка шаблонов из базы данных...")
@@ -258,21 +510,13 @@ class DatabaseManager:
         try:
             cursor = conn.cursor()
             
-            cursor.execute('SELECT * FROM templates ORDER BY created_at DESC')
+            cursor.execute(f'SELECT {TEMPLATE_COLUMNS} FROM templates ORDER BY created_at DESC')
             rows = cursor.fetchall()
             
             templates = {}
             for row in rows:
                 try:
-                    template = {
-                        'id': row[0],
-                        'name': row[1],
-                        'group': row[2],
-                        'text': row[3],
-                        'image': row[4],
-                        'created_by': row[5],
-                        'created_at': row[6].strftime("%Y-%m-%d %H:%M:%S") if row[6] else None
-                    }
+                    template = _row_to_template(row)
                     templates[template['id']] = template
                     print(f"📥 Загружен шаблон: {template['name']} (ID: {template['id']})")
                     
@@ -296,133 +540,197 @@ class DatabaseManager:
                 pass
             return {}
 
+    def get_template(self, template_id, raise_errors=False):
+        """
+        Возвращает один шаблон по ID (поиск по первичному ключу).
+        С raise_errors=True ошибка базы пробрасывается, и None означает только
+        отсутствие записи
+        """
+        conn = self.get_connection()
+        if not conn:
+            if raise_errors:
+                raise ConnectionError("Нет соединения с базой данных")
+            return None
+            
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'SELECT {TEMPLATE_COLUMNS} FROM templates WHERE id = %s', (template_id,))
+            row = cursor.fetchone()
+            
+            cursor.close()
+            conn.close()
+            
+            return _row_to_template(row) if row else None
+            
+        except Exception as e:
+            print(f"❌ Ошибка получения шаблона {template_id}: {e}")
+            try:
+                conn.close()
+            except:
+                pass
+            if raise_errors:
+                raise
+            return None
+
+    def get_template_by_name_and_group(self, name, group_id):
+        """Возвращает шаблон по имени внутри группы"""
+        conn = self.get_connection()
+        if not conn:
+            return None
+            
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT {TEMPLATE_COLUMNS} FROM templates
+                WHERE name = %s AND group_name = %s
+                ORDER BY created_at DESC
+                LIMIT 1
+            ''', (name, group_id))
+            row = cursor.fetchone()
+            
+            cursor.close()
+            conn.close()
+            
+            return _row_to_template(row) if row else None
+            
+        except Exception as e:
+            print(f"❌ Ошибка поиска шаблона '{name}' в группе {group_id}: {e}")
+            try:
+                conn.close()
+            except:
+                pass
+            return None
+
+    def delete_template(self, template_id):
+        """Удаляет шаблон из базы данных"""
+        print(f"🗑️ Попытка удаления шаблона {template_id}")
+        
+        conn = self.get_connection()
+        if not conn:
+            return False
+            
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM templates WHERE id = %s', (template_id,))
+            
+            publish(cursor, 'template', template_id)
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            _invalidate_templates([template_id])
+            
+            print(f"✅ Шаблон {template_id} удален из базы данных")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Ошибка удаления шаблона: {e}")
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return False
+
     # ===== МЕТОДЫ ДЛЯ ЗАДАЧ (ОБНОВЛЕННЫЕ) =====
     
     def save_task(self, task_data):
-    """Сохраняет задачу в базу данных с новой структурой"""
-    from task_models import TaskData
-    
-    print(f"💾 Попытка сохранения задачи в базу данных: {task_data.get('template_name')}")
-    
-    conn = self.get_connection()
-    if not conn:
-        print("❌ Не удалось подключиться к базе данных для сохранения задачи")
-        return False
-        
-    try:
-        cursor = conn.cursor()
-        
-        # Подготавливаем данные
-        if isinstance(task_data, TaskData):
-            # Если передали объект TaskData, конвертируем в словарь
-            data_dict = task_data.to_dict()
-        else:
-            # Если уже словарь, используем как есть
-            data_dict = task_data
-            
-        task_id = data_dict.get('id')
-        template_id = data_dict.get('template_id')
-        template_name = data_dict.get('template_name', '')
-        template_text = data_dict.get('template_text', '')
-        template_image = data_dict.get('template_image')
-        group_name = data_dict.get('group_name', '')
-        created_by = data_dict.get('created_by')
-        is_active = data_dict.get('is_active', True)
-        is_test = data_dict.get('is_test', False)
-        last_executed = data_dict.get('last_executed')
-        next_execution = data_dict.get('next_execution')
-        target_chat_id = data_dict.get('target_chat_id')
-        
-        # Новые поля расписания
-        schedule_type = data_dict.get('schedule_type')
-        times = data_dict.get('times', '[]')
-        week_days = data_dict.get('week_days', '[]')
-        month_days = data_dict.get('month_days', '[]')
-        frequency = data_dict.get('frequency', 'weekly')
+        """
+        Сохраняет задачу в базу данных с новой структурой.
+        Возвращает сохраненную задачу (TaskData, как ее видит база) или False.
+        """
+        values = _task_values(task_data)
+        task_id = values[0]
         
+        print(f"💾 Попытка сохранения задачи в базу данных: {values[2]}")
         print(f"📊 Данные задачи для сохранения:")
         print(f"   ID: {task_id}")
-        print(f"   Name: {template_name}")
-        print(f"   Group: {group_name}")
-        print(f"   Target Chat: {target_chat_id}")
-        print(f"   Schedule Type: {schedule_type}")
-        print(f"   Times: {times}")
-        print(f"   Frequency: {frequency}")
+        print(f"   Group: {values[5]}")
+        print(f"   Target Chat: {values[11]}")
+        print(f"   Schedule Type: {values[12]}")
+        print(f"   Times: {values[13]}")
+        print(f"   Frequency: {values[16]}")
+    
+        conn = self.get_connection()
+        if not conn:
+            print("❌ Не удалось подключиться к базе данных для сохранения задачи")
+            return False
         
-        cursor.execute('''
-            INSERT INTO tasks (id, template_id, template_name, template_text, template_image, 
-                             group_name, created_by, is_active, is_test, last_executed, 
-                             next_execution, target_chat_id, schedule_type, times, week_days, 
-                             month_days, frequency)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO UPDATE SET
-                template_id = EXCLUDED.template_id,
-                template_name = EXCLUDED.template_name,
-                template_text = EXCLUDED.template_text,
-                template_image = EXCLUDED.template_image,
-                group_name = EXCLUDED.group_name,
-                created_by = EXCLUDED.created_by,
-                is_active = EXCLUDED.is_active,
-                is_test = EXCLUDED.is_test,
-                last_executed = EXCLUDED.last_executed,
-                next_execution = EXCLUDED.next_execution,
-                target_chat_id = EXCLUDED.target_chat_id,
-                schedule_type = EXCLUDED.schedule_type,
-                times = EXCLUDED.times,
-                week_days = EXCLUDED.week_days,
-                month_days = EXCLUDED.month_days,
-                frequency = EXCLUDED.frequency
-        ''', (
-            task_id,
-            template_id,
-            template_name,
-            template_text,
-            template_image,
-            group_name,
-            created_by,
-            is_active,
-            is_test,
-            last_executed,
-            next_execution,
-            target_chat_id,
-            schedule_type,
-            times,
-            week_days,
-            month_days,
-            frequency
-        ))
+        try:
+            cursor = conn.cursor()
         
-        conn.commit()
+            # RETURNING подтверждает запись без отдельного SELECT
+            saved = execute_values(cursor, TASK_UPSERT_SQL, [values], fetch=True)
         
-        # Проверим что действительно сохранилось
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE id = %s', (task_id,))
-        count = cursor.fetchone()[0]
+            publish(cursor, 'task', task_id)
+            conn.commit()
+            cursor.close()
+            conn.close()
         
-        cursor.close()
-        conn.close()
+            if saved:
+                print(f"✅ Задача {task_id} успешно сохранена в базе данных")
+                return _row_to_task(saved[0])
+            else:
+                print(f"❌ Задача {task_id} не была сохранена в базу данных")
+                return False
         
-        if count > 0:
-            print(f"✅ Задача {task_id} успешно сохранена в базе данных (проверено: {count} записей)")
-            return True
-        else:
-            print(f"❌ Задача {task_id} не была сохранена в базу данных")
+        except Exception as e:
+            print(f"❌ Ошибка сохранения задачи: {e}")
+            import traceback
+            traceback.print_exc()
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
             return False
+
+    def save_tasks(self, tasks):
+        """
+        Сохраняет список задач (TaskData или словари) пакетно: один
+        INSERT ... ON CONFLICT на UPSERT_PAGE_SIZE строк в одной транзакции.
+        Возвращает список ID сохраненных задач (пустой при ошибке).
+        """
+        rows = _dedupe_by_id([_task_values(task) for task in tasks])
+        if not rows:
+            return []
+        
+        print(f"💾 Пакетное сохранение задач: {len(rows)}")
         
-    except Exception as e:
-        print(f"❌ Ошибка сохранения задачи: {e}")
-        import traceback
-        traceback.print_exc()
+        conn = self.get_connection()
+        if not conn:
+            print("❌ Не удалось подключиться к базе данных для сохранения задач")
+            return []
+            
         try:
-            conn.rollback()
+            cursor = conn.cursor()
+            
+            saved = execute_values(cursor, TASK_UPSERT_SQL, rows, page_size=UPSERT_PAGE_SIZE, fetch=True)
+            
+            publish(cursor, 'tasks')
+            conn.commit()
+            cursor.close()
             conn.close()
-        except:
-            pass
-        return False
+            
+            print(f"✅ Сохранено задач: {len(saved)}")
+            return [row[0] for row in saved]
+            
+        except Exception as e:
+            print(f"❌ Ошибка пакетного сохранения задач: {e}")
+            import traceback
+            traceback.print_exc()
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return []
 
     def load_tasks(self):
         """Загружает все задачи из базы данных с новой структурой"""
-        from task_models import TaskData
-        
         print("📂 Загрузка задач из базы данных...")
         
         conn = self.get_connection()
@@ -433,37 +741,13 @@ class DatabaseManager:
         try:
             cursor = conn.cursor()
             
-            cursor.execute('SELECT * FROM tasks ORDER BY created_at DESC')
+            cursor.execute(f'SELECT {TASK_COLUMNS} FROM tasks ORDER BY created_at DESC')
             rows = cursor.fetchall()
             
             tasks = {}
             for row in rows:
                 try:
-                    # Создаем словарь с данными задачи
-                    task_dict = {
-                        'id': row[0],
-                        'template_id': row[1],
-                        'template_name': row[2],
-                        'template_text': row[3],
-                        'template_image': row[4],
-                        'group_name': row[5],
-                        'created_by': row[6],
-                        'created_at': row[7].strftime("%Y-%m-%d %H:%M:%S") if row[7] else None,
-                        'is_active': row[8],
-                        'is_test': row[9],
-                        'last_executed': row[10].strftime("%Y-%m-%d %H:%M:%S") if row[10] else None,
-                        'next_execution': row[11].strftime("%Y-%m-%d %H:%M:%S") if row[11] else None,
-                        'target_chat_id': row[12],
-                        # Новые поля расписания
-                        'schedule_type': row[13],
-                        'times': row[14],
-                        'week_days': row[15],
-                        'month_days': row[16],
-                        'frequency': row[17]
-                    }
-                    
-                    # Конвертируем в объект TaskData
-                    task = TaskData.from_dict(task_dict)
+                    task = _row_to_task(row)
                     tasks[task.id] = task
                     print(f"📥 Загружена задача: {task.template_name} (ID: {task.id})")
                     
@@ -487,6 +771,72 @@ class DatabaseManager:
                 pass
             return {}
 
+    def get_tasks(self, active=None, group_name=None, user_id=None):
+        """
+        Возвращает задачи, отфильтрованные на стороне БД: по активности, по
+        группе и/или по группам, доступным пользователю (user_template_group_access)
+        """
+        conn = self.get_connection()
+        if not conn:
+            return {}
+            
+        try:
+            cursor = conn.cursor()
+            
+            where, params = _task_filters(active, group_name, user_id)
+            cursor.execute(f'SELECT {TASK_COLUMNS} FROM tasks {where} ORDER BY created_at DESC', params)
+            rows = cursor.fetchall()
+            
+            cursor.close()
+            conn.close()
+            
+            tasks = {}
+            for row in rows:
+                task = _row_to_task(row)
+                tasks[task.id] = task
+            return tasks
+            
+        except Exception as e:
+            print(f"❌ Ошибка выборки задач: {e}")
+            try:
+                conn.close()
+            except:
+                pass
+            return {}
+
+    def get_task(self, task_id, raise_errors=False):
+        """
+        Возвращает одну задачу по ID (поиск по первичному ключу).
+        С raise_errors=True ошибка базы пробрасывается, и None означает только
+        отсутствие записи
+        """
+        conn = self.get_connection()
+        if not conn:
+            if raise_errors:
+                raise ConnectionError("Нет соединения с базой данных")
+            return None
+            
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = %s', (task_id,))
+            row = cursor.fetchone()
+            
+            cursor.close()
+            conn.close()
+            
+            return _row_to_task(row) if row else None
+            
+        except Exception as e:
+            print(f"❌ Ошибка получения задачи {task_id}: {e}")
+            try:
+                conn.close()
+            except:
+                pass
+            if raise_errors:
+                raise
+            return None
+
     def update_task(self, task_id, task_data):
         """Обновляет задачу в базе данных"""
         from task_models import TaskData
@@ -523,7 +873,8 @@ class DatabaseManager:
                     times = %s,
                     week_days = %s,
                     month_days = %s,
-                    frequency = %s
+                    frequency = %s,
+                    misfire_policy = %s
                 WHERE id = %s
             ''', (
                 data_dict.get('template_id'),
@@ -542,9 +893,11 @@ class DatabaseManager:
                 data_dict.get('week_days'),
                 data_dict.get('month_days'),
                 data_dict.get('frequency', 'weekly'),
+                data_dict.get('misfire_policy') or 'once',
                 task_id
             ))
             
+            publish(cursor, 'task', task_id)
             conn.commit()
             cursor.close()
             conn.close()
@@ -561,6 +914,117 @@ class DatabaseManager:
                 pass
             return False
 
+    def update_task_fields(self, task_id, fields, recompute_next=False):
+        """
+        Обновляет только переданные поля задачи одним UPDATE.
+        При recompute_next=True в той же транзакции пересчитывает next_execution
+        по обновленной строке. Возвращает обновленную задачу (TaskData) или False.
+        """
+        from psycopg2.extras import Json
+        from task_calculators import TaskScheduleCalculator
+        
+        unknown = set(fields) - TASK_UPDATABLE_FIELDS
+        if unknown:
+            print(f"❌ Недопустимые поля для обновления задачи {task_id}: {', '.join(sorted(unknown))}")
+            return False
+        if not fields and not recompute_next:
+            return True
+        
+        conn = self.get_connection()
+        if not conn:
+            return False
+            
+        try:
+            cursor = conn.cursor()
+            
+            columns = sorted(fields)
+            values = [
+                Json(fields[column]) if column in TASK_JSONB_FIELDS and not isinstance(fields[column], str)
+                else fields[column]
+                for column in columns
+            ]
+            # id = id оставляет UPDATE корректным, когда нужен только пересчет
+            assignments = ', '.join([f'{column} = %s' for column in columns] + ['id = id'])
+            
+            cursor.execute(
+                f'UPDATE tasks SET {assignments} WHERE id = %s RETURNING {TASK_COLUMNS}',
+                values + [task_id]
+            )
+            row = cursor.fetchone()
+            
+            if not row:
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                print(f"❌ Задача {task_id} не найдена для обновления")
+                return False
+            
+            task = _row_to_task(row)
+            if recompute_next:
+                next_execution = TaskScheduleCalculator.calculate_next_execution(task)
+                cursor.execute(
+                    'UPDATE tasks SET next_execution = %s WHERE id = %s',
+                    (next_execution, task_id)
+                )
+                task.next_execution = _format_timestamp(next_execution)
+            
+            publish(cursor, 'task', task_id)
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            print(f"✅ Задача {task_id} обновлена: {', '.join(columns) or 'next_execution'}")
+            return task
+            
+        except Exception as e:
+            print(f"❌ Ошибка обновления полей задачи {task_id}: {e}")
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return False
+
+    def update_task_executions(self, rows):
+        """
+        Записывает отметки выполнения нескольких задач одним UPDATE ... FROM VALUES.
+        rows - кортежи (id, last_executed, next_execution, update_next, is_active).
+        Возвращает список ID обновленных задач или None при ошибке.
+        """
+        if not rows:
+            return []
+        
+        conn = self.get_connection()
+        if not conn:
+            return None
+            
+        try:
+            cursor = conn.cursor()
+            
+            updated = execute_values(
+                cursor, TASK_EXECUTION_UPDATE_SQL, rows,
+                template=TASK_EXECUTION_UPDATE_TEMPLATE, page_size=UPSERT_PAGE_SIZE, fetch=True
+            )
+            updated_ids = [row[0] for row in updated]
+            
+            for start in range(0, len(updated_ids), NOTIFY_IDS_PER_EVENT):
+                publish(cursor, 'task', *updated_ids[start:start + NOTIFY_IDS_PER_EVENT])
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            print(f"✅ Отметки выполнения записаны: {len(updated_ids)} задач")
+            return updated_ids
+            
+        except Exception as e:
+            print(f"❌ Ошибка пакетной записи выполнения задач: {e}")
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return None
+
     def delete_task(self, task_id):
         """Удаляет задачу из базы данных"""
         print(f"🗑️ Попытка удаления задачи {task_id}")
@@ -574,6 +1038,7 @@ class DatabaseManager:
             
             cursor.execute('DELETE FROM tasks WHERE id = %s', (task_id,))
             
+            publish(cursor, 'task', task_id)
             conn.commit()
             cursor.close()
             conn.close()
@@ -590,6 +1055,190 @@ class DatabaseManager:
                 pass
             return False
 
+    # ===== ПОТОКОВОЕ ЧТЕНИЕ =====
+
+    def _iter_rows(self, query, params=(), itersize=None, raise_errors=False):
+        """
+        Отдает строки запроса через именованный (серверный) курсор порциями по
+        itersize строк, не загружая всю таблицу в память. Соединение занято, пока
+        генератор не исчерпан или не закрыт.
+        С raise_errors=True ошибка пробрасывается вызывающему, иначе чтение
+        просто прекращается (неполный результат неотличим от полного).
+        """
+        conn = self.get_connection()
+        if not conn:
+            print("❌ Не удалось подключиться к базе данных для потокового чтения")
+            if raise_errors:
+                raise ConnectionError("Нет соединения с базой данных")
+            return
+        
+        cursor = None
+        try:
+            cursor = conn.cursor(name=f'iter_{uuid.uuid4().hex}')
+            cursor.itersize = itersize or DB_ITERSIZE
+            cursor.execute(query, params)
+            for row in cursor:
+                yield row
+                
+        except Exception as e:
+            print(f"❌ Ошибка потокового чтения: {e}")
+            if raise_errors:
+                raise
+            
+        finally:
+            try:
+                if cursor is not None:
+                    cursor.close()
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+
+    def iter_templates(self, itersize=None, raise_errors=False):
+        """Лениво отдает шаблоны (словари) в порядке создания, новые первыми"""
+        for row in self._iter_rows(
+            f'SELECT {TEMPLATE_COLUMNS} FROM templates ORDER BY created_at DESC',
+            itersize=itersize,
+            raise_errors=raise_errors
+        ):
+            yield _row_to_template(row)
+
+    def iter_tasks(self, active_only=False, itersize=None, raise_errors=False):
+        """Лениво отдает задачи (TaskData) в порядке создания, новые первыми"""
+        where, params = _task_filters(active=True if active_only else None)
+        for row in self._iter_rows(
+            f'SELECT {TASK_COLUMNS} FROM tasks {where} ORDER BY created_at DESC',
+            params,
+            itersize=itersize,
+            raise_errors=raise_errors
+        ):
+            yield _row_to_task(row)
+
+    def iter_due_tasks(self, until, itersize=None):
+        """
+        Лениво отдает активные нетестовые задачи со следующим запуском не позже
+        until (по индексу idx_tasks_due), ближайшие первыми. Ошибка чтения
+        пробрасывается: планировщик не должен принять ее за пустое окно.
+        """
+        for row in self._iter_rows(
+            f'SELECT {TASK_COLUMNS} FROM tasks '
+            'WHERE is_active AND NOT is_test AND next_execution <= %s '
+            'ORDER BY next_execution',
+            (until,),
+            itersize=itersize,
+            raise_errors=True
+        ):
+            yield _row_to_task(row)
+
+    def iter_unscheduled_tasks(self, itersize=None):
+        """Лениво отдает активные нетестовые задачи без рассчитанного следующего запуска"""
+        for row in self._iter_rows(
+            f'SELECT {TASK_COLUMNS} FROM tasks '
+            'WHERE is_active AND NOT is_test AND next_execution IS NULL',
+            itersize=itersize
+        ):
+            yield _row_to_task(row)
+
+    def iter_groups(self, itersize=None):
+        """Лениво отдает группы шаблонов парами (ID, словарь группы)"""
+        for row in self._iter_rows(
+            f'SELECT {GROUP_COLUMNS} FROM template_groups ORDER BY id',
+            itersize=itersize
+        ):
+            yield _row_to_group(row)
+
+    def load_groups(self):
+        """Загружает все группы шаблонов в формате {"groups": {ID: группа}}"""
+        groups = {"groups": dict(self.iter_groups())}
+        print(f"✅ Загружено {len(groups['groups'])} групп из базы данных")
+        return groups
+
+    # ===== FILE_ID ИЗОБРАЖЕНИЙ TELEGRAM =====
+    
+    def load_telegram_files(self):
+        """Возвращает сохраненные file_id: {путь: (размер, mtime, file_id)}"""
+        conn = self.get_connection()
+        if not conn:
+            return {}
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT image_path, file_size, file_mtime, file_id FROM telegram_files')
+            files = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+            
+            cursor.close()
+            conn.close()
+            
+            return files
+            
+        except Exception as e:
+            print(f"❌ Ошибка загрузки file_id изображений: {e}")
+            try:
+                conn.close()
+            except:
+                pass
+            return {}
+    
+    def save_telegram_file(self, image_path, file_size, file_mtime, file_id):
+        """Сохраняет file_id изображения, загруженного в Telegram"""
+        conn = self.get_connection()
+        if not conn:
+            return False
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO telegram_files (image_path, file_size, file_mtime, file_id)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (image_path) DO UPDATE SET
+                    file_size = EXCLUDED.file_size,
+                    file_mtime = EXCLUDED.file_mtime,
+                    file_id = EXCLUDED.file_id,
+                    created_at = CURRENT_TIMESTAMP
+            ''', (image_path, file_size, file_mtime, file_id))
+            publish(cursor, 'telegram_file', image_path)
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            return True
+            
+        except Exception as e:
+            print(f"❌ Ошибка сохранения file_id изображения {image_path}: {e}")
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return False
+    
+    def delete_telegram_file(self, image_path):
+        """Удаляет сохраненный file_id изображения"""
+        conn = self.get_connection()
+        if not conn:
+            return False
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM telegram_files WHERE image_path = %s', (image_path,))
+            publish(cursor, 'telegram_file', image_path)
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            return True
+            
+        except Exception as e:
+            print(f"❌ Ошибка удаления file_id изображения {image_path}: {e}")
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return False
+    
     # ===== МЕТОДЫ ДЛЯ ПОЛЬЗОВАТЕЛЕЙ =====
     
     def add_user(self, user_id, username, full_name, role='guest'):
@@ -610,10 +1259,12 @@ class DatabaseManager:
                     role = EXCLUDED.role
             ''', (user_id, username, full_name, role))
             
+            publish(cursor, 'role', user_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            _invalidate_user_role(user_id)
             print(f"✅ Пользователь {user_id} добавлен/обновлен")
             return True, "Пользователь успешно добавлен"
             
@@ -679,10 +1330,14 @@ class DatabaseManager:
             
             cursor.execute('DELETE FROM users WHERE user_id = %s', (user_id,))
             
+            publish(cursor, 'role', user_id)
+            publish(cursor, 'acl', 'remove_user', user_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            _invalidate_user_role(user_id)
+            _update_acl('remove_user', user_id)
             print(f"✅ Пользователь {user_id} удален")
             return True, "Пользователь успешно удален"
             
@@ -706,10 +1361,12 @@ class DatabaseManager:
             
             cursor.execute('UPDATE users SET role = %s WHERE user_id = %s', (new_role, user_id))
             
+            publish(cursor, 'role', user_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            _invalidate_user_role(user_id)
             print(f"✅ Роль пользователя {user_id} обновлена на {new_role}")
             return True, "Роль пользователя обновлена"
             
@@ -805,10 +1462,12 @@ class DatabaseManager:
             
             cursor.execute('DELETE FROM telegram_chats WHERE chat_id = %s', (chat_id,))
             
+            publish(cursor, 'acl', 'remove_chat', chat_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            _update_acl('remove_chat', chat_id)
             print(f"✅ Telegram чат {chat_id} удален")
             return True, "Telegram чат успешно удален"
             
@@ -838,10 +1497,25 @@ class DatabaseManager:
                 ON CONFLICT (user_id, chat_id) DO NOTHING
             ''', (user_id, chat_id))
             
+            # В ACL попадают только связи активных пользователя и чата - то же
+            # условие, что в load_access_links
+            cursor.execute('''
+                SELECT EXISTS (
+                    SELECT 1 FROM telegram_chats tc, users u
+                    WHERE tc.chat_id = %s AND u.user_id = %s
+                      AND tc.is_active = TRUE AND u.is_active = TRUE
+                )
+            ''', (chat_id, user_id))
+            effective = cursor.fetchone()[0]
+            
+            if effective:
+                publish(cursor, 'acl', 'grant_chat', user_id, chat_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            if effective:
+                _update_acl('grant_chat', user_id, chat_id)
             print(f"✅ Пользователю {user_id} предоставлен доступ к чату {chat_id}")
             return True, "Доступ к чату предоставлен"
             
@@ -865,10 +1539,12 @@ class DatabaseManager:
             
             cursor.execute('DELETE FROM user_chat_access WHERE user_id = %s AND chat_id = %s', (user_id, chat_id))
             
+            publish(cursor, 'acl', 'revoke_chat', user_id, chat_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            _update_acl('revoke_chat', user_id, chat_id)
             print(f"✅ У пользователя {user_id} отозван доступ к чату {chat_id}")
             return True, "Доступ к чату отозван"
             
@@ -896,10 +1572,21 @@ class DatabaseManager:
                 ON CONFLICT (user_id, group_id) DO NOTHING
             ''', (user_id, group_id))
             
+            # Как в load_access_links: связи неактивных пользователей в ACL не попадают
+            cursor.execute(
+                'SELECT EXISTS (SELECT 1 FROM users WHERE user_id = %s AND is_active = TRUE)',
+                (user_id,)
+            )
+            effective = cursor.fetchone()[0]
+            
+            if effective:
+                publish(cursor, 'acl', 'grant_group', user_id, group_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            if effective:
+                _update_acl('grant_group', user_id, group_id)
             print(f"✅ Пользователю {user_id} предоставлен доступ к группе {group_id}")
             return True, "Доступ к группе предоставлен"
             
@@ -923,10 +1610,12 @@ class DatabaseManager:
             
             cursor.execute('DELETE FROM user_template_group_access WHERE user_id = %s AND group_id = %s', (user_id, group_id))
             
+            publish(cursor, 'acl', 'revoke_group', user_id, group_id)
             conn.commit()
             cursor.close()
             conn.close()
             
+            _update_acl('revoke_group', user_id, group_id)
             print(f"✅ У пользователя {user_id} отозван доступ к группе {group_id}")
             return True, "Доступ к группе отозван"
             
@@ -939,6 +1628,50 @@ class DatabaseManager:
                 pass
             return False, f"Ошибка отзыва доступа: {e}"
     
+    def load_access_links(self):
+        """
+        Возвращает все действующие связи доступа двумя списками пар:
+        (user_id, chat_id) и (user_id, group_id); None при ошибке базы
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+        
+        try:
+            cursor = conn.cursor()
+            
+            # Те же условия активности, что в get_user_chat_access и get_chat_users
+            cursor.execute('''
+                SELECT uc.user_id, uc.chat_id
+                FROM user_chat_access uc
+                JOIN telegram_chats tc ON tc.chat_id = uc.chat_id
+                JOIN users u ON u.user_id = uc.user_id
+                WHERE tc.is_active = TRUE AND u.is_active = TRUE
+            ''')
+            chat_links = cursor.fetchall()
+            
+            cursor.execute('''
+                SELECT ut.user_id, ut.group_id
+                FROM user_template_group_access ut
+                JOIN template_groups tg ON tg.id = ut.group_id
+                JOIN users u ON u.user_id = ut.user_id
+                WHERE u.is_active = TRUE
+            ''')
+            group_links = cursor.fetchall()
+            
+            cursor.close()
+            conn.close()
+            
+            return chat_links, group_links
+            
+        except Exception as e:
+            print(f"❌ Ошибка загрузки связей доступа: {e}")
+            try:
+                conn.close()
+            except:
+                pass
+            return None
+    
     def get_user_chat_access(self, user_id):
         """Возвращает чаты, к которым у пользователя есть доступ"""
         conn = self.get_connection()
@@ -0,0 +1,171 @@
+"""
+Асинхронный доступ к базе данных для корутин (обработчики и планировщик)
+
+psycopg2 блокирует поток, поэтому запросы выполняются в отдельном пуле потоков,
+размер которого совпадает с размером пула соединений. Event loop при этом
+продолжает обслуживать других пользователей и плановые отправки.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from database import db, DB_POOL_MAX
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseManager:
+    def __init__(self, manager, max_workers=DB_POOL_MAX):
+        self.db = manager
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="db"
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Выполняет блокирующую функцию работы с БД в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self):
+        """Останавливает пул потоков"""
+        self._executor.shutdown(wait=False)
+        logger.info("✅ Пул потоков базы данных остановлен")
+
+    # ===== СТАТИСТИКА ЗАПРОСОВ =====
+
+    async def get_query_stats(self, limit=None):
+        """Возвращает статистику запросов"""
+        return await self.run(self.db.get_query_stats, limit)
+
+    # ===== ИНДЕКСЫ =====
+
+    async def get_index_report(self):
+        """Возвращает отчет по индексам"""
+        return await self.run(self.db.get_index_report)
+
+    # ===== ШАБЛОНЫ =====
+
+    async def save_template(self, template_data):
+        """Сохраняет шаблон в базу данных"""
+        return await self.run(self.db.save_template, template_data)
+
+    async def save_templates(self, templates):
+        """Сохраняет список шаблонов одним пакетом"""
+        return await self.run(self.db.save_templates, templates)
+
+    async def load_templates(self):
+        """Загружает все шаблоны из базы данных"""
+        return await self.run(self.db.load_templates)
+
+    async def delete_template(self, template_id):
+        """Удаляет шаблон из базы данных"""
+        return await self.run(self.db.delete_template, template_id)
+
+    async def load_groups(self):
+        """Загружает все группы шаблонов"""
+        return await self.run(self.db.load_groups)
+
+    # ===== ЗАДАЧИ =====
+
+    async def save_task(self, task_data):
+        """Сохраняет задачу в базу данных"""
+        return await self.run(self.db.save_task, task_data)
+
+    async def save_tasks(self, tasks):
+        """Сохраняет список задач одним пакетом"""
+        return await self.run(self.db.save_tasks, tasks)
+
+    async def load_tasks(self):
+        """Загружает все задачи из базы данных"""
+        return await self.run(self.db.load_tasks)
+
+    async def get_tasks(self, active=None, group_name=None, user_id=None):
+        """Возвращает задачи, отфильтрованные на стороне БД"""
+        return await self.run(self.db.get_tasks, active, group_name, user_id)
+
+    async def update_task(self, task_id, task_data):
+        """Обновляет задачу в базе данных"""
+        return await self.run(self.db.update_task, task_id, task_data)
+
+    async def update_task_fields(self, task_id, fields, recompute_next=False):
+        """Обновляет отдельные поля задачи одним запросом"""
+        return await self.run(self.db.update_task_fields, task_id, fields, recompute_next)
+
+    async def delete_task(self, task_id):
+        """Удаляет задачу из базы данных"""
+        return await self.run(self.db.delete_task, task_id)
+
+    # ===== ПОЛЬЗОВАТЕЛИ =====
+
+    async def add_user(self, user_id, username, full_name, role='guest'):
+        """Добавляет нового пользователя"""
+        return await self.run(self.db.add_user, user_id, username, full_name, role)
+
+    async def get_all_users(self):
+        """Возвращает всех пользователей"""
+        return await self.run(self.db.get_all_users)
+
+    async def delete_user(self, user_id):
+        """Удаляет пользователя"""
+        return await self.run(self.db.delete_user, user_id)
+
+    async def update_user_role(self, user_id, new_role):
+        """Обновляет роль пользователя"""
+        return await self.run(self.db.update_user_role, user_id, new_role)
+
+    # ===== TELEGRAM ЧАТЫ =====
+
+    async def add_telegram_chat(self, chat_id, chat_name, original_name=None):
+        """Добавляет новый Telegram чат"""
+        return await self.run(self.db.add_telegram_chat, chat_id, chat_name, original_name)
+
+    async def get_all_chats(self):
+        """Возвращает все Telegram чаты"""
+        return await self.run(self.db.get_all_chats)
+
+    async def delete_chat(self, chat_id):
+        """Удаляет Telegram чат"""
+        return await self.run(self.db.delete_chat, chat_id)
+
+    # ===== УПРАВЛЕНИЕ ДОСТУПОМ =====
+
+    async def grant_chat_access(self, user_id, chat_id):
+        """Предоставляет доступ пользователю к чату"""
+        return await self.run(self.db.grant_chat_access, user_id, chat_id)
+
+    async def revoke_chat_access(self, user_id, chat_id):
+        """Отзывает доступ пользователя к чату"""
+        return await self.run(self.db.revoke_chat_access, user_id, chat_id)
+
+    async def grant_template_group_access(self, user_id, group_id):
+        """Предоставляет доступ пользователю к группе шаблонов"""
+        return await self.run(self.db.grant_template_group_access, user_id, group_id)
+
+    async def revoke_template_group_access(self, user_id, group_id):
+        """Отзывает доступ пользователя к группе шаблонов"""
+        return await self.run(self.db.revoke_template_group_access, user_id, group_id)
+
+    async def get_user_chat_access(self, user_id):
+        """Возвращает чаты, к которым у пользователя есть доступ"""
+        return await self.run(self.db.get_user_chat_access, user_id)
+
+    async def get_user_template_group_access(self, user_id):
+        """Возвращает группы шаблонов, к которым у пользователя есть доступ"""
+        return await self.run(self.db.get_user_template_group_access, user_id)
+
+    async def get_chat_users(self, chat_id):
+        """Возвращает пользователей, имеющих доступ к чату"""
+        return await self.run(self.db.get_chat_users, chat_id)
+
+    async def get_group_users(self, group_id):
+        """Возвращает пользователей, имеющих доступ к группе шаблонов"""
+        return await self.run(self.db.get_group_users, group_id)
+
+# Глобальный экземпляр асинхронного менеджера базы данных
+async_db = AsyncDatabaseManager(db)
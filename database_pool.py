@@ -0,0 +1,194 @@
+"""
+Пул соединений с базой данных PostgreSQL
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2 import pool as pg_pool
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection:
+    """Соединение, взятое из пула: close() возвращает его обратно в пул"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    @property
+    def raw(self):
+        """Возвращает исходное соединение psycopg2"""
+        return self._conn
+
+    def close(self):
+        """Возвращает соединение в пул вместо закрытия"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError("Соединение уже возвращено в пул")
+        return getattr(conn, name)
+
+    def __del__(self):
+        # Страховка для путей, где вызывающий код забыл вызвать close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с проверкой соединения при выдаче"""
+
+    def __init__(self, dsn, minconn=1, maxconn=10, checkout_timeout=10.0,
+                 health_check_interval=30.0, **connect_kwargs):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, dsn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'health_checks': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+        }
+        logger.info(f"✅ Пул соединений создан (min={minconn}, max={maxconn})")
+
+    def acquire(self):
+        """Берет соединение из пула, ожидая свободный слот не дольше checkout_timeout"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise pg_pool.PoolError(
+                f"Нет свободных соединений в пуле за {self.checkout_timeout} сек"
+            )
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._stats['in_use'])
+        return conn
+
+    def _checkout_healthy(self):
+        """Возвращает рабочее соединение, отбрасывая закрытые и «протухшие»"""
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+        raise pg_pool.PoolError("Не удалось получить рабочее соединение из пула")
+
+    def _is_healthy(self, conn):
+        """Проверяет соединение; SELECT 1 выполняется только после долгого простоя"""
+        if conn.closed:
+            return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        with self._lock:
+            self._stats['health_checks'] += 1
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"⚠️ Соединение из пула не прошло проверку: {e}")
+            with self._lock:
+                self._stats['health_check_failures'] += 1
+            return False
+
+    def _discard(self, conn):
+        """Закрывает соединение и убирает его из пула"""
+        self._last_used.pop(id(conn), None)
+        with self._lock:
+            self._stats['discarded'] += 1
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка при удалении соединения из пула: {e}")
+
+    def release(self, conn):
+        """Возвращает соединение в пул, откатывая незавершенную транзакцию"""
+        broken = bool(conn.closed)
+        if not broken and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        try:
+            if broken:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Выдает соединение на время блока: коммит при успехе, откат при ошибке"""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            raise
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Возвращает статистику пула"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['minconn'] = self.minconn
+        stats['maxconn'] = self.maxconn
+        stats['idle'] = len(self._pool._pool)
+        stats['opened'] = len(self._pool._used) + len(self._pool._pool)
+        checkouts = stats['checkouts']
+        stats['avg_wait_ms'] = round(stats['wait_time_total'] / checkouts * 1000, 2) if checkouts else 0.0
+        return stats
+
+    def close_all(self):
+        """Закрывает все соединения пула"""
+        self._pool.closeall()
+        self._last_used.clear()
+        logger.info("✅ Пул соединений закрыт")
@@ -0,0 +1,270 @@
+"""
+Инструментирование запросов к PostgreSQL
+
+Все соединения пула создаются с InstrumentedCursor: каждый execute фиксирует
+длительность, число строк, отпечаток запроса (SQL без литералов) и вызывающий
+метод. Агрегаты доступны через query_stats.snapshot() и команду /db_queries,
+медленные запросы пишутся в лог "slow_queries".
+
+У именованных (серверных) курсоров execute только объявляет курсор, а строки
+читаются при итерации, поэтому для них запрос фиксируется при close() с
+суммарным временем объявления и чтения всех строк.
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from psycopg2 import extensions
+
+# Порог медленного запроса, мс
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 200))
+
+# Сколько последних длительностей хранить для расчета перцентилей
+SAMPLES_PER_QUERY = 500
+SAMPLES_TOTAL = 5000
+
+slow_query_logger = logging.getLogger('slow_queries')
+
+# Модули и служебные функции, которые пропускаются при поиске вызывающего метода
+_INFRASTRUCTURE_MODULES = ('database_stats', 'psycopg2')
+_HELPER_FUNCTIONS = {'_iter_rows'}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s')
+_VALUE_TUPLE = r'\((?:\s*(?:\?|NULL|TRUE|FALSE|DEFAULT)(?:::\w+)?\s*,?)+\)'
+_VALUES_LIST = re.compile(rf'\bVALUES\s*{_VALUE_TUPLE}(?:\s*,\s*{_VALUE_TUPLE})*', re.IGNORECASE)
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+_CURSOR_NAME = re.compile(r'\biter_[0-9a-f]{32}\b')
+
+
+def fingerprint(sql):
+    """Нормализует SQL: литералы и параметры заменяются на ?, списки VALUES/IN сворачиваются"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = str(sql)
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _CURSOR_NAME.sub('iter_?', sql)
+    sql = _VALUES_LIST.sub('VALUES (...)', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _find_caller():
+    """Возвращает 'модуль.функция' первого кадра за пределами инструментирования и psycopg2"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_INFRASTRUCTURE_MODULES) and frame.f_code.co_name not in _HELPER_FUNCTIONS:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _percentile(sorted_values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, int(round(percent / 100.0 * len(sorted_values))) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class QueryStats:
+    """Потокобезопасные агрегаты по запросам, сгруппированные по (вызывающий метод, отпечаток)"""
+
+    def __init__(self, slow_query_ms=DB_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает накопленную статистику"""
+        with self._lock:
+            self._queries = {}
+            self._samples = deque(maxlen=SAMPLES_TOTAL)
+            self._count = 0
+            self._total_ms = 0.0
+            self._slow = 0
+            self._started = time.time()
+
+    def record(self, sql, duration_ms, rowcount, caller):
+        """Фиксирует выполненный запрос"""
+        query = fingerprint(sql)
+        key = (caller, query)
+        is_slow = duration_ms >= self.slow_query_ms
+
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                entry = {
+                    'caller': caller,
+                    'fingerprint': query,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'rows': 0,
+                    'slow': 0,
+                    'samples': deque(maxlen=SAMPLES_PER_QUERY),
+                }
+                self._queries[key] = entry
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['rows'] += max(rowcount, 0)
+            entry['samples'].append(duration_ms)
+            self._samples.append(duration_ms)
+            self._count += 1
+            self._total_ms += duration_ms
+            if is_slow:
+                entry['slow'] += 1
+                self._slow += 1
+
+        if is_slow:
+            slow_query_logger.warning(
+                f"🐢 Медленный запрос {duration_ms:.1f} мс ({caller}, строк: {rowcount}): {query[:500]}"
+            )
+
+    def summary(self):
+        """Общие показатели по всем запросам"""
+        with self._lock:
+            samples = sorted(self._samples)
+            return {
+                'count': self._count,
+                'total_ms': round(self._total_ms, 2),
+                'slow': self._slow,
+                'slow_query_ms': self.slow_query_ms,
+                'p50_ms': round(_percentile(samples, 50), 2),
+                'p95_ms': round(_percentile(samples, 95), 2),
+                'p99_ms': round(_percentile(samples, 99), 2),
+                'since': self._started,
+            }
+
+    def snapshot(self, limit=None):
+        """Агрегаты по запросам, отсортированные по суммарному времени"""
+        with self._lock:
+            entries = [(entry, sorted(entry['samples'])) for entry in self._queries.values()]
+
+        result = []
+        for entry, samples in entries:
+            result.append({
+                'caller': entry['caller'],
+                'fingerprint': entry['fingerprint'],
+                'count': entry['count'],
+                'total_ms': round(entry['total_ms'], 2),
+                'avg_ms': round(entry['total_ms'] / entry['count'], 2),
+                'max_ms': round(entry['max_ms'], 2),
+                'p50_ms': round(_percentile(samples, 50), 2),
+                'p95_ms': round(_percentile(samples, 95), 2),
+                'p99_ms': round(_percentile(samples, 99), 2),
+                'rows': entry['rows'],
+                'slow': entry['slow'],
+            })
+        result.sort(key=lambda item: item['total_ms'], reverse=True)
+        return result[:limit] if limit else result
+
+
+class InstrumentedCursor(extensions.cursor):
+    """Курсор, замеряющий каждый execute/executemany (и чтение строк именованного курсора)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Запрос именованного курсора, который будет записан при close():
+        # [запрос, вызывающий метод, мс, прочитано строк]
+        self._pending = None
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            if self.name is None:
+                self._record(query, started)
+            else:
+                self._begin_fetch(query, started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, started)
+
+    def _record(self, query, started):
+        duration_ms = (time.perf_counter() - started) * 1000
+        try:
+            query_stats.record(query, duration_ms, self.rowcount, _find_caller())
+        except Exception:
+            # Статистика не должна ломать сам запрос
+            pass
+
+    # ===== ИМЕНОВАННЫЕ КУРСОРЫ =====
+
+    def _begin_fetch(self, query, started):
+        self._flush_pending()
+        try:
+            caller = _find_caller()
+        except Exception:
+            caller = 'unknown'
+        self._pending = [query, caller, (time.perf_counter() - started) * 1000, 0]
+
+    def _fetched(self, started, rows):
+        if self._pending is not None:
+            self._pending[2] += (time.perf_counter() - started) * 1000
+            self._pending[3] += rows
+
+    def _flush_pending(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        query, caller, duration_ms, rows = pending
+        try:
+            query_stats.record(query, duration_ms, rows, caller)
+        except Exception:
+            pass
+
+    def __next__(self):
+        if self._pending is None:
+            return super().__next__()
+        started = time.perf_counter()
+        row = None
+        try:
+            row = super().__next__()
+            return row
+        finally:
+            self._fetched(started, 1 if row is not None else 0)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def close(self):
+        try:
+            return super().close()
+        finally:
+            self._flush_pending()
+
+
+# Глобальный экземпляр статистики запросов
+query_stats = QueryStats()
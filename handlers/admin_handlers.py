@@ -6,7 +6,7 @@ from keyboards.admin_keyboards import (
     get_keep_name_keyboard, get_confirmation_keyboard, get_back_keyboard
 )
 from keyboards.main_keyboards import get_main_keyboard
-from user_chat_manager import user_chat_manager
+from database_async import async_db
 from template_manager import load_groups
 from auth_manager import auth_manager
 from authorized_users import is_admin
@@ -28,7 +28,7 @@ async def admin_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Главное меню администрирования"""
     user_id = update.effective_user.id
     
-    if not is_admin(user_id):
+    if not await async_db.run(is_admin, user_id):
         await update.message.reply_text(
             "❌ У вас нет прав доступа к администрированию",
             reply_markup=get_main_keyboard(user_id)
@@ -82,7 +82,7 @@ async def add_user_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Проверка дубликата
         from authorized_users import check_duplicate_user
-        if check_duplicate_user(user_id):
+        if await async_db.run(check_duplicate_user, user_id):
             await update.message.reply_text(
                 f"❌ Пользователь с ID {user_id} уже существует в системе!\n"
                 f"Введите другой ID пользователя:",
@@ -152,7 +152,7 @@ async def add_user_role(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['new_user']['role'] = role_map[role_text]
     
     # Показываем список Telegram чатов
-    chats = user_chat_manager.get_all_chats()
+    chats = await async_db.get_all_chats()
     if not chats:
         await update.message.reply_text(
             "❌ В системе нет добавленных Telegram чатов.\n"
@@ -206,7 +206,7 @@ async def add_user_chats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['new_user']['selected_chats'] = valid_numbers
         
         # Показываем список групп шаблонов
-        groups_data = load_groups()
+        groups_data = await async_db.run(load_groups)
         groups = []
         for group_id, group_data in groups_data['groups'].items():
             groups.append({'id': group_id, 'name': group_data['name']})
@@ -269,7 +269,7 @@ async def add_user_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return ADD_USER_GROUPS
         
         # Сохраняем пользователя
-        success, message = user_chat_manager.add_user(
+        success, message = await async_db.add_user(
             user_data['user_id'],
             "",  # username можно оставить пустым
             user_data['full_name'],
@@ -287,12 +287,12 @@ async def add_user_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chats = context.user_data['available_chats']
         for chat_num in user_data['selected_chats']:
             chat = chats[chat_num - 1]
-            user_chat_manager.grant_chat_access(user_data['user_id'], chat['chat_id'])
+            await async_db.grant_chat_access(user_data['user_id'], chat['chat_id'])
         
         # Предоставляем доступ к выбранным группам
         for group_num in valid_numbers:
             group = groups[group_num - 1]
-            user_chat_manager.grant_template_group_access(user_data['user_id'], group['id'])
+            await async_db.grant_template_group_access(user_data['user_id'], group['id'])
         
         # Формируем отчет
         chat_names = [chats[num-1]['chat_name'] for num in user_data['selected_chats']]
@@ -326,7 +326,7 @@ async def add_user_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает список всех пользователей"""
-    users = user_chat_manager.get_all_users()
+    users = await async_db.get_all_users()
     
     if not users:
         await update.message.reply_text(
@@ -339,8 +339,8 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     for i, user in enumerate(users, 1):
         # Получаем доступы пользователя
-        user_chats = user_chat_manager.get_user_chat_access(user['user_id'])
-        user_groups = user_chat_manager.get_user_template_group_access(user['user_id'])
+        user_chats = await async_db.get_user_chat_access(user['user_id'])
+        user_groups = await async_db.get_user_template_group_access(user['user_id'])
         
         chat_names = [chat['chat_name'] for chat in user_chats]
         group_names = [group['name'] for group in user_groups]
@@ -361,7 +361,7 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def edit_user_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало редактирования пользователя"""
-    users = user_chat_manager.get_all_users()
+    users = await async_db.get_all_users()
     
     if not users:
         await update.message.reply_text(
@@ -402,8 +402,8 @@ async def edit_user_select(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data['editing_user'] = user
             
             # Получаем текущие доступы пользователя
-            user_chats = user_chat_manager.get_user_chat_access(user['user_id'])
-            user_groups = user_chat_manager.get_user_template_group_access(user['user_id'])
+            user_chats = await async_db.get_user_chat_access(user['user_id'])
+            user_groups = await async_db.get_user_template_group_access(user['user_id'])
             
             message = f"✏️ **Редактирование пользователя:**\n\n"
             message += f"👤 **{user['full_name']}** (ID: {user['user_id']})\n"
@@ -459,7 +459,7 @@ async def edit_user_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif choice == "📝 Группы шаблонов":
         # Показываем список групп для редактирования
-        groups_data = load_groups()
+        groups_data = await async_db.run(load_groups)
         groups = []
         for group_id, group_data in groups_data['groups'].items():
             groups.append({'id': group_id, 'name': group_data['name']})
@@ -472,7 +472,7 @@ async def edit_user_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return EDIT_USER_MAIN
         
         # Получаем текущие доступы пользователя
-        user_groups = user_chat_manager.get_user_template_group_access(user['user_id'])
+        user_groups = await async_db.get_user_template_group_access(user['user_id'])
         current_group_ids = [group['id'] for group in user_groups]
         
         group_list = "📋 **Текущие доступы к группам:**\n\n"
@@ -494,7 +494,7 @@ async def edit_user_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif choice == "💬 Telegram чаты":
         # Показываем список чатов для редактирования
-        chats = user_chat_manager.get_all_chats()
+        chats = await async_db.get_all_chats()
         
         if not chats:
             await update.message.reply_text(
@@ -504,7 +504,7 @@ async def edit_user_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return EDIT_USER_MAIN
         
         # Получаем текущие доступы пользователя
-        user_chats = user_chat_manager.get_user_chat_access(user['user_id'])
+        user_chats = await async_db.get_user_chat_access(user['user_id'])
         current_chat_ids = [chat['chat_id'] for chat in user_chats]
         
         chat_list = "💬 **Текущие доступы к чатам:**\n\n"
@@ -562,7 +562,7 @@ async def edit_user_role(update: Update, context: ContextTypes.DEFAULT_TYPE):
     new_role = role_map[role_text]
     
     # Обновляем роль пользователя
-    success, message = auth_manager.update_user_role(user['user_id'], new_role)
+    success, message = await async_db.run(auth_manager.update_user_role, user['user_id'], new_role)
     
     if success:
         context.user_data['editing_user']['role'] = new_role
@@ -612,12 +612,12 @@ async def edit_user_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Удаляем все текущие доступы к группам
         current_group_ids = context.user_data['current_group_ids']
         for group_id in current_group_ids:
-            user_chat_manager.revoke_template_group_access(user['user_id'], group_id)
+            await async_db.revoke_template_group_access(user['user_id'], group_id)
         
         # Предоставляем доступ к выбранным группам
         for group_num in valid_numbers:
             group = groups[group_num - 1]
-            user_chat_manager.grant_template_group_access(user['user_id'], group['id'])
+            await async_db.grant_template_group_access(user['user_id'], group['id'])
         
         await update.message.reply_text(
             f"✅ Доступ к группам обновлен!",
@@ -666,12 +666,12 @@ async def edit_user_chats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Удаляем все текущие доступы к чатам
         current_chat_ids = context.user_data['current_chat_ids']
         for chat_id in current_chat_ids:
-            user_chat_manager.revoke_chat_access(user['user_id'], chat_id)
+            await async_db.revoke_chat_access(user['user_id'], chat_id)
         
         # Предоставляем доступ к выбранным чатам
         for chat_num in valid_numbers:
             chat = chats[chat_num - 1]
-            user_chat_manager.grant_chat_access(user['user_id'], chat['chat_id'])
+            await async_db.grant_chat_access(user['user_id'], chat['chat_id'])
         
         await update.message.reply_text(
             f"✅ Доступ к чатам обновлен!",
@@ -709,7 +709,7 @@ async def save_user_edits(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def delete_user_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало удаления пользователя"""
-    users = user_chat_manager.get_all_users()
+    users = await async_db.get_all_users()
     
     if not users:
         await update.message.reply_text(
@@ -778,7 +778,7 @@ async def delete_user_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     if choice == "✅ Да":
         if user:
-            success, message = user_chat_manager.delete_user(user['user_id'])
+            success, message = await async_db.delete_user(user['user_id'])
             
             if success:
                 await update.message.reply_text(
@@ -901,7 +901,7 @@ async def add_chat_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['new_chat']['original_name'] = chat_name
     
     # Показываем список пользователей для выбора
-    users = user_chat_manager.get_all_users()
+    users = await async_db.get_all_users()
     if not users:
         await update.message.reply_text(
             "❌ В системе нет пользователей.\n"
@@ -954,7 +954,7 @@ async def add_chat_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return ADD_CHAT_USERS
         
         # Сохраняем чат
-        success, message = user_chat_manager.add_telegram_chat(
+        success, message = await async_db.add_telegram_chat(
             chat_data['chat_id'],
             chat_data['chat_name'],
             chat_data.get('original_name')
@@ -970,7 +970,7 @@ async def add_chat_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Предоставляем доступ выбранным пользователям
         for user_num in valid_numbers:
             user = users[user_num - 1]
-            user_chat_manager.grant_chat_access(user['user_id'], chat_data['chat_id'])
+            await async_db.grant_chat_access(user['user_id'], chat_data['chat_id'])
         
         # Формируем отчет
         user_names = [users[num-1]['full_name'] for num in valid_numbers]
@@ -1001,7 +1001,7 @@ async def add_chat_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def list_chats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает список всех Telegram чатов"""
-    chats = user_chat_manager.get_all_chats()
+    chats = await async_db.get_all_chats()
     
     if not chats:
         await update.message.reply_text(
@@ -1014,7 +1014,7 @@ async def list_chats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     for i, chat in enumerate(chats, 1):
         # Получаем пользователей, имеющих доступ к чату
-        chat_users = user_chat_manager.get_chat_users(chat['chat_id'])
+        chat_users = await async_db.get_chat_users(chat['chat_id'])
         user_names = [user['full_name'] for user in chat_users]
         
         message += f"{i}. **{chat['chat_name']}** (ID: {chat['chat_id']})\n"
@@ -1031,7 +1031,7 @@ async def list_chats(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def edit_chat_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало редактирования чата"""
-    chats = user_chat_manager.get_all_chats()
+    chats = await async_db.get_all_chats()
     
     if not chats:
         await update.message.reply_text(
@@ -1072,7 +1072,7 @@ async def edit_chat_select(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data['editing_chat'] = chat
             
             # Получаем текущих пользователей чата
-            chat_users = user_chat_manager.get_chat_users(chat['chat_id'])
+            chat_users = await async_db.get_chat_users(chat['chat_id'])
             
             message = f"✏️ **Редактирование чата:**\n\n"
             message += f"💬 **{chat['chat_name']}** (ID: {chat['chat_id']})\n\n"
@@ -1112,7 +1112,7 @@ async def edit_chat_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if choice == "👥 Добавить пользователя":
         # Показываем список пользователей для добавления
-        users = user_chat_manager.get_all_users()
+        users = await async_db.get_all_users()
         
         if not users:
             await update.message.reply_text(
@@ -1122,7 +1122,7 @@ async def edit_chat_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return EDIT_CHAT_MAIN
         
         # Получаем текущих пользователей чата
-        chat_users = user_chat_manager.get_chat_users(chat['chat_id'])
+        chat_users = await async_db.get_chat_users(chat['chat_id'])
         current_user_ids = [user['user_id'] for user in chat_users]
         
         user_list = "👥 **Выберите пользователя для добавления:**\n\n"
@@ -1144,7 +1144,7 @@ async def edit_chat_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif choice == "🚫 Исключить пользователя":
         # Показываем текущих пользователей чата для удаления
-        chat_users = user_chat_manager.get_chat_users(chat['chat_id'])
+        chat_users = await async_db.get_chat_users(chat['chat_id'])
         
         if not chat_users:
             await update.message.reply_text(
@@ -1198,7 +1198,7 @@ async def edit_chat_add_user(update: Update, context: ContextTypes.DEFAULT_TYPE)
             user = users[user_number - 1]
             
             # Предоставляем доступ пользователю к чату
-            success, message = user_chat_manager.grant_chat_access(user['user_id'], chat['chat_id'])
+            success, message = await async_db.grant_chat_access(user['user_id'], chat['chat_id'])
             
             if success:
                 await update.message.reply_text(
@@ -1241,7 +1241,7 @@ async def edit_chat_remove_user(update: Update, context: ContextTypes.DEFAULT_TY
             user = chat_users[user_number - 1]
             
             # Отзываем доступ пользователя к чату
-            success, message = user_chat_manager.revoke_chat_access(user['user_id'], chat['chat_id'])
+            success, message = await async_db.revoke_chat_access(user['user_id'], chat['chat_id'])
             
             if success:
                 await update.message.reply_text(
@@ -1287,7 +1287,7 @@ async def save_chat_edits(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def delete_chat_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало удаления чата"""
-    chats = user_chat_manager.get_all_chats()
+    chats = await async_db.get_all_chats()
     
     if not chats:
         await update.message.reply_text(
@@ -1356,7 +1356,7 @@ async def delete_chat_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     if choice == "✅ Да":
         if chat:
-            success, message = user_chat_manager.delete_chat(chat['chat_id'])
+            success, message = await async_db.delete_chat(chat['chat_id'])
             
             if success:
                 await update.message.reply_text(
@@ -1429,6 +1429,9 @@ async def admin_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🛠 ДЕБАГ КОМАНДЫ:
 • /admin_stats - статистика системы
 • /check_access user_id - проверка прав пользователя
+• /db_indexes - отчет по индексам базы данных
+• /db_queries - статистика запросов к базе данных (reset - сброс)
+• /cache_stats - статистика кэшей (flush имя|all - сброс)
 • /reload_config - перезагрузка конфигурации
 
 📋 ПРОЦЕСС ДОБАВЛЕНИЯ ПОЛЬЗОВАТЕЛЯ:
@@ -1465,7 +1468,7 @@ async def debug_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     print(f"🔧 DEBUG ADMIN: user_id={user_id}, text='{text}'")
     
     # Проверяем права
-    if not is_admin(user_id):
+    if not await async_db.run(is_admin, user_id):
         await update.message.reply_text("❌ Нет прав доступа")
         return ConversationHandler.END
     
@@ -1507,14 +1510,14 @@ async def debug_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает статистику системы"""
     user_id = update.effective_user.id
-    if not is_admin(user_id):
+    if not await async_db.run(is_admin, user_id):
         await update.message.reply_text("❌ У вас нет прав доступа к этой команде")
         return
     
     # Получаем статистику
-    users = user_chat_manager.get_all_users()
-    chats = user_chat_manager.get_all_chats()
-    groups_data = load_groups()
+    users = await async_db.get_all_users()
+    chats = await async_db.get_all_chats()
+    groups_data = await async_db.run(load_groups)
     groups = list(groups_data['groups'].values())
     
     # Статистика по ролям
@@ -1533,19 +1536,178 @@ async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         stats_text += f"• {role}: {count}\n"
     
     # Активность чатов
-    active_chats = [chat for chat in chats if user_chat_manager.get_chat_users(chat['chat_id'])]
+    from acl_manager import acl
+    active_chats = [chat for chat in chats if acl.get_chat_users(chat['chat_id'])]
     stats_text += f"\n💬 **Активные чаты (с пользователями):** {len(active_chats)}"
     
+    # Состояние пула соединений с БД
+    from database import db
+    pool_stats = db.get_pool_stats()
+    if pool_stats:
+        stats_text += "\n\n🗄️ **Пул соединений БД:**\n"
+        stats_text += f"• Открыто: {pool_stats['opened']} (мин {pool_stats['minconn']}, макс {pool_stats['maxconn']})\n"
+        stats_text += f"• Занято: {pool_stats['in_use']}, свободно: {pool_stats['idle']}\n"
+        stats_text += f"• Выдач: {pool_stats['checkouts']}, ожидание в среднем: {pool_stats['avg_wait_ms']} мс\n"
+        stats_text += f"• Таймаутов: {pool_stats['timeouts']}, отброшено соединений: {pool_stats['discarded']}"
+    
     await update.message.reply_text(
         stats_text,
         parse_mode='Markdown',
         reply_markup=get_admin_main_keyboard()
     )
 
+async def db_indexes(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает отчет по индексам базы данных"""
+    user_id = update.effective_user.id
+    if not await async_db.run(is_admin, user_id):
+        await update.message.reply_text("❌ У вас нет прав доступа к этой команде")
+        return
+    
+    report = await async_db.get_index_report()
+    if not report:
+        await update.message.reply_text("❌ Не удалось получить отчет по индексам")
+        return
+    
+    report_text = "🗂️ ИНДЕКСЫ БАЗЫ ДАННЫХ\n\n"
+    
+    report_text += "📋 Индексы:\n"
+    for index in report['indexes']:
+        report_text += f"• {index['table']}.{index['name']}: {index['scans']} сканирований, {index['size_bytes'] // 1024} КБ\n"
+    
+    report_text += "\n❗ Отсутствуют:\n"
+    if report['missing']:
+        for name in report['missing']:
+            report_text += f"• {name}\n"
+    else:
+        report_text += "• нет\n"
+    
+    report_text += "\n💤 Не используются:\n"
+    if report['unused']:
+        for index in report['unused']:
+            report_text += f"• {index['table']}.{index['name']}\n"
+    else:
+        report_text += "• нет\n"
+    
+    report_text += "\n🐢 Таблицы с преобладанием последовательного чтения:\n"
+    if report['seq_scan_tables']:
+        for table in report['seq_scan_tables']:
+            report_text += f"• {table['table']}: seq {table['seq_scan']} / idx {table['idx_scan']}, строк {table['rows']}\n"
+    else:
+        report_text += "• нет\n"
+    
+    await update.message.reply_text(report_text, parse_mode=None)
+
+async def db_queries(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает статистику запросов к базе данных (/db_queries reset - сброс)"""
+    user_id = update.effective_user.id
+    if not await async_db.run(is_admin, user_id):
+        await update.message.reply_text("❌ У вас нет прав доступа к этой команде")
+        return
+    
+    if context.args and context.args[0] == 'reset':
+        from database import db
+        db.reset_query_stats()
+        await update.message.reply_text("✅ Статистика запросов сброшена")
+        return
+    
+    stats = await async_db.get_query_stats(limit=10)
+    summary = stats['summary']
+    
+    stats_text = "⏱️ ЗАПРОСЫ К БАЗЕ ДАННЫХ\n\n"
+    stats_text += f"• Всего: {summary['count']}, суммарно {summary['total_ms']:.0f} мс\n"
+    stats_text += f"• p50/p95/p99: {summary['p50_ms']} / {summary['p95_ms']} / {summary['p99_ms']} мс\n"
+    stats_text += f"• Медленных (≥ {summary['slow_query_ms']:.0f} мс): {summary['slow']}\n"
+    
+    if stats['queries']:
+        stats_text += "\n🔝 Топ по суммарному времени:\n"
+        for i, query in enumerate(stats['queries'], 1):
+            stats_text += (
+                f"\n{i}. {query['caller']}\n"
+                f"   {query['count']} раз, {query['total_ms']:.0f} мс, "
+                f"p50 {query['p50_ms']} / p95 {query['p95_ms']} / p99 {query['p99_ms']} мс, "
+                f"строк {query['rows']}\n"
+                f"   {query['fingerprint'][:150]}\n"
+            )
+    
+    await update.message.reply_text(stats_text, parse_mode=None)
+
+def _load_cache_registry():
+    """Импортирует модули со всеми кэшами, чтобы они были зарегистрированы"""
+    import acl_manager, auth_manager, image_path_cache, render_cache  # noqa: F401
+    import task_repository, telegram_file_cache, template_cache  # noqa: F401
+    import keyboards.keyboard_cache  # noqa: F401
+    from cache_registry import cache_registry
+    return cache_registry
+
+def _format_cache_line(name, stats):
+    """Строка отчета /cache_stats для одного кэша"""
+    if 'error' in stats:
+        return f"• {name}: ошибка - {stats['error']}\n"
+
+    hits = stats.get('hits', 0)
+    misses = stats.get('misses', 0)
+    total = hits + misses
+    hit_rate = f"{hits * 100 / total:.1f}%" if total else "-"
+
+    line = f"• {name}: записей {stats.get('size', 0)}"
+    if stats.get('maxsize'):
+        line += f"/{stats['maxsize']}"
+    line += f", попаданий {hits}, промахов {misses} ({hit_rate})"
+    if stats.get('evictions') or stats.get('expirations'):
+        line += f", вытеснено {stats.get('evictions', 0)}, устарело {stats.get('expirations', 0)}"
+    if 'memory_bytes' in stats:
+        line += f", ~{stats['memory_bytes'] / 1024:.0f} КБ"
+    return line + "\n"
+
+async def cache_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает статистику кэшей (/cache_stats flush имя|all - сброс)"""
+    user_id = update.effective_user.id
+    if not await async_db.run(is_admin, user_id):
+        await update.message.reply_text("❌ У вас нет прав доступа к этой команде")
+        return
+    
+    registry = _load_cache_registry()
+    
+    if context.args and context.args[0] == 'flush':
+        if len(context.args) < 2:
+            await update.message.reply_text(
+                f"❌ Использование: /cache_stats flush имя|all\n"
+                f"Кэши: {', '.join(registry.names())}"
+            )
+            return
+        target = context.args[1]
+        flushed = await async_db.run(registry.flush, None if target == 'all' else target)
+        if not flushed:
+            await update.message.reply_text(
+                f"❌ Кэш {target} не найден\nКэши: {', '.join(registry.names())}"
+            )
+            return
+        await update.message.reply_text(f"✅ Сброшены кэши: {', '.join(flushed)}")
+        return
+    
+    report = await async_db.run(registry.report)
+    
+    stats_text = "🧠 КЭШИ\n\n"
+    for name, stats in report.items():
+        stats_text += _format_cache_line(name, stats)
+    
+    total_memory = sum(stats.get('memory_bytes', 0) for stats in report.values())
+    stats_text += f"\n💾 Всего в памяти: ~{total_memory / 1024:.0f} КБ\n"
+    
+    from cache_bus import cache_bus
+    bus = cache_bus.stats()
+    stats_text += (
+        f"📡 Шина кэшей: {'работает' if bus['running'] else 'остановлена'}, "
+        f"событий {bus['received']}, применено {bus['applied']}, "
+        f"переподключений {bus['reconnects']}\n"
+    )
+    
+    await update.message.reply_text(stats_text, parse_mode=None)
+
 async def check_access(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Проверяет права доступа пользователя"""
     user_id = update.effective_user.id
-    if not is_admin(user_id):
+    if not await async_db.run(is_admin, user_id):
         await update.message.reply_text("❌ У вас нет прав доступа к этой команде")
         return
     
@@ -1557,7 +1719,7 @@ async def check_access(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_user_id = int(context.args[0])
         
         # Получаем информацию о пользователе
-        users = user_chat_manager.get_all_users()
+        users = await async_db.get_all_users()
         target_user = None
         for user in users:
             if user['user_id'] == target_user_id:
@@ -1569,8 +1731,8 @@ async def check_access(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         # Получаем доступы пользователя
-        user_chats = user_chat_manager.get_user_chat_access(target_user_id)
-        user_groups = user_chat_manager.get_user_template_group_access(target_user_id)
+        user_chats = await async_db.get_user_chat_access(target_user_id)
+        user_groups = await async_db.get_user_template_group_access(target_user_id)
         
         access_text = f"🔍 **ПРАВА ДОСТУПА ПОЛЬЗОВАТЕЛЯ**\n\n"
         access_text += f"👤 **Пользователь:** {target_user['full_name']}\n"
@@ -2,6 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from keyboards.main_keyboards import get_main_keyboard
 from auth_manager import auth_manager
+from database_async import async_db
 
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает текстовые сообщения для навигации по меню"""
@@ -11,7 +12,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     print(f"🔤 Обработка текста: '{text}' от user_id: {user_id}")
 
     # Гарантируем права администратора для суперадмина при каждом действии
-    auth_manager.update_user_role_if_needed(user_id)
+    await async_db.run(auth_manager.update_user_role_if_needed, user_id)
 
     # Обработка основных команд меню
     if text == "📋 Шаблоны":
@@ -59,7 +60,7 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
     # Гарантируем права администратора для суперадмина
-    auth_manager.update_user_role_if_needed(user_id)
+    await async_db.run(auth_manager.update_user_role_if_needed, user_id)
     
     # Очищаем временные данные
     context.user_data.clear()
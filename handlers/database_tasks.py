@@ -12,14 +12,9 @@ class TaskDatabaseManager:
             print("❌ DATABASE_URL не найден в переменных окружения")
         
     def get_connection(self):
-        """Возвращает соединение с базой данных"""
-        try:
-            conn = psycopg2.connect(self.connection_string)
-            return conn
-        except Exception as e:
-            logging.error(f"❌ Ошибка подключения к базе данных: {e}")
-            print(f"❌ Ошибка подключения к базе данных: {e}")
-            return None
+        """Возвращает соединение из общего пула базы данных"""
+        from database import db
+        return db.get_connection()
     
     def init_tasks_table(self):
         """Инициализирует таблицу задач в базе данных"""
@@ -18,11 +18,12 @@ from template_manager import (
 from task_manager import (
     create_task_from_template, get_active_tasks_by_group,
     deactivate_task, format_task_info, get_user_accessible_tasks,
-    format_task_list_info, create_task_with_schedule
+    format_task_list_info, create_task_with_schedule, get_user_task_list
 )
 from task_models import TaskData
 from task_validators import TaskValidator
 from auth_manager import auth_manager
+from database_async import async_db
 from chat_access_manager import chat_access_manager
 
 # Состояния для ConversationHandler задач
@@ -39,7 +40,7 @@ from chat_access_manager import chat_access_manager
 async def enhanced_tasks_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Главное меню задач"""
     user_id = update.effective_user.id
-    auth_manager.update_user_role_if_needed(user_id)
+    await async_db.run(auth_manager.update_user_role_if_needed, user_id)
     
     await update.message.reply_text(
         "📋 **Управление задачами**\n\n"
@@ -54,7 +55,7 @@ async def enhanced_tasks_main(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def enhanced_create_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало создания задачи с новой структурой"""
     user_id = update.effective_user.id
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -83,7 +84,8 @@ async def enhanced_create_task_start(update: Update, context: ContextTypes.DEFAU
             'week_days': [],
             'month_days': [],
             'schedule_type': None,
-            'frequency': 'weekly'
+            'frequency': 'weekly',
+            'misfire_policy': 'once'
         }
     }
     
@@ -91,7 +93,7 @@ async def enhanced_create_task_start(update: Update, context: ContextTypes.DEFAU
         "➕ **Создание новой задачи**\n\n"
         "Шаг 1 из 6: Выберите группу шаблонов:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "task")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "task")
     )
     return CREATE_TASK_GROUP
 
@@ -109,7 +111,7 @@ async def enhanced_create_task_select_group(update: Update, context: ContextType
     group_name = user_text.replace("🏷️ ", "").strip()
     
     # Находим ID группы по имени
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     for gid, gdata in accessible_groups.items():
         if gdata['name'] == group_name:
@@ -119,7 +121,7 @@ async def enhanced_create_task_select_group(update: Update, context: ContextType
     if not group_id:
         await update.message.reply_text(
             "❌ Группа шаблонов не найдена",
-            reply_markup=get_groups_keyboard(user_id, "task")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "task")
         )
         return CREATE_TASK_GROUP
     
@@ -128,7 +130,7 @@ async def enhanced_create_task_select_group(update: Update, context: ContextType
     context.user_data['task_creation']['group_name'] = group_name
     
     # Получаем шаблоны этой группы
-    templates = get_templates_by_group(group_id)
+    templates = await async_db.run(get_templates_by_group, group_id)
     
     if not templates:
         await update.message.reply_text(
@@ -163,7 +165,7 @@ async def enhanced_create_task_select_template(update: Update, context: ContextT
     if template_text == "🔙 Назад":
         await update.message.reply_text(
             "🔄 Возврат к выбору группы шаблонов",
-            reply_markup=get_groups_keyboard(user_id, "task")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "task")
         )
         return CREATE_TASK_GROUP
     
@@ -177,7 +179,7 @@ async def enhanced_create_task_select_template(update: Update, context: ContextT
     group_id = context.user_data['task_creation']['group']
     
     # Ищем шаблон по имени в этой группе
-    template_id, template_data = get_template_by_name_and_group(template_name, group_id)
+    template_id, template_data = await async_db.run(get_template_by_name_and_group, template_name, group_id)
     
     if not template_data:
         await update.message.reply_text(
@@ -212,7 +214,7 @@ async def enhanced_create_task_select_chat(update: Update, context: ContextTypes
     if user_text == "🔙 Назад":
         # Возвращаемся к выбору шаблона
         group_id = context.user_data['task_creation']['group']
-        templates = get_templates_by_group(group_id)
+        templates = await async_db.run(get_templates_by_group, group_id)
         
         keyboard = []
         for template_id, template in templates:
@@ -504,7 +506,8 @@ async def show_enhanced_task_confirmation(update: Update, context: ContextTypes.
             'week_days': [],
             'month_days': [],
             'schedule_type': None,
-            'frequency': 'weekly'
+            'frequency': 'weekly',
+            'misfire_policy': 'once'
         }
     
     template = task_data['template']
@@ -566,7 +569,8 @@ async def enhanced_create_task_confirm(update: Update, context: ContextTypes.DEF
     if user_choice == "✅ Подтвердить":
         try:
             # Создаем задачу с указанием целевого чата и расписания
-            success, task_id = create_task_with_schedule(
+            success, task_id = await async_db.run(
+                create_task_with_schedule,
                 template_data=template,
                 created_by=task_data['created_by'],
                 target_chat_id=task_data.get('target_chat_id'),
@@ -634,8 +638,8 @@ async def show_tasks_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает статус всех активных задач"""
     user_id = update.effective_user.id
     
-    # Получаем доступные задачи пользователя
-    accessible_tasks = get_user_accessible_tasks(user_id)
+    # Получаем доступные задачи пользователя (список кэшируется)
+    accessible_tasks = await async_db.run(get_user_task_list, user_id)
     
     if not accessible_tasks:
         await update.message.reply_text(
@@ -660,7 +664,7 @@ async def show_tasks_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def enhanced_deactivate_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало деактивации задачи"""
     user_id = update.effective_user.id
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -673,7 +677,7 @@ async def enhanced_deactivate_task_start(update: Update, context: ContextTypes.D
         "🗑️ **Отмена задачи**\n\n"
         "Выберите группу шаблонов:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "deactivate")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "deactivate")
     )
     return DEACTIVATE_TASK_GROUP
 
@@ -691,7 +695,7 @@ async def enhanced_deactivate_task_select_group(update: Update, context: Context
     group_name = user_text.replace("🏷️ ", "").strip()
     
     # Находим ID группы по имени
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     for gid, gdata in accessible_groups.items():
         if gdata['name'] == group_name:
@@ -701,7 +705,7 @@ async def enhanced_deactivate_task_select_group(update: Update, context: Context
     if not group_id:
         await update.message.reply_text(
             "❌ Группа шаблонов не найдена",
-            reply_markup=get_groups_keyboard(user_id, "deactivate")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "deactivate")
         )
         return DEACTIVATE_TASK_GROUP
     
@@ -710,7 +714,7 @@ async def enhanced_deactivate_task_select_group(update: Update, context: Context
     context.user_data['deactivate_group_name'] = group_name
     
     # Получаем активные задачи этой группы
-    tasks = get_active_tasks_by_group(group_id)
+    tasks = await async_db.run(get_active_tasks_by_group, group_id)
     
     if not tasks:
         await update.message.reply_text(
@@ -743,7 +747,7 @@ async def enhanced_deactivate_task_select_task(update: Update, context: ContextT
         user_id = update.effective_user.id
         await update.message.reply_text(
             "🔄 Возврат к выбору группы шаблонов",
-            reply_markup=get_groups_keyboard(user_id, "deactivate")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "deactivate")
         )
         return DEACTIVATE_TASK_GROUP
     
@@ -757,7 +761,7 @@ async def enhanced_deactivate_task_select_task(update: Update, context: ContextT
     group_id = context.user_data.get('deactivate_group')
     
     # Ищем задачу по имени шаблона в этой группе
-    tasks = get_active_tasks_by_group(group_id)
+    tasks = await async_db.run(get_active_tasks_by_group, group_id)
     task_id = None
     task_data = None
     
@@ -798,7 +802,7 @@ async def enhanced_deactivate_task_confirm(update: Update, context: ContextTypes
     
     if user_choice == "✅ Да, отменить задачу":
         if task_id and task:
-            success, message = deactivate_task(task_id)
+            success, message = await async_db.run(deactivate_task, task_id)
             
             if success:
                 await update.message.reply_text(
@@ -838,7 +842,7 @@ async def enhanced_deactivate_task_confirm(update: Update, context: ContextTypes
 async def enhanced_test_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало тестирования задачи с выбором чата"""
     user_id = update.effective_user.id
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -866,7 +870,7 @@ async def enhanced_test_task_start(update: Update, context: ContextTypes.DEFAULT
         "🧪 **Тестирование задачи**\n\n"
         "Шаг 1 из 3: Выберите группу шаблонов:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "test")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "test")
     )
     return TEST_TASK_GROUP
 
@@ -886,7 +890,7 @@ async def enhanced_test_task_select_chat(update: Update, context: ContextTypes.D
     if user_text == "🔙 Назад":
         # Возвращаемся к выбору шаблона
         group_id = context.user_data['task_creation']['group']
-        templates = get_templates_by_group(group_id)
+        templates = await async_db.run(get_templates_by_group, group_id)
         
         keyboard = []
         for template_id, template in templates:
@@ -949,7 +953,8 @@ async def enhanced_test_task_confirm(update: Update, context: ContextTypes.DEFAU
     if user_choice == "✅ Подтвердить":
         try:
             # Создаем тестовую задачу
-            success, task_id = create_task_from_template(
+            success, task_id = await async_db.run(
+                create_task_from_template,
                 template_data=template,
                 created_by=task_data['created_by'],
                 target_chat_id=task_data.get('target_chat_id'),
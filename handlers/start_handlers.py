@@ -2,6 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from keyboards.main_keyboards import get_main_keyboard
 from auth_manager import auth_manager
+from database_async import async_db
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
@@ -11,7 +12,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     print(f"🚀 Пользователь {user_id} запустил бота")
     
     # Гарантируем права администратора для суперадмина
-    auth_manager.update_user_role_if_needed(user_id)
+    await async_db.run(auth_manager.update_user_role_if_needed, user_id)
     
     welcome_text = (
         f"👋 Привет, {user.first_name}!\n\n"
@@ -76,12 +77,12 @@ async def my_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Получаем информацию о правах доступа
     from auth_manager import auth_manager
-    user_role = auth_manager.get_user_role(user_id)
+    user_role = await async_db.run(auth_manager.get_user_role, user_id)
     
     # Получаем доступные группы и чаты
     from authorized_users import get_user_access_groups, get_user_accessible_chats
-    accessible_groups = get_user_access_groups(user_id)
-    accessible_chats = get_user_accessible_chats(user_id)
+    accessible_groups = await async_db.run(get_user_access_groups, user_id)
+    accessible_chats = await async_db.run(get_user_accessible_chats, user_id)
     
     # Определяем тип чата
     chat_type = "личные сообщения"
@@ -112,8 +113,7 @@ async def my_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Добавляем список доступных чатов, если их немного
     if accessible_chats and len(accessible_chats) <= 5:
         message += "\n\n📋 ВАШИ ДОСТУПНЫЕ ЧАТЫ:\n"
-        from user_chat_manager import user_chat_manager
-        user_chats = user_chat_manager.get_user_chat_access(user_id)
+        user_chats = await async_db.get_user_chat_access(user_id)
         for i, chat_info in enumerate(user_chats, 1):
             message += f"{i}. {chat_info['chat_name']} (ID: {chat_info['chat_id']})\n"
     
@@ -15,6 +15,7 @@ from task_manager import (
     deactivate_task, format_task_info, get_all_active_tasks
 )
 from auth_manager import auth_manager
+from database_async import async_db
 
 # Состояния для ConversationHandler задач
 (
@@ -28,7 +29,7 @@ from auth_manager import auth_manager
 async def tasks_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Главное меню задач"""
     user_id = update.effective_user.id
-    auth_manager.update_user_role_if_needed(user_id)
+    await async_db.run(auth_manager.update_user_role_if_needed, user_id)
     
     await update.message.reply_text(
         "📋 **Управление задачами**\n\n"
@@ -43,7 +44,7 @@ async def tasks_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def create_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало создания задачи"""
     user_id = update.effective_user.id
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -62,7 +63,7 @@ async def create_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "➕ **Создание новой задачи**\n\n"
         "Выберите группу:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "task")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "task")
     )
     return CREATE_TASK_GROUP
 
@@ -82,7 +83,7 @@ async def create_task_select_group(update: Update, context: ContextTypes.DEFAULT
     group_name = user_text.replace("🏷️ ", "").strip()
     
     # Находим ID группы по имени
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     for gid, gdata in accessible_groups.items():
         if gdata['name'] == group_name:
@@ -92,7 +93,7 @@ async def create_task_select_group(update: Update, context: ContextTypes.DEFAULT
     if not group_id:
         await update.message.reply_text(
             "❌ Группа не найдена",
-            reply_markup=get_groups_keyboard(user_id, "task")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "task")
         )
         return CREATE_TASK_GROUP
     
@@ -100,7 +101,7 @@ async def create_task_select_group(update: Update, context: ContextTypes.DEFAULT
     context.user_data['task_creation']['group'] = group_id
     
     # Получаем шаблоны этой группы
-    templates = get_templates_by_group(group_id)
+    templates = await async_db.run(get_templates_by_group, group_id)
     
     if not templates:
         await update.message.reply_text(
@@ -137,7 +138,7 @@ async def create_task_select_template(update: Update, context: ContextTypes.DEFA
     if template_text == "🔙 Назад":
         await update.message.reply_text(
             "🔄 Возврат к выбору группы",
-            reply_markup=get_groups_keyboard(user_id, "task")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "task")
         )
         return CREATE_TASK_GROUP
     
@@ -151,7 +152,7 @@ async def create_task_select_template(update: Update, context: ContextTypes.DEFA
     group_id = context.user_data['task_creation']['group']
     
     # Ищем шаблон по имени в этой группе
-    template_id, template_data = get_template_by_name_and_group(template_name, group_id)
+    template_id, template_data = await async_db.run(get_template_by_name_and_group, template_name, group_id)
     
     if not template_data:
         await update.message.reply_text(
@@ -214,7 +215,8 @@ async def create_task_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     template = task_data['template']
     
     if user_choice == "✅ Подтвердить":
-        success, task_id = create_task_from_template(
+        success, task_id = await async_db.run(
+            create_task_from_template,
             template, 
             task_data['created_by'],
             is_test=task_data.get('is_test', False)
@@ -249,7 +251,7 @@ async def create_task_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     elif user_choice == "🔙 Назад":
         # Возвращаемся к выбору шаблона
         group_id = context.user_data['task_creation']['group']
-        templates = get_templates_by_group(group_id)
+        templates = await async_db.run(get_templates_by_group, group_id)
         
         keyboard = []
         for template_id, template in templates:
@@ -290,13 +292,13 @@ async def create_task_edit_choice(update: Update, context: ContextTypes.DEFAULT_
         user_id = update.effective_user.id
         await update.message.reply_text(
             "🔄 **Выберите новую группу:**",
-            reply_markup=get_groups_keyboard(user_id, "task")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "task")
         )
         return CREATE_TASK_GROUP
     
     elif choice == "📝 Выбрать другой шаблон":
         group_id = context.user_data['task_creation']['group']
-        templates = get_templates_by_group(group_id)
+        templates = await async_db.run(get_templates_by_group, group_id)
         
         # Создаем клавиатуру с шаблонами
         keyboard = []
@@ -331,7 +333,7 @@ async def create_task_edit_choice(update: Update, context: ContextTypes.DEFAULT_
 async def deactivate_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало деактивации задачи"""
     user_id = update.effective_user.id
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -344,7 +346,7 @@ async def deactivate_task_start(update: Update, context: ContextTypes.DEFAULT_TY
         "🗑️ **Отмена задачи**\n\n"
         "Выберите группу:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "deactivate")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "deactivate")
     )
     return DEACTIVATE_TASK_GROUP
 
@@ -362,7 +364,7 @@ async def deactivate_task_select_group(update: Update, context: ContextTypes.DEF
     group_name = user_text.replace("🏷️ ", "").strip()
     
     # Находим ID группы по имени
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     for gid, gdata in accessible_groups.items():
         if gdata['name'] == group_name:
@@ -372,7 +374,7 @@ async def deactivate_task_select_group(update: Update, context: ContextTypes.DEF
     if not group_id:
         await update.message.reply_text(
             "❌ Группа не найдена",
-            reply_markup=get_groups_keyboard(user_id, "deactivate")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "deactivate")
         )
         return DEACTIVATE_TASK_GROUP
     
@@ -380,7 +382,7 @@ async def deactivate_task_select_group(update: Update, context: ContextTypes.DEF
     context.user_data['deactivate_group'] = group_id
     
     # Получаем активные задачи этой группы
-    tasks = get_active_tasks_by_group(group_id)
+    tasks = await async_db.run(get_active_tasks_by_group, group_id)
     
     if not tasks:
         await update.message.reply_text(
@@ -413,7 +415,7 @@ async def deactivate_task_select_task(update: Update, context: ContextTypes.DEFA
         user_id = update.effective_user.id
         await update.message.reply_text(
             "🔄 Возврат к выбору группы",
-            reply_markup=get_groups_keyboard(user_id, "deactivate")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "deactivate")
         )
         return DEACTIVATE_TASK_GROUP
     
@@ -427,7 +429,7 @@ async def deactivate_task_select_task(update: Update, context: ContextTypes.DEFA
     group_id = context.user_data.get('deactivate_group')
     
     # Ищем задачу по имени шаблона в этой группе
-    tasks = get_active_tasks_by_group(group_id)
+    tasks = await async_db.run(get_active_tasks_by_group, group_id)
     task_id = None
     task_data = None
     
@@ -476,7 +478,7 @@ async def deactivate_task_confirm(update: Update, context: ContextTypes.DEFAULT_
     
     if user_choice == "✅ Да, отменить задачу":
         if task_id and task:
-            success, message = deactivate_task(task_id)
+            success, message = await async_db.run(deactivate_task, task_id)
             
             if success:
                 await update.message.reply_text(
@@ -516,7 +518,7 @@ async def deactivate_task_confirm(update: Update, context: ContextTypes.DEFAULT_
 async def test_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Начало тестирования задачи"""
     user_id = update.effective_user.id
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -534,7 +536,7 @@ async def test_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🧪 **Тестирование задачи**\n\n"
         "Выберите группу:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "test")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "test")
     )
     return TEST_TASK_GROUP
 
@@ -553,7 +555,8 @@ async def test_task_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     template = task_data['template']
     
     if user_choice == "✅ Подтвердить":
-        success, task_id = create_task_from_template(
+        success, task_id = await async_db.run(
+            create_task_from_template,
             template, 
             task_data['created_by'],
             is_test=task_data.get('is_test', True)
@@ -590,7 +593,7 @@ async def test_task_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif user_choice == "🔙 Назад":
         # Возвращаемся к выбору шаблона
         group_id = context.user_data['task_creation']['group']
-        templates = get_templates_by_group(group_id)
+        templates = await async_db.run(get_templates_by_group, group_id)
         
         keyboard = []
         for template_id, template in templates:
@@ -614,7 +617,7 @@ async def test_task_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_tasks_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает статус всех активных задач"""
-    active_tasks = get_all_active_tasks()
+    active_tasks = await async_db.run(get_all_active_tasks)
     
     if not active_tasks:
         await update.message.reply_text(
@@ -9,6 +9,7 @@ from keyboards.template_keyboards import (
 from keyboards.main_keyboards import get_main_keyboard
 from template_manager_simplified import simplified_template_manager
 from auth_manager import auth_manager
+from database_async import async_db
 
 # === СОСТОЯНИЯ CONVERSATION HANDLER === 
 (
@@ -25,7 +26,7 @@ from auth_manager import auth_manager
 async def templates_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Главное меню шаблонов (уровень 2)"""
     user_id = update.effective_user.id
-    auth_manager.update_user_role_if_needed(user_id)
+    await async_db.run(auth_manager.update_user_role_if_needed, user_id)
     
     await update.message.reply_text(
         "📋 **Управление шаблонами**\n\n"
@@ -53,7 +54,7 @@ async def template_list_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Получаем все доступные группы
     from template_manager import get_user_accessible_groups
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -63,7 +64,7 @@ async def template_list_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return TEMPLATE_LIST_MENU
     
     # Получаем все шаблоны
-    all_templates = simplified_template_manager.load_templates()
+    all_templates = await async_db.run(simplified_template_manager.load_templates)
     
     # Фильтруем шаблоны по доступным группам
     user_templates = {}
@@ -104,7 +105,7 @@ async def template_list_by_group_start(update: Update, context: ContextTypes.DEF
     """Начало просмотра шаблонов по группам"""
     user_id = update.effective_user.id
     from template_manager import get_user_accessible_groups
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -117,7 +118,7 @@ async def template_list_by_group_start(update: Update, context: ContextTypes.DEF
         "🏷️ **Просмотр шаблонов по группам**\n\n"
         "Выберите группу шаблонов:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "list")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "list")
     )
     return TEMPLATE_LIST_BY_GROUP
 
@@ -138,7 +139,7 @@ async def template_list_by_group_show(update: Update, context: ContextTypes.DEFA
     
     # Находим ID группы по имени
     from template_manager import get_user_accessible_groups, get_templates_by_group
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     for gid, gdata in accessible_groups.items():
         if gdata['name'] == group_name:
@@ -148,17 +149,17 @@ async def template_list_by_group_show(update: Update, context: ContextTypes.DEFA
     if not group_id:
         await update.message.reply_text(
             "❌ Группа шаблонов не найдена",
-            reply_markup=get_groups_keyboard(user_id, "list")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "list")
         )
         return TEMPLATE_LIST_BY_GROUP
     
     # Получаем шаблоны группы
-    templates = get_templates_by_group(group_id)
+    templates = await async_db.run(get_templates_by_group, group_id)
     
     if not templates:
         await update.message.reply_text(
             f"📭 В группе шаблонов '{group_name}' нет шаблонов",
-            reply_markup=get_groups_keyboard(user_id, "list")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "list")
         )
         return TEMPLATE_LIST_BY_GROUP
     
@@ -176,7 +177,7 @@ async def template_list_by_group_show(update: Update, context: ContextTypes.DEFA
     await update.message.reply_text(
         message,
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "list")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "list")
     )
     return TEMPLATE_LIST_BY_GROUP
 
@@ -186,7 +187,7 @@ async def create_template_start(update: Update, context: ContextTypes.DEFAULT_TY
     """Начало создания шаблона"""
     user_id = update.effective_user.id
     from template_manager import get_user_accessible_groups
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -204,7 +205,7 @@ async def create_template_start(update: Update, context: ContextTypes.DEFAULT_TY
         "➕ **Создание нового шаблона**\n\n"
         "Шаг 1 из 5: Выберите группу шаблонов:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "create")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "create")
     )
     return CREATE_TEMPLATE_GROUP
 
@@ -222,7 +223,7 @@ async def create_template_choose_group(update: Update, context: ContextTypes.DEF
     
     # Находим ID группы по имени
     from template_manager import get_user_accessible_groups
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     group_data = None
     
@@ -235,7 +236,7 @@ async def create_template_choose_group(update: Update, context: ContextTypes.DEF
     if not group_id:
         await update.message.reply_text(
             "❌ Группа шаблонов не найдена",
-            reply_markup=get_groups_keyboard(user_id, "create")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "create")
         )
         return CREATE_TEMPLATE_GROUP
     
@@ -257,7 +258,7 @@ async def create_template_name(update: Update, context: ContextTypes.DEFAULT_TYP
         user_id = update.effective_user.id
         await update.message.reply_text(
             "🔄 Возврат к выбору группы шаблонов:",
-            reply_markup=get_groups_keyboard(user_id, "create")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "create")
         )
         return CREATE_TEMPLATE_GROUP
     
@@ -271,7 +272,7 @@ async def create_template_name(update: Update, context: ContextTypes.DEFAULT_TYP
     # Проверяем, нет ли уже шаблона с таким именем в группе
     group_id = context.user_data['new_template']['group']
     from template_manager import template_exists
-    if template_exists(name, group_id):
+    if await async_db.run(template_exists, name, group_id):
         await update.message.reply_text(
             "❌ Шаблон с таким названием уже существует в этой группе.\n"
             "Пожалуйста, введите другое название:",
@@ -334,7 +335,7 @@ async def create_template_image(update: Update, context: ContextTypes.DEFAULT_TY
             photo_bytes = await photo_file.download_as_bytearray()
             
             # Сохраняем изображение
-            image_path = simplified_template_manager.save_image(photo_bytes, temp_id)
+            image_path = await async_db.run(simplified_template_manager.save_image, photo_bytes, temp_id)
             
             if image_path:
                 context.user_data['new_template']['image'] = image_path
@@ -388,18 +389,18 @@ async def create_template_confirm(update: Update, context: ContextTypes.DEFAULT_
         if template_data.get('image') and 'temp_' in template_data['image']:
             # Создаем шаблон сначала без изображения
             temp_image = template_data.pop('image')
-            success, template_id = simplified_template_manager.create_template(template_data)
+            success, template_id = await async_db.run(simplified_template_manager.create_template, template_data)
             
             if success:
                 # Сохраняем изображение с правильным ID
                 with open(temp_image, 'rb') as f:
                     image_bytes = f.read()
-                final_image_path = simplified_template_manager.save_image(image_bytes, template_id)
+                final_image_path = await async_db.run(simplified_template_manager.save_image, image_bytes, template_id)
                 
                 if final_image_path:
                     # Обновляем шаблон с правильным путем к изображению
                     template_data['image'] = final_image_path
-                    simplified_template_manager.save_template(template_data)
+                    await async_db.run(simplified_template_manager.save_template, template_data)
                 
                 # Удаляем временный файл
                 import os
@@ -412,7 +413,7 @@ async def create_template_confirm(update: Update, context: ContextTypes.DEFAULT_
                 )
                 return TEMPLATES_MAIN
         else:
-            success, template_id = simplified_template_manager.create_template(template_data)
+            success, template_id = await async_db.run(simplified_template_manager.create_template, template_data)
         
         if success:
             await update.message.reply_text(
@@ -463,7 +464,7 @@ async def edit_template_start(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Начало редактирования шаблона"""
     user_id = update.effective_user.id
     from template_manager import get_user_accessible_groups
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -476,7 +477,7 @@ async def edit_template_start(update: Update, context: ContextTypes.DEFAULT_TYPE
         "✏️ **Редактирование шаблона**\n\n"
         "Выберите группу шаблонов:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "edit")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "edit")
     )
     return EDIT_TEMPLATE_SELECT_GROUP
 
@@ -494,7 +495,7 @@ async def edit_template_select_group(update: Update, context: ContextTypes.DEFAU
     
     # Находим ID группы по имени
     from template_manager import get_user_accessible_groups, get_templates_by_group
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     group_data = None
     
@@ -507,12 +508,12 @@ async def edit_template_select_group(update: Update, context: ContextTypes.DEFAU
     if not group_id:
         await update.message.reply_text(
             "❌ Группа шаблонов не найдена",
-            reply_markup=get_groups_keyboard(user_id, "edit")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "edit")
         )
         return EDIT_TEMPLATE_SELECT_GROUP
     
     # Получаем шаблоны этой группы
-    templates = get_templates_by_group(group_id)
+    templates = await async_db.run(get_templates_by_group, group_id)
     
     if not templates:
         await update.message.reply_text(
@@ -548,7 +549,7 @@ async def edit_template_select(update: Update, context: ContextTypes.DEFAULT_TYP
         user_id = update.effective_user.id
         await update.message.reply_text(
             "🔄 Возврат к выбору группы шаблонов:",
-            reply_markup=get_groups_keyboard(user_id, "edit")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "edit")
         )
         return EDIT_TEMPLATE_SELECT_GROUP
     
@@ -565,7 +566,7 @@ async def edit_template_select(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Находим шаблон по имени и группе
     from template_manager import get_template_by_name_and_group
-    template_id, template = get_template_by_name_and_group(template_name, group_id)
+    template_id, template = await async_db.run(get_template_by_name_and_group, template_name, group_id)
     
     if not template_id or not template:
         await update.message.reply_text(
@@ -611,7 +612,7 @@ async def edit_template_choose_field(update: Update, context: ContextTypes.DEFAU
         group_name = context.user_data.get('edit_group_name', 'группы')
         keyboard = []
         from template_manager import get_templates_by_group
-        templates = get_templates_by_group(context.user_data['edit_group_id'])
+        templates = await async_db.run(get_templates_by_group, context.user_data['edit_group_id'])
         for template_id, template_data in templates:
             keyboard.append([f"📝 {template_data['name']}"])
         keyboard.append(["🔙 Назад"])
@@ -675,7 +676,7 @@ async def edit_template_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Проверяем, нет ли уже шаблона с таким именем в группе
     group_id = context.user_data['editing_template']['group']
     from template_manager import template_exists
-    if template_exists(new_name, group_id) and new_name != context.user_data['editing_template']['name']:
+    if await async_db.run(template_exists, new_name, group_id) and new_name != context.user_data['editing_template']['name']:
         await update.message.reply_text(
             "❌ Шаблон с таким названием уже существует в этой группе.\n"
             "Пожалуйста, введите другое название:",
@@ -726,7 +727,7 @@ async def edit_template_image(update: Update, context: ContextTypes.DEFAULT_TYPE
         # Удаляем изображение из шаблона
         old_image = context.user_data['editing_template'].get('image')
         if old_image:
-            simplified_template_manager.delete_image(old_image)
+            await async_db.run(simplified_template_manager.delete_image, old_image)
         context.user_data['editing_template']['image'] = None
         
         await update.message.reply_text(
@@ -741,13 +742,13 @@ async def edit_template_image(update: Update, context: ContextTypes.DEFAULT_TYPE
         photo_content = await photo_file.download_as_bytearray()
         
         template_id = context.user_data.get('editing_template_id')
-        image_path = simplified_template_manager.save_image(photo_content, template_id)
+        image_path = await async_db.run(simplified_template_manager.save_image, photo_content, template_id)
         
         if image_path:
             # Удаляем старое изображение если было
             old_image = context.user_data['editing_template'].get('image')
             if old_image:
-                simplified_template_manager.delete_image(old_image)
+                await async_db.run(simplified_template_manager.delete_image, old_image)
             
             # Обновляем данные в контексте
             context.user_data['editing_template']['image'] = image_path
@@ -777,7 +778,7 @@ async def save_edited_template(update: Update, context: ContextTypes.DEFAULT_TYP
     
     if template_id:
         # Обновляем существующий шаблон
-        success = simplified_template_manager.save_template(template_data)
+        success = await async_db.run(simplified_template_manager.save_template, template_data)
         
         if success:
             await update.message.reply_text(
@@ -807,7 +808,7 @@ async def delete_template_start(update: Update, context: ContextTypes.DEFAULT_TY
     """Начало удаления шаблона"""
     user_id = update.effective_user.id
     from template_manager import get_user_accessible_groups
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     
     if not accessible_groups:
         await update.message.reply_text(
@@ -820,7 +821,7 @@ async def delete_template_start(update: Update, context: ContextTypes.DEFAULT_TY
         "🗑️ **Удаление шаблона**\n\n"
         "Выберите группу шаблонов:",
         parse_mode='Markdown',
-        reply_markup=get_groups_keyboard(user_id, "delete")
+        reply_markup=await async_db.run(get_groups_keyboard, user_id, "delete")
     )
     return DELETE_TEMPLATE_SELECT_GROUP
 
@@ -838,7 +839,7 @@ async def delete_template_select_group(update: Update, context: ContextTypes.DEF
     
     # Находим ID группы по имени
     from template_manager import get_user_accessible_groups, get_templates_by_group
-    accessible_groups = get_user_accessible_groups(user_id)
+    accessible_groups = await async_db.run(get_user_accessible_groups, user_id)
     group_id = None
     group_data = None
     
@@ -851,12 +852,12 @@ async def delete_template_select_group(update: Update, context: ContextTypes.DEF
     if not group_id:
         await update.message.reply_text(
             "❌ Группа шаблонов не найдена",
-            reply_markup=get_groups_keyboard(user_id, "delete")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "delete")
         )
         return DELETE_TEMPLATE_SELECT_GROUP
     
     # Получаем шаблоны этой группы
-    templates = get_templates_by_group(group_id)
+    templates = await async_db.run(get_templates_by_group, group_id)
     
     if not templates:
         await update.message.reply_text(
@@ -892,7 +893,7 @@ async def delete_template_select(update: Update, context: ContextTypes.DEFAULT_T
         user_id = update.effective_user.id
         await update.message.reply_text(
             "🔄 Возврат к выбору группы шаблонов:",
-            reply_markup=get_groups_keyboard(user_id, "delete")
+            reply_markup=await async_db.run(get_groups_keyboard, user_id, "delete")
         )
         return DELETE_TEMPLATE_SELECT_GROUP
     
@@ -909,7 +910,7 @@ async def delete_template_select(update: Update, context: ContextTypes.DEFAULT_T
     
     # Находим шаблон по имени и группе
     from template_manager import get_template_by_name_and_group
-    template_id, template = get_template_by_name_and_group(template_name, group_id)
+    template_id, template = await async_db.run(get_template_by_name_and_group, template_name, group_id)
     
     if not template_id or not template:
         await update.message.reply_text(
@@ -947,24 +948,15 @@ async def delete_template_confirm(update: Update, context: ContextTypes.DEFAULT_
         if template_id and template:
             print(f"🔄 Попытка удаления шаблона: {template_id}")
             
-            # ПРОСТАЯ ВЕРСИЯ - используем прямую работу с БД
             try:
-                from database import db
-                conn = db.get_connection()
-                if conn:
-                    cursor = conn.cursor()
-                    cursor.execute('DELETE FROM templates WHERE id = %s', (template_id,))
-                    conn.commit()
-                    cursor.close()
-                    conn.close()
-                    
+                if await async_db.delete_template(template_id):
                     await update.message.reply_text(
                         f"✅ Шаблон '{template['name']}' успешно удален!",
                         reply_markup=get_templates_main_keyboard()
                     )
                 else:
                     await update.message.reply_text(
-                        f"❌ Ошибка подключения к базе данных",
+                        f"❌ Ошибка удаления шаблона из базы данных",
                         reply_markup=get_templates_main_keyboard()
                     )
             except Exception as e:
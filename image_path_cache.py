@@ -0,0 +1,146 @@
+"""
+Кэш найденных путей к изображениям задач
+
+Путь к изображению в задаче мог быть сохранен в другом окружении (другая
+директория, Windows-разделители), поэтому при отправке он ищется по нескольким
+вариантам. Результат поиска - и найденный файл, и его отсутствие - запоминается
+при планировании задачи вместе с размером и mtime файла, а для отсутствующих
+файлов - с mtime директорий поиска. Повторная проверка при планировании
+смотрит только на эти mtime, а отправка по расписанию берет путь из памяти
+без обращений к файловой системе.
+"""
+
+import logging
+import os
+import threading
+
+from cache_registry import cache_registry
+
+logger = logging.getLogger(__name__)
+
+# Директории, в которых ищется файл по имени
+SEARCH_DIRS = ('images', 'task_images')
+
+
+def _candidates(image_path):
+    """Варианты пути в порядке проверки"""
+    basename = os.path.basename(image_path.replace('\\', '/'))
+    candidates = [image_path]
+    candidates.extend(os.path.join(directory, basename) for directory in SEARCH_DIRS)
+    candidates.append(image_path.replace('\\', '/'))
+    return candidates
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _dirs_signature():
+    """mtime директорий поиска: меняется, когда в них появляется или удаляется файл"""
+    return tuple(_mtime(directory) for directory in SEARCH_DIRS)
+
+
+class ImagePathCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # путь из задачи -> (найденный путь, (размер, mtime)) или (None, mtime директорий)
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _resolve(self, image_path):
+        for path in _candidates(image_path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if path != image_path:
+                logger.info(f"✅ Изображение найдено по альтернативному пути: {path}")
+            return path, (stat.st_size, stat.st_mtime)
+
+        logger.warning(f"⚠️ Файл изображения не найден: {image_path}")
+        return None, _dirs_signature()
+
+    def validate(self, image_path):
+        """
+        Находит файл и обновляет запись кэша (вызывается при планировании).
+        Существующая запись перепроверяется только по mtime.
+        """
+        if not image_path:
+            return None
+
+        entry = self._entries.get(image_path)
+        if entry is not None:
+            resolved, signature = entry
+            if resolved is None:
+                still_valid = signature == _dirs_signature()
+            else:
+                try:
+                    stat = os.stat(resolved)
+                    still_valid = True
+                    signature = (stat.st_size, stat.st_mtime)
+                except OSError:
+                    still_valid = False
+            if still_valid:
+                with self._lock:
+                    self._entries[image_path] = (resolved, signature)
+                return resolved
+
+        entry = self._resolve(image_path)
+        with self._lock:
+            self._entries[image_path] = entry
+        return entry[0]
+
+    def lookup(self, image_path):
+        """
+        Возвращает (найденный путь, (размер, mtime)) из памяти; при отсутствии
+        записи один раз выполняет поиск
+        """
+        if not image_path:
+            return None, None
+
+        entry = self._entries.get(image_path)
+        if entry is None:
+            self.misses += 1
+            self.validate(image_path)
+            entry = self._entries[image_path]
+        else:
+            self.hits += 1
+
+        resolved, signature = entry
+        return (resolved, signature) if resolved else (None, None)
+
+    def invalidate(self, image_path=None):
+        """Забывает запись (файл заменен или удален); без пути - все записи"""
+        with self._lock:
+            if image_path is None:
+                self._entries.clear()
+                return
+            for key, (resolved, _) in list(self._entries.items()):
+                if key == image_path or resolved == image_path or resolved is None:
+                    del self._entries[key]
+
+    def stats(self):
+        """Размер кэша и счетчики"""
+        with self._lock:
+            missing = sum(1 for resolved, _ in self._entries.values() if resolved is None)
+            return {
+                'size': len(self._entries),
+                'missing': missing,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Глобальный экземпляр кэша путей к изображениям
+image_path_cache = ImagePathCache()
+
+cache_registry.register(
+    'image_paths',
+    image_path_cache.stats,
+    image_path_cache.invalidate,
+    lambda: image_path_cache._entries
+)
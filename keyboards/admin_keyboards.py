@@ -1,5 +1,7 @@
 from telegram import ReplyKeyboardMarkup
+from keyboards.keyboard_cache import static_keyboard
 
+@static_keyboard
 def get_admin_main_keyboard():
     """Главное меню администрирования"""
     keyboard = [
@@ -9,6 +11,7 @@ def get_admin_main_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_users_management_keyboard():
     """Меню управления пользователями"""
     keyboard = [
@@ -18,6 +21,7 @@ def get_users_management_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_chats_management_keyboard():
     """Меню управления Telegram чатами"""
     keyboard = [
@@ -27,6 +31,7 @@ def get_chats_management_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_user_edit_keyboard():
     """Меню редактирования пользователя"""
     keyboard = [
@@ -36,6 +41,7 @@ def get_user_edit_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_chat_edit_keyboard():
     """Меню редактирования чата"""
     keyboard = [
@@ -45,6 +51,7 @@ def get_chat_edit_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_roles_keyboard():
     """Клавиатура выбора ролей"""
     keyboard = [
@@ -53,6 +60,7 @@ def get_roles_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_keep_name_keyboard():
     """Клавиатура для сохранения названия чата"""
     keyboard = [
@@ -61,6 +69,7 @@ def get_keep_name_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_confirmation_keyboard():
     """Клавиатура подтверждения"""
     keyboard = [
@@ -69,6 +78,7 @@ def get_confirmation_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_back_keyboard():
     """Простая кнопка назад"""
     keyboard = [
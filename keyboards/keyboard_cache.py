@@ -0,0 +1,73 @@
+"""
+Кэш готовых клавиатур
+
+Объекты python-telegram-bot неизменяемы после создания, поэтому один
+экземпляр ReplyKeyboardMarkup можно отдавать в ответах всем пользователям.
+Статические клавиатуры строятся один раз на набор аргументов (по роли,
+выбранным дням и т.п.). Клавиатуры, зависящие от данных (группы, чаты),
+ключуются самим набором доступных групп или названий чатов из ACL, поэтому
+изменение прав сразу дает другой ключ; на случай переименования группы
+записи живут не дольше KEYBOARD_CACHE_TTL секунд.
+"""
+
+import functools
+import os
+
+from cache_utils import TTLCache, MISSING
+from cache_registry import cache_registry
+
+KEYBOARD_CACHE_SIZE = int(os.environ.get('KEYBOARD_CACHE_SIZE', 1024))
+KEYBOARD_CACHE_TTL = int(os.environ.get('KEYBOARD_CACHE_TTL', 300))
+
+# Функции статических клавиатур, обернутые lru_cache
+_static_keyboards = []
+
+# Клавиатуры, зависящие от данных
+dynamic_keyboards = TTLCache(maxsize=KEYBOARD_CACHE_SIZE, ttl=KEYBOARD_CACHE_TTL)
+
+
+def static_keyboard(func):
+    """Декоратор: клавиатура строится один раз на каждый набор аргументов"""
+    cached = functools.lru_cache(maxsize=256)(func)
+    _static_keyboards.append(cached)
+    return cached
+
+
+def cached_markup(key, build):
+    """Возвращает клавиатуру по ключу, вызывая build() только при промахе"""
+    markup = dynamic_keyboards.get(key)
+    if markup is MISSING:
+        markup = build()
+        dynamic_keyboards.set(key, markup)
+    return markup
+
+
+def clear_keyboard_cache():
+    """Сбрасывает все закэшированные клавиатуры"""
+    for cached in _static_keyboards:
+        cached.cache_clear()
+    dynamic_keyboards.clear()
+
+
+def get_keyboard_cache_stats():
+    """Размеры и счетчики кэша клавиатур (статические и зависящие от данных вместе)"""
+    static_info = [cached.cache_info() for cached in _static_keyboards]
+    dynamic = dynamic_keyboards.stats()
+    return {
+        'size': sum(info.currsize for info in static_info) + dynamic['size'],
+        'static': sum(info.currsize for info in static_info),
+        'dynamic': dynamic['size'],
+        'hits': sum(info.hits for info in static_info) + dynamic['hits'],
+        'misses': sum(info.misses for info in static_info) + dynamic['misses'],
+        'evictions': dynamic['evictions'],
+        'expirations': dynamic['expirations'],
+        'ttl': dynamic['ttl'],
+    }
+
+
+cache_registry.register(
+    'keyboards',
+    get_keyboard_cache_stats,
+    clear_keyboard_cache,
+    dynamic_keyboards.snapshot
+)
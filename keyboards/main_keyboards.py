@@ -1,11 +1,16 @@
 from telegram import ReplyKeyboardMarkup
 from auth_manager import auth_manager
+from keyboards.keyboard_cache import static_keyboard
 
 def get_main_keyboard(user_id):
     """Главное меню бота с проверкой прав"""
-    # Проверяем права пользователя
+    # Проверяем права пользователя (роль берется из кэша ролей)
     user_role = auth_manager.get_user_role(user_id)
-    
+    return _main_keyboard(user_role in ['admin', 'superadmin'])
+
+@static_keyboard
+def _main_keyboard(is_admin):
+    """Главное меню: одна клавиатура на обычных пользователей и одна на администраторов"""
     # Базовые кнопки для всех пользователей
     keyboard = [
         ["📋 Шаблоны", "📋 Задачи"],
@@ -13,7 +18,7 @@ def get_main_keyboard(user_id):
     ]
     
     # Добавляем кнопку администрирования для администраторов
-    if user_role in ['admin', 'superadmin']:
+    if is_admin:
         keyboard.insert(1, ["⚙️ Администрирование"])
     
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
@@ -24,6 +29,7 @@ def get_simple_keyboard(user_id):
     # чтобы пользователь мог нормально вернуться
     return get_main_keyboard(user_id)
 
+@static_keyboard
 def get_admin_keyboard():
     """Клавиатура для администраторов"""
     keyboard = [
@@ -33,6 +39,7 @@ def get_admin_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_back_only_keyboard():
     """Простая кнопка назад"""
     keyboard = [
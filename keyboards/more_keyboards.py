@@ -1,15 +1,21 @@
 from telegram import ReplyKeyboardMarkup
 from authorized_users import is_admin
+from keyboards.keyboard_cache import static_keyboard
 
 def get_more_keyboard(user_id):
     """Создает меню дополнительных функций"""
+    return _more_keyboard(is_admin(user_id))
+
+@static_keyboard
+def _more_keyboard(with_user_management):
+    """Меню дополнительных функций для обычного пользователя или администратора"""
     keyboard = [
         ["📊 Статус команд", "🕒 Текущее время"],
         ["🆔 Мой ID"]
     ]
 
     # Добавляем кнопку управления пользователями только для администратора
-    if is_admin(user_id):
+    if with_user_management:
         keyboard.append(["👥 Управление пользователями"])
 
     keyboard.append(["🔙 Главное меню"])
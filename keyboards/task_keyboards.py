@@ -1,5 +1,7 @@
 from telegram import ReplyKeyboardMarkup
+from keyboards.keyboard_cache import static_keyboard, cached_markup
 
+@static_keyboard
 def get_tasks_main_keyboard():
     """Главное меню задач (уровень 2)"""
     keyboard = [
@@ -11,6 +13,13 @@ def get_tasks_main_keyboard():
 
 def get_groups_keyboard(user_id, action_type="task"):
     """Клавиатура выбора групп для задач"""
+    from authorized_users import get_user_access_groups
+    
+    # Пользователи с одинаковым набором групп получают одну и ту же клавиатуру
+    key = ('task_groups', get_user_access_groups(user_id), action_type)
+    return cached_markup(key, lambda: _build_groups_keyboard(user_id, action_type))
+
+def _build_groups_keyboard(user_id, action_type):
     from template_manager import get_user_accessible_groups
     
     accessible_groups = get_user_accessible_groups(user_id)
@@ -28,6 +37,7 @@ def get_groups_keyboard(user_id, action_type="task"):
     
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_task_confirmation_keyboard():
     """Клавиатура подтверждения создания задачи"""
     keyboard = [
@@ -36,6 +46,7 @@ def get_task_confirmation_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_back_keyboard():
     """Простая кнопка назад"""
     keyboard = [
@@ -45,15 +56,20 @@ def get_back_keyboard():
 
 def get_chat_selection_keyboard(accessible_chats):
     """Клавиатура для выбора чата"""
+    chat_names = tuple(chat['chat_name'] for chat in accessible_chats)
+    return cached_markup(('chats', chat_names), lambda: _build_chat_selection_keyboard(chat_names))
+
+def _build_chat_selection_keyboard(chat_names):
     keyboard = []
     
-    for i, chat in enumerate(accessible_chats, 1):
-        keyboard.append([f"{i}. {chat['chat_name']}"])
+    for i, chat_name in enumerate(chat_names, 1):
+        keyboard.append([f"{i}. {chat_name}"])
     
     keyboard.append(["🔙 Назад"])
     
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_deactivate_confirmation_keyboard():
     """Клавиатура подтверждения деактивации"""
     keyboard = [
@@ -62,6 +78,7 @@ def get_deactivate_confirmation_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_schedule_type_keyboard():
     """Клавиатура выбора типа расписания"""
     keyboard = [
@@ -72,9 +89,10 @@ def get_schedule_type_keyboard():
 
 def get_week_days_keyboard(selected_days=None):
     """Клавиатура выбора дней недели"""
-    if selected_days is None:
-        selected_days = []
-    
+    return _week_days_keyboard(tuple(sorted(set(selected_days or []))))
+
+@static_keyboard
+def _week_days_keyboard(selected_days):
     days = [
         "Понедельник", "Вторник", "Среда",
         "Четверг", "Пятница", "Суббота", "Воскресенье"
@@ -102,6 +120,7 @@ def get_week_days_keyboard(selected_days=None):
     keyboard.append(["🔙 Назад"])
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_frequency_keyboard():
     """Клавиатура выбора периодичности"""
     keyboard = [
@@ -110,6 +129,7 @@ def get_frequency_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_task_edit_keyboard():
     """Клавиатура редактирования задачи на этапе подтверждения"""
     keyboard = [
@@ -1,5 +1,7 @@
 from telegram import ReplyKeyboardMarkup
+from keyboards.keyboard_cache import static_keyboard, cached_markup
 
+@static_keyboard
 def get_templates_main_keyboard():
     """Главное меню шаблонов (уровень 2)"""
     keyboard = [
@@ -9,6 +11,7 @@ def get_templates_main_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_template_list_menu_keyboard():
     """Меню списка шаблонов (уровень 3)"""
     keyboard = [
@@ -19,6 +22,13 @@ def get_template_list_menu_keyboard():
 
 def get_groups_keyboard(user_id, action_type="list"):
     """Клавиатура выбора групп шаблонов"""
+    from authorized_users import get_user_access_groups
+    
+    # Пользователи с одинаковым набором групп получают одну и ту же клавиатуру
+    key = ('template_groups', get_user_access_groups(user_id), action_type)
+    return cached_markup(key, lambda: _build_groups_keyboard(user_id, action_type))
+
+def _build_groups_keyboard(user_id, action_type):
     from template_manager import get_user_accessible_groups
     
     accessible_groups = get_user_accessible_groups(user_id)
@@ -38,6 +48,7 @@ def get_groups_keyboard(user_id, action_type="list"):
     
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_template_confirmation_keyboard():
     """Клавиатура подтверждения создания шаблона"""
     keyboard = [
@@ -46,6 +57,7 @@ def get_template_confirmation_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_template_edit_keyboard():
     """Клавиатура редактирования упрощенного шаблона"""
     keyboard = [
@@ -56,6 +68,7 @@ def get_template_edit_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_back_keyboard():
     """Простая кнопка назад"""
     keyboard = [
@@ -63,6 +76,7 @@ def get_back_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_skip_keyboard():
     """Клавиатура с кнопкой пропуска"""
     keyboard = [
@@ -71,6 +85,7 @@ def get_skip_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@static_keyboard
 def get_delete_confirmation_keyboard():
     """Клавиатура подтверждения удаления"""
     keyboard = [
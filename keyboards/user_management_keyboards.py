@@ -1,5 +1,7 @@
 from telegram import ReplyKeyboardMarkup
+from keyboards.keyboard_cache import static_keyboard
 
+@static_keyboard
 def get_user_management_keyboard():
     """Создает меню управления пользователями"""
     keyboard = [
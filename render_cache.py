@@ -0,0 +1,33 @@
+"""
+Кэш отрисованных сообщений со списками задач и шаблонов
+
+Текст задачи или шаблона зависит только от самой сущности, поэтому готовые
+фрагменты хранятся по ключу с версией сущности (ревизия задачи в репозитории,
+версия кэша шаблонов) и, для списков пользователя, с версией его прав доступа.
+Изменение сущности или прав дает новый ключ, старые записи вытесняются по LRU.
+Относительное время до следующего запуска в кэш не попадает и вычисляется при
+каждом запросе.
+"""
+
+import os
+
+from cache_utils import TTLCache, MISSING
+from cache_registry import cache_registry
+
+RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', 4096))
+RENDER_CACHE_TTL = int(os.environ.get('RENDER_CACHE_TTL', 3600))
+
+render_cache = TTLCache(maxsize=RENDER_CACHE_SIZE, ttl=RENDER_CACHE_TTL)
+
+cache_registry.register('render', render_cache.stats, render_cache.clear, render_cache.snapshot)
+
+
+def cached_render(key, build):
+    """Возвращает отрисованный фрагмент по ключу; без ключа просто вызывает build()"""
+    if key is None:
+        return build()
+    value = render_cache.get(key)
+    if value is MISSING:
+        value = build()
+        render_cache.set(key, value)
+    return value
@@ -0,0 +1,268 @@
+"""
+Версионные миграции схемы базы данных
+
+Текущая версия схемы хранится в таблице schema_version. Каждая миграция
+выполняется один раз, в своей транзакции, под advisory-блокировкой, поэтому
+несколько одновременно стартующих экземпляров бота не применят ее дважды.
+Актуальная база проверяется одним запросом при старте.
+
+Любое изменение схемы оформляется новой миграцией в конце MIGRATIONS.
+"""
+
+import psycopg2
+
+from database import db
+
+# Ключ advisory-блокировки, под которой применяются миграции
+MIGRATION_LOCK_ID = 4735001
+
+
+def _initial_schema(cursor):
+    """Базовые таблицы и данные по умолчанию"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS templates (
+            id VARCHAR(20) PRIMARY KEY,
+            name TEXT NOT NULL,
+            group_name TEXT NOT NULL,
+            text TEXT,
+            image_path TEXT,
+            created_by BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS template_groups (
+            id VARCHAR(50) PRIMARY KEY,
+            name TEXT NOT NULL,
+            allowed_users JSONB DEFAULT '[]'::jsonb
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            username TEXT,
+            full_name TEXT NOT NULL,
+            role TEXT DEFAULT 'guest',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS telegram_chats (
+            chat_id BIGINT PRIMARY KEY,
+            chat_name TEXT NOT NULL,
+            original_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_chat_access (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+            chat_id BIGINT REFERENCES telegram_chats(chat_id) ON DELETE CASCADE,
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, chat_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_template_group_access (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+            group_id VARCHAR(50) REFERENCES template_groups(id) ON DELETE CASCADE,
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, group_id)
+        )
+    ''')
+
+    # Колонки расписания добавляются миграцией 2, чтобы старые базы
+    # и новые проходили один и тот же путь
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id VARCHAR(20) PRIMARY KEY,
+            template_id VARCHAR(20),
+            template_name TEXT NOT NULL,
+            template_text TEXT,
+            template_image TEXT,
+            group_name TEXT NOT NULL,
+            created_by BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE,
+            is_test BOOLEAN DEFAULT FALSE,
+            last_executed TIMESTAMP,
+            next_execution TIMESTAMP,
+            target_chat_id BIGINT
+        )
+    ''')
+
+    # Группы шаблонов по умолчанию
+    cursor.execute('''
+        INSERT INTO template_groups (id, name, allowed_users)
+        VALUES
+        ('hongqi', '🚗 Hongqi', '[]'::jsonb),
+        ('turbomatiz', '🚙 TurboMatiz', '[]'::jsonb)
+        ON CONFLICT (id) DO NOTHING
+    ''')
+
+    # Администратор по умолчанию
+    cursor.execute('''
+        INSERT INTO users (user_id, username, full_name, role)
+        VALUES (812934047, 'admin', 'Administrator', 'admin')
+        ON CONFLICT (user_id) DO NOTHING
+    ''')
+
+
+def _task_schedule_columns(cursor):
+    """Колонки расписания задач (бывший database_updater)"""
+    cursor.execute('''
+        ALTER TABLE tasks
+            ADD COLUMN IF NOT EXISTS schedule_type TEXT CHECK (schedule_type IN ('week_days', 'month_days')),
+            ADD COLUMN IF NOT EXISTS times JSONB DEFAULT '[]'::jsonb,
+            ADD COLUMN IF NOT EXISTS week_days JSONB DEFAULT '[]'::jsonb,
+            ADD COLUMN IF NOT EXISTS month_days JSONB DEFAULT '[]'::jsonb,
+            ADD COLUMN IF NOT EXISTS frequency TEXT DEFAULT 'weekly' CHECK (frequency IN ('weekly', 'biweekly', 'monthly'))
+    ''')
+
+
+def _drop_template_schedule_columns(cursor):
+    """Удаляет из шаблонов старые поля времени, дней и периодичности (бывший database_migration)"""
+    cursor.execute('''
+        ALTER TABLE templates
+            DROP COLUMN IF EXISTS time,
+            DROP COLUMN IF EXISTS days,
+            DROP COLUMN IF EXISTS frequency
+    ''')
+
+
+def _secondary_indexes(cursor):
+    """
+    Вторичные индексы. Список зафиксирован здесь, а не берется из
+    database.INDEXES: индексы, добавленные туда позже, создают свои миграции
+    """
+    for name, definition in (
+        ('idx_tasks_due', 'ON tasks (next_execution) WHERE is_active AND NOT is_test'),
+        ('idx_tasks_active_group', 'ON tasks (group_name) WHERE is_active'),
+        ('idx_tasks_target_chat', 'ON tasks (target_chat_id)'),
+        ('idx_templates_group_created', 'ON templates (group_name, created_at DESC)'),
+        ('idx_templates_group_name', 'ON templates (group_name, name)'),
+        ('idx_user_chat_access_chat', 'ON user_chat_access (chat_id)'),
+        ('idx_user_template_group_access_group', 'ON user_template_group_access (group_id)'),
+    ):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} {definition}')
+
+
+def _telegram_files(cursor):
+    """file_id загруженных в Telegram изображений, чтобы не отправлять файл повторно"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS telegram_files (
+            image_path TEXT PRIMARY KEY,
+            file_size BIGINT NOT NULL,
+            file_mtime DOUBLE PRECISION NOT NULL,
+            file_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _task_misfire_policy(cursor):
+    """Что делать с запусками задачи, пропущенными за время простоя бота"""
+    cursor.execute('''
+        ALTER TABLE tasks
+            ADD COLUMN IF NOT EXISTS misfire_policy TEXT NOT NULL DEFAULT 'once'
+                CHECK (misfire_policy IN ('once', 'all', 'skip'))
+    ''')
+
+
+# Упорядоченный список миграций: (версия, описание, функция)
+MIGRATIONS = [
+    (1, 'Базовые таблицы и данные по умолчанию', _initial_schema),
+    (2, 'Колонки расписания задач', _task_schedule_columns),
+    (3, 'Удаление старых полей расписания из шаблонов', _drop_template_schedule_columns),
+    (4, 'Вторичные индексы', _secondary_indexes),
+    (5, 'Кэш file_id изображений Telegram', _telegram_files),
+    (6, 'Политика пропущенных запусков задач', _task_misfire_policy),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cursor):
+    """Возвращает текущую версию схемы (0, если миграции еще не применялись)"""
+    try:
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        return cursor.fetchone()[0]
+    except psycopg2.errors.UndefinedTable:
+        cursor.connection.rollback()
+        return 0
+
+
+def run_migrations():
+    """Применяет недостающие миграции; для актуальной базы это один запрос"""
+    conn = db.get_connection()
+    if not conn:
+        print("❌ Не удалось подключиться к базе данных для миграций")
+        return False
+
+    try:
+        cursor = conn.cursor()
+
+        current_version = get_schema_version(cursor)
+        conn.rollback()
+
+        if current_version >= LATEST_VERSION:
+            cursor.close()
+            conn.close()
+            print(f"✅ Схема базы данных актуальна (версия {current_version})")
+            return True
+
+        print(f"🔄 Обновление схемы базы данных: версия {current_version} → {LATEST_VERSION}")
+
+        for version, description, migrate in MIGRATIONS:
+            if version <= current_version:
+                continue
+
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Другой экземпляр мог применить миграцию, пока мы ждали блокировку
+            current_version = get_schema_version(cursor)
+            if version <= current_version:
+                conn.commit()
+                continue
+
+            migrate(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                (version, description)
+            )
+            conn.commit()
+            current_version = version
+            print(f"✅ Миграция {version} применена: {description}")
+
+        cursor.close()
+        conn.close()
+
+        print(f"✅ Схема базы данных обновлена до версии {current_version}")
+        return True
+
+    except Exception as e:
+        print(f"❌ Ошибка применения миграций: {e}")
+        import traceback
+        traceback.print_exc()
+        try:
+            conn.rollback()
+            conn.close()
+        except:
+            pass
+        return False
@@ -0,0 +1,247 @@
+"""
+Очередь исходящих сообщений с ограничением скорости по лимитам Telegram
+
+Задачи, запланированные на одну минуту, раньше отправлялись одновременно, и
+Telegram отвечал RetryAfter, а задача считалась недоставленной. Теперь каждая
+отправка проходит через общую очередь:
+
+- общий token bucket (SEND_RATE_GLOBAL сообщений в секунду на бота);
+- bucket на каждый чат (SEND_RATE_GROUP_PER_MINUTE в минуту для групп,
+  SEND_RATE_PRIVATE_PER_SECOND в секунду для личных чатов);
+- ограниченное число воркеров (SEND_QUEUE_WORKERS);
+- при RetryAfter чат и общий bucket приостанавливаются на указанное Telegram
+  время (flood-wait обычно действует на всего бота), а отправка возвращается
+  в очередь (до SEND_MAX_RETRIES раз).
+
+Отправка, для которой у чата нет свободного токена, не занимает воркер: она
+возвращается в очередь к моменту появления токена.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+SEND_RATE_GLOBAL = float(os.environ.get('SEND_RATE_GLOBAL', 30))
+SEND_RATE_GROUP_PER_MINUTE = float(os.environ.get('SEND_RATE_GROUP_PER_MINUTE', 20))
+SEND_RATE_PRIVATE_PER_SECOND = float(os.environ.get('SEND_RATE_PRIVATE_PER_SECOND', 1))
+# Сколько сообщений подряд можно отправить в один чат без паузы
+SEND_CHAT_BURST = float(os.environ.get('SEND_CHAT_BURST', 3))
+SEND_QUEUE_WORKERS = int(os.environ.get('SEND_QUEUE_WORKERS', 8))
+SEND_MAX_RETRIES = int(os.environ.get('SEND_MAX_RETRIES', 3))
+
+# При таком числе bucket'ов чатов простаивающие удаляются
+SEND_CHAT_BUCKETS_MAX = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        # До этого момента отправка запрещена (RetryAfter от Telegram)
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self):
+        """Через сколько секунд будет доступен токен (0 - доступен сейчас)"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self):
+        """Забирает токен, проверенный через delay()"""
+        self.tokens -= 1
+
+    def reserve(self):
+        """
+        Забирает токен сразу, уходя в долг, и возвращает, сколько ждать до
+        его наступления: очередь ожидающих выстраивается с шагом 1 / rate
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds):
+        """Запрещает отправку на seconds секунд"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def is_idle(self):
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class SendQueue:
+    def __init__(self, workers=SEND_QUEUE_WORKERS):
+        self.workers = workers
+        self._queue = None
+        self._workers = []
+        # Общий лимит без запаса: сообщения идут равномерно с шагом 1 / SEND_RATE_GLOBAL
+        self._global_bucket = TokenBucket(SEND_RATE_GLOBAL, 1)
+        self._chat_buckets = {}
+        # Отложенные возвраты в очередь: таймер -> отправка (отменяются в stop)
+        self._delayed = {}
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.deferred = 0
+
+    @property
+    def running(self):
+        return any(not worker.done() for worker in self._workers)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= SEND_CHAT_BUCKETS_MAX:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle()
+                }
+            if chat_id < 0:
+                bucket = TokenBucket(SEND_RATE_GROUP_PER_MINUTE / 60, SEND_CHAT_BURST)
+            else:
+                bucket = TokenBucket(SEND_RATE_PRIVATE_PER_SECOND, SEND_CHAT_BURST)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    # ===== ОТПРАВКА =====
+
+    async def send(self, chat_id, send_func):
+        """
+        Ставит отправку в очередь и ждет ее результата.
+        send_func() - корутина одного запроса к Telegram для чата chat_id.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((chat_id, send_func, future, 0))
+        return await future
+
+    def _requeue_later(self, job, delay):
+        def requeue():
+            self._delayed.pop(handle, None)
+            self._queue.put_nowait(job)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._delayed[handle] = job
+
+    async def _process(self, job):
+        chat_id, send_func, future, attempts = job
+        if future.done():
+            # Отправитель уже не ждет результата (отменен)
+            return
+
+        chat_bucket = self._chat_bucket(chat_id)
+        chat_delay = chat_bucket.delay()
+        if chat_delay > 0:
+            # Чат исчерпал лимит - возвращаем отправку в очередь, не занимая воркер
+            self.deferred += 1
+            self._requeue_later(job, chat_delay)
+            return
+        chat_bucket.take()
+
+        global_delay = self._global_bucket.reserve()
+        if global_delay > 0:
+            await asyncio.sleep(global_delay)
+
+        try:
+            result = await send_func()
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+            chat_bucket.block(retry_after)
+            self._global_bucket.block(retry_after)
+            if attempts >= SEND_MAX_RETRIES:
+                self.failed += 1
+                logger.error(f"❌ Чат {chat_id}: превышен лимит Telegram, попытки исчерпаны")
+                if not future.done():
+                    future.set_exception(e)
+                return
+            self.retried += 1
+            logger.warning(f"⚠️ Чат {chat_id}: лимит Telegram, повтор через {retry_after} с")
+            self._requeue_later((chat_id, send_func, future, attempts + 1), retry_after)
+            return
+        except Exception as e:
+            self.failed += 1
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        self.sent += 1
+        if not future.done():
+            future.set_result(result)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                # Очередь остановлена во время отправки - отправитель не должен ждать вечно
+                if not job[2].done():
+                    job[2].cancel()
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка очереди отправки: {e}")
+                if not job[2].done():
+                    job[2].set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        """Запускает воркеры (вызывается из работающего event loop)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        logger.info(f"✅ Очередь отправки запущена ({self.workers} воркеров, {SEND_RATE_GLOBAL:g} сообщ/с)")
+
+    async def stop(self):
+        """Останавливает воркеры; неотправленные сообщения отменяются"""
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+        # Отправки, ожидающие возврата в очередь, тоже отменяются
+        for handle, job in self._delayed.items():
+            handle.cancel()
+            if not job[2].done():
+                job[2].cancel()
+        self._delayed = {}
+
+        while self._queue is not None and not self._queue.empty():
+            future = self._queue.get_nowait()[2]
+            if not future.done():
+                future.cancel()
+        logger.info("✅ Очередь отправки остановлена")
+
+    def stats(self):
+        """Счетчики очереди"""
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'delayed': len(self._delayed),
+            'chats': len(self._chat_buckets),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'deferred': self.deferred,
+        }
+
+
+# Глобальная очередь исходящих сообщений
+send_queue = SendQueue()
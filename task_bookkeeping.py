@@ -0,0 +1,148 @@
+"""
+Фоновая запись отметок выполнения задач
+
+После успешной отправки задаче нужно записать время выполнения, следующее
+время запуска, а тестовую или недоставленную - деактивировать. Делать это
+сразу после каждой отправки значит держать плановую рассылку за запросами
+к базе. Поэтому отметки сразу применяются к репозиторию задач в памяти, а в
+базу уходят пачкой: раз в TASK_BOOKKEEPING_FLUSH_INTERVAL секунд все
+накопленные отметки записываются одним UPDATE ... FROM VALUES. Несколько
+отметок одной задачи за интервал сливаются в одну.
+"""
+
+import asyncio
+import logging
+import os
+
+from cache_utils import MISSING
+from database import db
+from database_async import async_db
+from task_calculators import now_local
+from task_repository import task_repository
+
+logger = logging.getLogger(__name__)
+
+TASK_BOOKKEEPING_FLUSH_INTERVAL = float(os.environ.get('TASK_BOOKKEEPING_FLUSH_INTERVAL', 2))
+
+
+def _format_timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+class TaskBookkeeper:
+    def __init__(self, interval=TASK_BOOKKEEPING_FLUSH_INTERVAL):
+        self.interval = interval
+        # task_id -> {'last_executed', 'next_execution', 'is_active'}
+        self._pending = {}
+        self._task = None
+        self.recorded = 0
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+
+    # ===== ОТМЕТКИ =====
+
+    def _record(self, task_id, **changes):
+        entry = self._pending.setdefault(task_id, {})
+        entry.update(changes)
+        self.recorded += 1
+
+        task_repository.apply_execution(
+            task_id,
+            last_executed=changes.get('last_executed'),
+            next_execution=changes.get('next_execution', MISSING),
+            is_active=changes.get('is_active')
+        )
+
+    def mark_executed(self, task_id, deactivate=False):
+        """
+        Отмечает выполнение задачи: время последнего выполнения (и деактивацию
+        для тестовых задач). Следующий запуск отмечает диспетчер.
+        """
+        changes = {'last_executed': _format_timestamp(now_local())}
+        if deactivate:
+            changes['is_active'] = False
+        self._record(task_id, **changes)
+
+    def mark_next_execution(self, task_id, next_execution):
+        """Отмечает следующий запуск задачи (None - запусков больше нет)"""
+        self._record(task_id, next_execution=_format_timestamp(next_execution))
+
+    def mark_inactive(self, task_id):
+        """Отмечает задачу неактивной (сообщение не удалось доставить)"""
+        self._record(task_id, is_active=False)
+
+    @staticmethod
+    def _to_row(task_id, entry):
+        return (
+            task_id,
+            entry.get('last_executed'),
+            entry.get('next_execution'),
+            'next_execution' in entry,
+            entry.get('is_active'),
+        )
+
+    # ===== ЗАПИСЬ В БАЗУ =====
+
+    async def flush(self):
+        """Записывает все накопленные отметки одним запросом"""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        rows = [self._to_row(task_id, entry) for task_id, entry in pending.items()]
+        updated = await async_db.run(db.update_task_executions, rows)
+        self.flushes += 1
+
+        if updated is None:
+            # Возвращаем отметки в очередь, не затирая более новые
+            self.failures += 1
+            for task_id, entry in pending.items():
+                newer = self._pending.get(task_id, {})
+                self._pending[task_id] = {**entry, **newer}
+            logger.error(f"❌ Отметки выполнения не записаны, повтор через {self.interval} с: {len(rows)} задач")
+            return 0
+
+        self.written += len(updated)
+        return len(updated)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка фоновой записи отметок выполнения: {e}")
+
+    def start(self):
+        """Запускает фоновую запись (вызывается из работающего event loop)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.ensure_future(self._run())
+        logger.info(f"✅ Фоновая запись отметок выполнения запущена (интервал {self.interval} с)")
+
+    async def stop(self):
+        """Останавливает фоновую запись, дописав накопленные отметки"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info("✅ Фоновая запись отметок выполнения остановлена")
+
+    def stats(self):
+        """Счетчики фоновой записи"""
+        return {
+            'pending': len(self._pending),
+            'recorded': self.recorded,
+            'flushes': self.flushes,
+            'written': self.written,
+            'failures': self.failures,
+        }
+
+
+# Глобальный экземпляр фоновой записи отметок выполнения
+task_bookkeeper = TaskBookkeeper()
@@ -4,20 +4,34 @@
 
 from datetime import datetime, timedelta
 from typing import List, Optional
+
+import pytz
+
 from task_models import TaskData
+from render_cache import cached_render
+
+# Время в расписаниях задач - московское
+SCHEDULER_TIMEZONE = pytz.timezone('Europe/Moscow')
+
+
+def now_local() -> datetime:
+    """Текущее время в часовом поясе расписаний (без tzinfo, как время в задачах)"""
+    return datetime.now(SCHEDULER_TIMEZONE).replace(tzinfo=None)
+
 
 class TaskScheduleCalculator:
     """Калькулятор расписания задач"""
     
     @staticmethod
-    def calculate_next_execution(task: TaskData) -> Optional[datetime]:
+    def calculate_next_execution(task: TaskData, after: Optional[datetime] = None) -> Optional[datetime]:
         """
-        Рассчитывает следующее время выполнения задачи
+        Рассчитывает следующее время выполнения задачи (строго позже after,
+        по умолчанию - текущего времени)
         """
         if not task.schedule.times:
             return None
         
-        now = datetime.now()
+        now = after or now_local()
         
         if task.schedule.schedule_type == 'week_days':
             return TaskScheduleCalculator._calculate_week_days_schedule(task, now)
@@ -26,38 +40,34 @@ class TaskScheduleCalculator:
         else:
             return None
     
+    @staticmethod
+    def _sorted_times(task: TaskData):
+        """Время отправки задачи по возрастанию"""
+        return sorted(TaskScheduleCalculator._parse_time_string(time_str) for time_str in task.schedule.times)
+    
     @staticmethod
     def _calculate_week_days_schedule(task: TaskData, now: datetime) -> Optional[datetime]:
         """Рассчитывает расписание для дней недели"""
         if not task.schedule.week_days:
             return None
         
-        # Получаем текущий день недели (0-пн, 6-вс)
-        current_weekday = now.weekday()
-        current_time = now.time()
+        times = TaskScheduleCalculator._sorted_times(task)
         
-        # Проверяем выполнения на сегодня
-        for time_str in task.schedule.times:
-            task_time = TaskScheduleCalculator._parse_time_string(time_str)
-            if task_time > current_time:
-                # Если есть время сегодня и сегодня подходящий день
-                if current_weekday in task.schedule.week_days:
-                    candidate = datetime.combine(now.date(), task_time)
-                    if TaskScheduleCalculator._is_week_valid(task, candidate):
-                        return candidate
-        
-        # Ищем следующий подходящий день
-        for day_offset in range(1, 8):  # Проверяем следующие 7 дней
-            next_date = now + timedelta(days=day_offset)
-            next_weekday = next_date.weekday()
+        # Сегодня и следующие дни; 9 недель покрывают периодичность "раз в 2 недели"
+        # и "первая неделя месяца" при любом наборе дней
+        for day_offset in range(0, 63):
+            next_date = (now + timedelta(days=day_offset)).date()
+            if next_date.weekday() not in task.schedule.week_days:
+                continue
             
-            if next_weekday in task.schedule.week_days:
-                # Берем первое время в этот день
-                if task.schedule.times:
-                    task_time = TaskScheduleCalculator._parse_time_string(task.schedule.times[0])
-                    candidate = datetime.combine(next_date.date(), task_time)
-                    if TaskScheduleCalculator._is_week_valid(task, candidate):
-                        return candidate
+            for task_time in times:
+                candidate = datetime.combine(next_date, task_time)
+                if candidate <= now:
+                    continue
+                if TaskScheduleCalculator._is_week_valid(task, candidate):
+                    return candidate
+                # Периодичность зависит только от даты - остальное время этого дня тоже не подходит
+                break
         
         return None
     
@@ -67,49 +77,28 @@ class TaskScheduleCalculator:
         if not task.schedule.month_days:
             return None
         
-        current_time = now.time()
-        current_day = now.day
-        current_month = now.month
-        current_year = now.year
-        
-        # Получаем все возможные даты выполнения в текущем и следующем месяце
-        all_dates = []
+        times = TaskScheduleCalculator._sorted_times(task)
+        days = sorted(task.schedule.month_days)
         
-        for month_offset in [0, 1]:  # Текущий и следующий месяц
-            year = current_year
-            month = current_month + month_offset
+        # Текущий и следующие месяцы: число 31 встречается не в каждом месяце
+        for month_offset in range(0, 13):
+            month_index = now.month - 1 + month_offset
+            year = now.year + month_index // 12
+            month = month_index % 12 + 1
             
-            if month > 12:
-                month = 1
-                year += 1
-            
-            for day in task.schedule.month_days:
+            for day in days:
                 try:
-                    date_candidate = datetime(year, month, day)
-                    # Исключаем прошедшие даты в текущем месяце
-                    if month_offset == 0 and (date_candidate.date() < now.date() or 
-                                            (date_candidate.date() == now.date() and 
-                                             TaskScheduleCalculator._parse_time_string(task.schedule.times[0]) <= current_time)):
-                        continue
-                    all_dates.append(date_candidate)
+                    date_candidate = datetime(year, month, day).date()
                 except ValueError:
                     # Некорректная дата (например, 31 февраля)
                     continue
-        
-        # Сортируем даты и находим первую подходящую
-        all_dates.sort()
-        
-        for date_candidate in all_dates:
-            for time_str in task.schedule.times:
-                task_time = TaskScheduleCalculator._parse_time_string(time_str)
-                candidate = datetime.combine(date_candidate.date(), task_time)
-                
-                # Для текущего дня проверяем время
-                if candidate.date() == now.date() and task_time <= current_time:
+                if date_candidate < now.date():
                     continue
                 
-                if candidate > now:
-                    return candidate
+                for task_time in times:
+                    candidate = datetime.combine(date_candidate, task_time)
+                    if candidate > now:
+                        return candidate
         
         return None
     
@@ -179,9 +168,34 @@ class TaskFormatter:
         'monthly': '1 раз в месяц'
     }
     
+    @staticmethod
+    def _render_key(kind: str, task: TaskData):
+        """Ключ кэша отрисовки: задачи из репозитория имеют ревизию, остальные не кэшируются"""
+        revision = getattr(task, 'revision', None)
+        return (kind, task.id, revision) if revision is not None else None
+    
+    @staticmethod
+    def _format_time_until(task: TaskData) -> str:
+        from task_validators import TimeCalculator
+        return TimeCalculator.format_time_until_next_execution(task.next_execution)
+    
     @staticmethod
     def format_task_info(task: TaskData) -> str:
         """Форматирует полную информацию о задаче"""
+        text = cached_render(
+            TaskFormatter._render_key('task_info', task),
+            lambda: TaskFormatter._format_task_info_static(task)
+        )
+        
+        # Время до запуска меняется постоянно и в кэш не попадает
+        if task.next_execution:
+            text += f"\n⏰ Следующий запуск: через {TaskFormatter._format_time_until(task)}"
+        
+        return text
+    
+    @staticmethod
+    def _format_task_info_static(task: TaskData) -> str:
+        """Неизменная часть информации о задаче"""
         lines = []
         
         lines.append(f"**{task.template_name}**")
@@ -201,11 +215,6 @@ class TaskFormatter:
         if task.last_executed:
             lines.append(f"⏱️ Последний запуск: {task.last_executed}")
         
-        if task.next_execution:
-            from task_validators import TimeCalculator
-            time_until = TimeCalculator.format_time_until_next_execution(task.next_execution)
-            lines.append(f"⏰ Следующий запуск: через {time_until}")
-        
         return "\n".join(lines)
     
     @staticmethod
@@ -237,30 +246,39 @@ class TaskFormatter:
         if not tasks:
             return "📭 Активных задач нет"
         
-        message = "📋 **Список активных задач:**\n\n"
+        parts = ["📋 **Список активных задач:**\n\n"]
         
         for i, task in enumerate(tasks, 1):
-            has_image = "🖼️" if task.template_image else ""
-            task_type = "🧪" if task.is_test else "📅"
-            
-            message += f"{i}. **{task.template_name}** {has_image} {task_type}\n"
-            
-            # Краткая информация о расписании
-            if task.schedule.schedule_type == 'week_days':
-                days_count = len(task.schedule.week_days)
-                message += f"   📅 {days_count} дней/неделю"
-            else:
-                days_count = len(task.schedule.month_days)
-                message += f"   📅 {days_count} чисел/месяц"
-            
-            times_count = len(task.schedule.times)
-            message += f" | ⏰ {times_count} времени\n"
+            parts.append(f"{i}. ")
+            parts.append(cached_render(
+                TaskFormatter._render_key('task_item', task),
+                lambda: TaskFormatter._format_task_list_item(task)
+            ))
             
             if task.next_execution:
-                from task_validators import TimeCalculator
-                time_until = TimeCalculator.format_time_until_next_execution(task.next_execution)
-                message += f"   ⏰ Следующий: через {time_until}\n"
+                parts.append(f"   ⏰ Следующий: через {TaskFormatter._format_time_until(task)}\n")
             
-            message += "\n"
+            parts.append("\n")
+        
+        return "".join(parts)
+    
+    @staticmethod
+    def _format_task_list_item(task: TaskData) -> str:
+        """Неизменная часть строки задачи в списке"""
+        has_image = "🖼️" if task.template_image else ""
+        task_type = "🧪" if task.is_test else "📅"
+        
+        item = f"**{task.template_name}** {has_image} {task_type}\n"
+        
+        # Краткая информация о расписании
+        if task.schedule.schedule_type == 'week_days':
+            days_count = len(task.schedule.week_days)
+            item += f"   📅 {days_count} дней/неделю"
+        else:
+            days_count = len(task.schedule.month_days)
+            item += f"   📅 {days_count} чисел/месяц"
+        
+        times_count = len(task.schedule.times)
+        item += f" | ⏰ {times_count} времени\n"
         
-        return message
+        return item
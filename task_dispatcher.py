@@ -0,0 +1,380 @@
+"""
+Диспетчер плановых отправок на куче по времени запуска
+
+Вместо отдельного cron-задания APScheduler на каждую пару (задача, время)
+диспетчер держит одну запись на задачу: min-куча (время запуска, задача) и
+словарь актуальных записей. Цикл в event loop спит до ближайшего запуска,
+снимает с кучи наступившие записи, запускает отправку и кладет обратно
+следующий запуск, рассчитанный TaskScheduleCalculator. Снятие и добавление -
+O(log n) независимо от числа времен отправки в расписании.
+
+Расписание хранится в базе: tasks.next_execution с частичным индексом
+idx_tasks_due служит индексом запусков. В памяти держатся только задачи,
+которые запустятся в ближайшие SCHEDULE_HORIZON; раз в SCHEDULE_REFILL_INTERVAL
+диспетчер подгружает следующее окно из базы и сверяет с ним кучу. Поэтому
+запуск бота не зависит от общего числа задач, а задачи, созданные или
+измененные между перезапусками, не теряются. Каждый новый следующий запуск
+передается в on_reschedule для записи в базу.
+
+Запуск, опоздавший больше MISFIRE_GRACE_TIME (бот был остановлен или
+перезапускался), обрабатывается по политике задачи misfire_policy: once -
+отправить один раз, all - отправить за каждый пропущенный запуск (не больше
+CATCHUP_MAX_RUNS), skip - пропустить. После перезапуска первая подгрузка
+находит все такие задачи по next_execution в прошлом. Догоняющие отправки
+выполняются не более чем CATCHUP_CONCURRENCY одновременно и идут через
+общую очередь отправки, поэтому не вытесняют текущие запуски и не упираются
+в лимиты Telegram.
+
+Перепланирование и удаление не ищут запись в куче: старая запись остается
+и пропускается при снятии, если не совпадает с актуальной.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from task_calculators import TaskScheduleCalculator, now_local
+
+logger = logging.getLogger(__name__)
+
+# Опоздание, после которого запуск пропускается (как misfire_grace_time у APScheduler)
+MISFIRE_GRACE_TIME = timedelta(seconds=300)
+
+# Верхняя граница сна цикла, чтобы переход времени не оставил его спать слишком долго
+MAX_SLEEP_SECONDS = 60
+
+# Пауза цикла после ошибки итерации, чтобы не крутиться вхолостую
+ERROR_RETRY_SECONDS = 1
+
+# Сколько устаревших записей допускается в куче сверх числа задач до ее пересборки
+HEAP_COMPACT_SLACK = 1024
+
+# Окно расписания в памяти и период его подгрузки из базы (период меньше окна)
+SCHEDULE_HORIZON = timedelta(seconds=int(os.environ.get('SCHEDULE_HORIZON', 900)))
+SCHEDULE_REFILL_INTERVAL = int(os.environ.get('SCHEDULE_REFILL_INTERVAL', 300))
+
+# Догоняющие отправки после простоя: одновременно задач и запусков на задачу
+CATCHUP_CONCURRENCY = int(os.environ.get('CATCHUP_CONCURRENCY', 2))
+CATCHUP_MAX_RUNS = int(os.environ.get('CATCHUP_MAX_RUNS', 5))
+
+# Сколько помнить время последнего запуска задачи для отсева устаревших строк базы
+LAST_FIRED_TTL = timedelta(days=1)
+
+
+class TaskDispatcher:
+    def __init__(self, execute, load_due=None, on_reschedule=None,
+                 horizon=SCHEDULE_HORIZON, refill_interval=SCHEDULE_REFILL_INTERVAL):
+        # execute(task_id, task_data) - корутина отправки задачи
+        self._execute = execute
+        # load_due(until) - задачи из базы с запуском не позже until: [(task_id, время, task_data)]
+        self._load_due = load_due
+        # on_reschedule(task_id, следующий запуск или None) - запись нового запуска в базу
+        self._on_reschedule = on_reschedule
+        self.horizon = horizon
+        self.refill_interval = refill_interval
+        self._lock = threading.Lock()
+        self._heap = []
+        # task_id -> (время запуска, порядковый номер, task_data, одноразовая)
+        self._entries = {}
+        # task_id -> время последнего снятого с кучи запуска
+        self._last_fired = {}
+        self._sequence = itertools.count()
+        self._running_tasks = set()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._refill_task = None
+        self._catch_up_slots = None
+        self.fired = 0
+        self.skipped = 0
+        self.caught_up = 0
+        self.refills = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    # ===== ПЛАНИРОВАНИЕ =====
+
+    def _push_locked(self, task_id, fire_at, task_data, one_shot):
+        sequence = next(self._sequence)
+        self._entries[task_id] = (fire_at, sequence, task_data, one_shot)
+        heapq.heappush(self._heap, (fire_at, sequence, task_id))
+        if len(self._heap) > 2 * len(self._entries) + HEAP_COMPACT_SLACK:
+            self._compact()
+        return self._heap[0][1] == sequence
+
+    def _push(self, task_id, fire_at, task_data, one_shot):
+        with self._lock:
+            is_earliest = self._push_locked(task_id, fire_at, task_data, one_shot)
+        if is_earliest:
+            self._wake()
+
+    def _compact(self):
+        """Убирает из кучи устаревшие записи (вызывается под блокировкой)"""
+        self._heap = [(entry[0], entry[1], task_id) for task_id, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def schedule(self, task_id, task_data):
+        """
+        Планирует задачу по расписанию; возвращает время ближайшего запуска или None.
+        Запуск за пределами окна в память не кладется - его подгрузит refill.
+        """
+        now = now_local()
+        fire_at = TaskScheduleCalculator.calculate_next_execution(task_data, after=now)
+        if fire_at is None or fire_at > now + self.horizon:
+            self.unschedule(task_id)
+            return fire_at
+        self._push(task_id, fire_at, task_data, one_shot=False)
+        return fire_at
+
+    def schedule_once(self, task_id, task_data, fire_at):
+        """Планирует однократный запуск задачи (тестовые задачи)"""
+        self._push(task_id, fire_at, task_data, one_shot=True)
+        return fire_at
+
+    def unschedule(self, task_id):
+        """Снимает задачу с расписания; запись в куче будет пропущена при снятии"""
+        with self._lock:
+            return self._entries.pop(task_id, None) is not None
+
+    def next_fire_time(self, task_id):
+        entry = self._entries.get(task_id)
+        return entry[0] if entry else None
+
+    # ===== ПОДГРУЗКА ИЗ БАЗЫ =====
+
+    def sync(self, due, until, marker):
+        """
+        Сверяет кучу с задачами из базы, запускающимися не позже until:
+        добавляет новые и перенесенные, убирает отключенные и удаленные.
+        Записи, добавленные после marker (начала чтения из базы), новее базы
+        и не трогаются.
+        """
+        seen = set()
+        is_earliest = False
+        with self._lock:
+            for task_id, fire_at, task_data in due:
+                seen.add(task_id)
+                last_fired = self._last_fired.get(task_id)
+                if last_fired is not None and fire_at <= last_fired:
+                    # Строка базы еще не получила следующий запуск от фоновой записи
+                    continue
+                entry = self._entries.get(task_id)
+                if entry is not None and entry[1] > marker:
+                    continue
+                if entry is not None and entry[0] == fire_at:
+                    # Время то же - обновляем только данные задачи (текст, чат)
+                    self._entries[task_id] = (fire_at, entry[1], task_data, entry[3])
+                    continue
+                is_earliest = self._push_locked(task_id, fire_at, task_data, False) or is_earliest
+
+            for task_id, entry in list(self._entries.items()):
+                if not entry[3] and task_id not in seen and entry[0] <= until and entry[1] < marker:
+                    # Задачу отключили, удалили или перенесли на более позднее время
+                    del self._entries[task_id]
+
+            expired = now_local() - LAST_FIRED_TTL
+            self._last_fired = {
+                task_id: fired_at for task_id, fired_at in self._last_fired.items() if fired_at > expired
+            }
+        if is_earliest:
+            self._wake()
+
+    async def refill(self):
+        """Подгружает из базы окно ближайших запусков"""
+        if self._load_due is None:
+            return
+        from database_async import async_db
+
+        now = now_local()
+        until = now + self.horizon
+        marker = next(self._sequence)
+        # При ошибке чтения load_due бросает исключение: сверка пропускается,
+        # чтобы не снять с кучи все записи окна
+        due = await async_db.run(self._load_due, until)
+
+        if self.refills == 0:
+            missed = sum(1 for _, fire_at, _ in due if now - fire_at > MISFIRE_GRACE_TIME)
+            if missed:
+                logger.info(f"🔁 Пропущены запуски за время простоя: {missed} задач, догоняются по их политике")
+
+        self.sync(due, until, marker)
+        self.refills += 1
+
+    async def _refill_loop(self):
+        while True:
+            try:
+                await self.refill()
+            except Exception as e:
+                logger.error(f"❌ Ошибка подгрузки расписания: {e}")
+            await asyncio.sleep(self.refill_interval)
+
+    # ===== ЦИКЛ =====
+
+    def _wake(self):
+        """Будит цикл, если новая запись раньше той, до которой он спит"""
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # event loop уже закрыт
+            pass
+
+    @staticmethod
+    def _missed_runs(task_data, fire_at, now):
+        """Сколько раз отправить задачу, опоздавшую с запуском на fire_at"""
+        policy = getattr(task_data.schedule, 'misfire_policy', 'once')
+        if policy == 'skip':
+            return 0
+        if policy != 'all':
+            return 1
+
+        runs = 1
+        occurrence = fire_at
+        while runs < CATCHUP_MAX_RUNS:
+            occurrence = TaskScheduleCalculator.calculate_next_execution(task_data, after=occurrence)
+            if occurrence is None or occurrence > now:
+                break
+            runs += 1
+        return runs
+
+    def _pop_due(self, now):
+        """
+        Снимает наступившие записи и кладет обратно следующий запуск, если он
+        в пределах окна. Возвращает (наступившие, перепланированные).
+        """
+        due = []
+        rescheduled = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, sequence, task_id = heapq.heappop(self._heap)
+                entry = self._entries.get(task_id)
+                if entry is None or entry[1] != sequence:
+                    # Запись устарела: задачу перепланировали или сняли
+                    continue
+                task_data, one_shot = entry[2], entry[3]
+                late = now - fire_at > MISFIRE_GRACE_TIME
+                runs = self._missed_runs(task_data, fire_at, now) if late and not one_shot else 1
+
+                if one_shot:
+                    del self._entries[task_id]
+                else:
+                    self._last_fired[task_id] = fire_at
+                    next_fire = TaskScheduleCalculator.calculate_next_execution(
+                        task_data, after=max(now, fire_at)
+                    )
+                    if next_fire is None or next_fire > now + self.horizon:
+                        del self._entries[task_id]
+                    else:
+                        self._push_locked(task_id, next_fire, task_data, False)
+                    rescheduled.append((task_id, next_fire))
+
+                due.append((fire_at, task_id, task_data, runs, late))
+        return due, rescheduled
+
+    def _seconds_until_next(self, now):
+        with self._lock:
+            if not self._heap:
+                return MAX_SLEEP_SECONDS
+            delay = (self._heap[0][0] - now).total_seconds()
+        return min(max(delay, 0), MAX_SLEEP_SECONDS)
+
+    async def _catch_up(self, task_id, task_data, runs):
+        """Догоняющие отправки пропущенных запусков (ограничено CATCHUP_CONCURRENCY)"""
+        async with self._catch_up_slots:
+            for _ in range(runs):
+                await self._execute(task_id, task_data)
+
+    def _fire(self, fire_at, task_id, task_data, runs, late, now):
+        if runs == 0:
+            self.skipped += 1
+            logger.warning(f"⚠️ Запуск задачи {task_id} на {fire_at} пропущен по политике skip")
+            return
+        if task_id in self._running_tasks:
+            # Предыдущая отправка этой задачи еще не закончилась
+            self.skipped += 1
+            logger.warning(f"⚠️ Задача {task_id} еще выполняется, запуск на {fire_at} пропущен")
+            return
+
+        self._running_tasks.add(task_id)
+        if late:
+            self.caught_up += runs
+            logger.info(f"🔁 Задача {task_id}: запуск на {fire_at} опоздал на {now - fire_at}, отправок: {runs}")
+            future = asyncio.ensure_future(self._catch_up(task_id, task_data, runs))
+        else:
+            self.fired += 1
+            future = asyncio.ensure_future(self._execute(task_id, task_data))
+        future.add_done_callback(lambda _: self._running_tasks.discard(task_id))
+
+    async def _run(self):
+        while True:
+            try:
+                now = now_local()
+                due, rescheduled = self._pop_due(now)
+                if self._on_reschedule is not None:
+                    for task_id, next_fire in rescheduled:
+                        try:
+                            self._on_reschedule(task_id, next_fire)
+                        except Exception as e:
+                            logger.error(f"❌ Ошибка отметки следующего запуска задачи {task_id}: {e}")
+                for fire_at, task_id, task_data, runs, late in due:
+                    try:
+                        self._fire(fire_at, task_id, task_data, runs, late, now)
+                    except Exception as e:
+                        logger.error(f"❌ Ошибка запуска задачи {task_id}: {e}")
+                timeout = self._seconds_until_next(now_local())
+            except Exception as e:
+                logger.error(f"❌ Ошибка цикла диспетчера: {e}")
+                timeout = ERROR_RETRY_SECONDS
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Запускает цикл диспетчера и подгрузку расписания (из работающего event loop)"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._catch_up_slots = asyncio.Semaphore(CATCHUP_CONCURRENCY)
+        self._task = asyncio.ensure_future(self._run())
+        if self._load_due is not None:
+            self._refill_task = asyncio.ensure_future(self._refill_loop())
+
+    def shutdown(self):
+        """Останавливает цикл диспетчера"""
+        for task in (self._task, self._refill_task):
+            if task is not None:
+                task.cancel()
+        self._task = None
+        self._refill_task = None
+
+    # ===== СОСТОЯНИЕ =====
+
+    def get_entries(self):
+        """Запланированные задачи: [(время запуска, task_id, task_data)] по времени"""
+        with self._lock:
+            entries = [(entry[0], task_id, entry[2]) for task_id, entry in self._entries.items()]
+        return sorted(entries, key=lambda item: item[0])
+
+    def stats(self):
+        """Размер кучи и счетчики"""
+        with self._lock:
+            return {
+                'tasks': len(self._entries),
+                'heap': len(self._heap),
+                'fired': self.fired,
+                'skipped': self.skipped,
+                'caught_up': self.caught_up,
+                'refills': self.refills,
+                'running': len(self._running_tasks),
+            }
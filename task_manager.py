@@ -5,8 +5,9 @@ import uuid
 from datetime import datetime
 from database import db
 from task_models import TaskData, TemplateData
-from task_calculators import TaskScheduleCalculator, TaskFormatter
+from task_calculators import TaskScheduleCalculator, TaskFormatter, now_local
 from task_validators import TaskValidator
+from task_repository import task_repository
 
 logger = logging.getLogger(__name__)
 
@@ -58,18 +59,22 @@ def save_task(task_data):
             logger.info(f"📝 Сохраняем объект TaskData: {task_data.template_name}")
             # Преобразуем TaskData в словарь для сохранения
             task_dict = task_data.to_dict()
-            success = db.save_task(task_dict)
+            saved_task = db.save_task(task_dict)
             
-            if success:
+            if saved_task:
                 logger.info(f"✅ TaskData успешно сохранен")
             else:
                 logger.error(f"❌ Ошибка сохранения TaskData")
-                
-            return success
         else:
             # Это уже словарь
             logger.info(f"📝 Сохраняем словарь: {task_data.get('template_name', 'Без названия')}")
-            return db.save_task(task_data)
+            saved_task = db.save_task(task_data)
+        
+        if not saved_task:
+            return False
+        
+        task_repository.put(saved_task)
+        return True
             
     except Exception as e:
         logger.error(f"❌ Критическая ошибка сохранения задачи: {e}")
@@ -77,6 +82,18 @@ def save_task(task_data):
         logger.error(f"Трассировка: {traceback.format_exc()}")
         return False
 
+def save_tasks(tasks):
+    """Сохраняет список задач одним пакетом, возвращает ID сохраненных"""
+    try:
+        saved_ids = db.save_tasks(tasks)
+        if saved_ids:
+            # Пакеты редки (импорт, миграции) - проще перечитать репозиторий целиком
+            task_repository.reload()
+        return saved_ids
+    except Exception as e:
+        print(f"❌ Ошибка пакетного сохранения задач: {e}")
+        return []
+
 def load_tasks():
     """Загружает все задачи из базы данных"""
     try:
@@ -125,14 +142,7 @@ def create_task(task_data):
 def get_all_active_tasks():
     """Возвращает все активные задачи"""
     try:
-        all_tasks = load_tasks()
-        active_tasks = {}
-        
-        for task_id, task in all_tasks.items():
-            if task.is_active:
-                active_tasks[task_id] = task
-        
-        return active_tasks
+        return task_repository.get_active()
     except Exception as e:
         print(f"❌ Ошибка получения активных задач: {e}")
         return {}
@@ -140,8 +150,7 @@ def get_all_active_tasks():
 def get_task_by_id(task_id):
     """Возвращает задачу по ID"""
     try:
-        tasks = load_tasks()
-        return tasks.get(task_id)
+        return task_repository.get(task_id)
     except Exception as e:
         print(f"❌ Ошибка получения задачи по ID {task_id}: {e}")
         return None
@@ -149,32 +158,40 @@ def get_task_by_id(task_id):
 def delete_task(task_id):
     """Удаляет задачу"""
     try:
-        return db.delete_task(task_id)
+        success = db.delete_task(task_id)
+        if success:
+            task_repository.remove(task_id)
+            from task_scheduler import unschedule_task
+            unschedule_task(task_id)
+        return success
     except Exception as e:
         print(f"❌ Ошибка удаления задачи {task_id}: {e}")
         return False
 
 def get_user_accessible_tasks(user_id):
-    """Возвращает задачи, доступные пользователю"""
+    """Возвращает активные задачи групп, доступных пользователю"""
     try:
-        # Получаем доступные группы пользователя
-        from template_manager import get_user_accessible_groups
-        accessible_groups = get_user_accessible_groups(user_id)
-        
-        # Получаем все активные задачи
-        all_tasks = get_all_active_tasks()
-        
-        # Фильтруем задачи по доступным группам
-        user_tasks = {}
-        for task_id, task in all_tasks.items():
-            if task.group_name in accessible_groups:
-                user_tasks[task_id] = task
-        
-        return user_tasks
+        from authorized_users import get_user_access_groups
+        return task_repository.get_by_groups(get_user_access_groups(user_id))
     except Exception as e:
         print(f"❌ Ошибка получения доступных задач для пользователя {user_id}: {e}")
         return {}
 
+def get_user_task_list(user_id):
+    """
+    Возвращает список активных задач пользователя для экрана статуса.
+    Список кэшируется по версии прав пользователя и версии репозитория задач.
+    """
+    try:
+        from acl_manager import acl
+        from render_cache import cached_render
+        
+        key = ('user_tasks', user_id, acl.get_user_version(user_id), task_repository.version)
+        return cached_render(key, lambda: tuple(get_user_accessible_tasks(user_id).values()))
+    except Exception as e:
+        print(f"❌ Ошибка получения списка задач пользователя {user_id}: {e}")
+        return ()
+
 def format_task_info(task):
     """Форматирует информацию о задаче для отображения"""
     try:
@@ -213,13 +230,19 @@ def update_task(task_id, task_data):
     try:
         if isinstance(task_data, TaskData):
             task_data.id = task_id
-        else:
-            task_data['id'] = task_id
-            
+            # Следующее выполнение считаем до записи, чтобы сохранить задачу одним запросом
+            next_execution = TaskScheduleCalculator.calculate_next_execution(task_data)
+            task_data.next_execution = next_execution.strftime("%Y-%m-%d %H:%M:%S") if next_execution else None
+            success = db.update_task(task_id, task_data)
+            if success:
+                task_repository.put(task_data)
+            return success
+        
+        task_data['id'] = task_id
         success = db.update_task(task_id, task_data)
         
         if success:
-            # Обновляем следующее выполнение
+            # Обновляем следующее выполнение (заодно обновит репозиторий)
             update_task_next_execution(task_id)
         
         return success
@@ -227,15 +250,23 @@ def update_task(task_id, task_data):
         print(f"❌ Ошибка обновления задачи {task_id}: {e}")
         return False
 
+def update_task_fields(task_id, fields, recompute_next=False):
+    """Обновляет только указанные поля задачи одним запросом"""
+    try:
+        updated = db.update_task_fields(task_id, fields, recompute_next=recompute_next)
+        if not updated:
+            return False
+        if isinstance(updated, TaskData):
+            task_repository.put(updated)
+        return True
+    except Exception as e:
+        print(f"❌ Ошибка обновления полей задачи {task_id}: {e}")
+        return False
+
 def update_task_field(task_id, field_name, field_value):
     """Обновляет конкретное поле задачи"""
     try:
-        task = get_task_by_id(task_id)
-        if not task:
-            return False, "Задача не найдена"
-        
-        setattr(task, field_name, field_value)
-        success = update_task(task_id, task)
+        success = update_task_fields(task_id, {field_name: field_value})
         if success:
             return True, f"Поле {field_name} успешно обновлено"
         else:
@@ -247,7 +278,7 @@ def update_task_field(task_id, field_name, field_value):
 def activate_task(task_id):
     """Активирует задачу"""
     try:
-        success = update_task_field(task_id, 'is_active', True)
+        success = update_task_fields(task_id, {'is_active': True}, recompute_next=True)
         if success:
             return True, f"Задача {task_id} успешно активирована"
         else:
@@ -259,8 +290,10 @@ def activate_task(task_id):
 def deactivate_task(task_id):
     """Деактивирует задачу"""
     try:
-        success = update_task_field(task_id, 'is_active', False)
+        success = update_task_fields(task_id, {'is_active': False})
         if success:
+            from task_scheduler import unschedule_task
+            unschedule_task(task_id)
             return True, f"Задача {task_id} успешно деактивирована"
         else:
             return False, f"Ошибка деактивации задачи {task_id}"
@@ -269,16 +302,9 @@ def deactivate_task(task_id):
         return False, f"Ошибка деактивации: {e}"
 
 def get_tasks_by_group(group_id):
-    """Возвращает задачи определенной группы"""
+    """Возвращает задачи определенной группы (как и раньше, только активные)"""
     try:
-        tasks = get_all_active_tasks()
-        group_tasks = {}
-        
-        for task_id, task in tasks.items():
-            if task.group_name == group_id:
-                group_tasks[task_id] = task
-        
-        return group_tasks
+        return task_repository.get_by_group(group_id)
     except Exception as e:
         print(f"❌ Ошибка получения задач группы {group_id}: {e}")
         return {}
@@ -286,14 +312,7 @@ def get_tasks_by_group(group_id):
 def get_active_tasks_by_group(group_id):
     """Возвращает активные задачи определенной группы"""
     try:
-        active_tasks = get_all_active_tasks()
-        group_tasks = {}
-        
-        for task_id, task in active_tasks.items():
-            if task.group_name == group_id:
-                group_tasks[task_id] = task
-        
-        return group_tasks
+        return task_repository.get_by_group(group_id)
     except Exception as e:
         print(f"❌ Ошибка получения активных задач группы {group_id}: {e}")
         return {}
@@ -361,11 +380,16 @@ def create_task_from_template(template_data, created_by, target_chat_id=None, is
         traceback.print_exc()
         return False, None
 
-def update_task_execution_time(task_id):
-    """Обновляет время последнего выполнения задачи"""
+def update_task_execution_time(task_id, deactivate=False):
+    """
+    Отмечает выполнение задачи одним запросом: время последнего выполнения
+    и пересчет следующего (или деактивация для тестовых задач)
+    """
     try:
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        return update_task_field(task_id, 'last_executed', current_time)
+        fields = {'last_executed': now_local().strftime("%Y-%m-%d %H:%M:%S")}
+        if deactivate:
+            fields['is_active'] = False
+        return update_task_fields(task_id, fields, recompute_next=not deactivate)
     except Exception as e:
         print(f"❌ Ошибка обновления времени выполнения задачи {task_id}: {e}")
         return False
@@ -373,16 +397,7 @@ def update_task_execution_time(task_id):
 def update_task_next_execution(task_id):
     """Обновляет следующее время выполнения задачи"""
     try:
-        task = get_task_by_id(task_id)
-        if not task:
-            return False
-        
-        next_execution = TaskScheduleCalculator.calculate_next_execution(task)
-        if next_execution:
-            task.next_execution = next_execution.strftime("%Y-%m-%d %H:%M:%S")
-            return update_task(task_id, task)
-        
-        return False
+        return update_task_fields(task_id, {}, recompute_next=True)
     except Exception as e:
         print(f"❌ Ошибка обновления следующего выполнения задачи {task_id}: {e}")
         return False
@@ -413,6 +428,7 @@ def create_task_with_schedule(template_data, created_by, target_chat_id, schedul
         task.schedule.week_days = schedule_data.get('week_days', [])
         task.schedule.month_days = schedule_data.get('month_days', [])
         task.schedule.frequency = schedule_data.get('frequency', 'weekly')
+        task.schedule.misfire_policy = schedule_data.get('misfire_policy') or 'once'
         
         logger.info(f"📦 Данные задачи:")
         logger.info(f"   Шаблон: {task.template_name}")
@@ -423,6 +439,7 @@ def create_task_with_schedule(template_data, created_by, target_chat_id, schedul
         logger.info(f"   Дни недели: {task.schedule.week_days}")
         logger.info(f"   Числа месяца: {task.schedule.month_days}")
         logger.info(f"   Частота: {task.schedule.frequency}")
+        logger.info(f"   Пропущенные запуски: {task.schedule.misfire_policy}")
         
         # Создаем задачу
         success, task_id = create_task(task)
@@ -451,5 +468,4 @@ def create_task_with_schedule(template_data, created_by, target_chat_id, schedul
 # Инициализация при импорте
 print("📥 Task_manager загружен")
 init_task_files()
-init_database()
 print("✅ Task_manager инициализирован")
\ No newline at end of file
@@ -6,6 +6,14 @@ import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
+def _json_list(value) -> list:
+    """Списки расписания: psycopg2 отдает JSONB уже разобранным, словари хранят JSON-строку"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
 class TaskSchedule:
     """Модель расписания задачи"""
     
@@ -15,6 +23,7 @@ class TaskSchedule:
         self.week_days = []  # дни недели [0,1,2,3,4,5,6]
         self.month_days = []  # числа месяца [1,10,15,28]
         self.frequency = 'weekly'  # weekly, biweekly, monthly
+        self.misfire_policy = 'once'  # пропущенные за время простоя запуски: once, all, skip
 
 class TaskData:
     """Модель данных задачи"""
@@ -36,27 +45,28 @@ class TaskData:
         self.schedule = TaskSchedule()
     
     def to_dict(self) -> Dict[str, Any]:
-    """Конвертирует в словарь для сохранения в БД"""
-    return {
-        'id': self.id,
-        'template_id': self.template_id,
-        'template_name': self.template_name,
-        'template_text': self.template_text,
-        'template_image': self.template_image,
-        'group_name': self.group_name,
-        'created_by': self.created_by,
-        'created_at': self.created_at,
-        'is_active': self.is_active,
-        'is_test': self.is_test,
-        'last_executed': self.last_executed,
-        'next_execution': self.next_execution,
-        'target_chat_id': self.target_chat_id,
-        'schedule_type': self.schedule.schedule_type,
-        'times': json.dumps(self.schedule.times),
-        'week_days': json.dumps(self.schedule.week_days),
-        'month_days': json.dumps(self.schedule.month_days),
-        'frequency': self.schedule.frequency
-    }
+        """Конвертирует в словарь для сохранения в БД"""
+        return {
+            'id': self.id,
+            'template_id': self.template_id,
+            'template_name': self.template_name,
+            'template_text': self.template_text,
+            'template_image': self.template_image,
+            'group_name': self.group_name,
+            'created_by': self.created_by,
+            'created_at': self.created_at,
+            'is_active': self.is_active,
+            'is_test': self.is_test,
+            'last_executed': self.last_executed,
+            'next_execution': self.next_execution,
+            'target_chat_id': self.target_chat_id,
+            'schedule_type': self.schedule.schedule_type,
+            'times': json.dumps(self.schedule.times),
+            'week_days': json.dumps(self.schedule.week_days),
+            'month_days': json.dumps(self.schedule.month_days),
+            'frequency': self.schedule.frequency,
+            'misfire_policy': self.schedule.misfire_policy
+        }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'TaskData':
@@ -78,10 +88,11 @@ class TaskData:
         
         # Загружаем расписание
         task.schedule.schedule_type = data.get('schedule_type')
-        task.schedule.times = json.loads(data.get('times', '[]'))
-        task.schedule.week_days = json.loads(data.get('week_days', '[]'))
-        task.schedule.month_days = json.loads(data.get('month_days', '[]'))
+        task.schedule.times = _json_list(data.get('times'))
+        task.schedule.week_days = _json_list(data.get('week_days'))
+        task.schedule.month_days = _json_list(data.get('month_days'))
         task.schedule.frequency = data.get('frequency', 'weekly')
+        task.schedule.misfire_policy = data.get('misfire_policy') or 'once'
         
         return task
 
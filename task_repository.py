@@ -0,0 +1,249 @@
+"""
+Репозиторий задач в памяти процесса
+
+Задачи загружаются из базы один раз и дальше обновляются по принципу
+write-through: task_manager сначала пишет в базу, затем кладет результат сюда.
+Вторичные индексы (группа, чат, создатель, активность) позволяют отвечать
+на типовые выборки без обращения к PostgreSQL.
+"""
+
+import copy
+import logging
+import threading
+
+from database import db
+from cache_registry import cache_registry
+from cache_utils import MISSING
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_task(task):
+    """Возвращает независимую копию задачи, чтобы вызывающий код не менял кэш"""
+    task_copy = copy.copy(task)
+    task_copy.schedule = copy.copy(task.schedule)
+    task_copy.schedule.times = list(task.schedule.times)
+    task_copy.schedule.week_days = list(task.schedule.week_days)
+    task_copy.schedule.month_days = list(task.schedule.month_days)
+    return task_copy
+
+
+class TaskRepository:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._tasks = {}
+        self._by_group = {}
+        self._by_chat = {}
+        self._by_creator = {}
+        self._active = set()
+        # Увеличивается при любом изменении; каждой задаче при индексации
+        # присваивается ревизия, по которой кэшируется ее отрисовка
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ===== ЗАГРУЗКА =====
+
+    def ensure_loaded(self):
+        """
+        Загружает все задачи из базы при первом обращении. Ошибка загрузки
+        пробрасывается, репозиторий остается незагруженным, и следующее
+        обращение повторит загрузку
+        """
+        if self._loaded:
+            self.hits += 1
+            return
+        self.misses += 1
+        with self._lock:
+            if self._loaded:
+                return
+            tasks = list(db.iter_tasks(raise_errors=True))
+            self._clear()
+            for task in tasks:
+                self._index(task)
+            self._loaded = True
+            logger.info(f"✅ Репозиторий задач загружен: {len(self._tasks)} задач")
+
+    def reload(self):
+        """Сбрасывает репозиторий; задачи будут перечитаны при следующем обращении"""
+        with self._lock:
+            self.version += 1
+            self._clear()
+            self._loaded = False
+
+    def refresh(self, task_id):
+        """Перечитывает одну задачу из базы (изменена другим экземпляром бота)"""
+        with self._lock:
+            if not self._loaded:
+                return
+            cached = self._tasks.get(task_id)
+            revision = cached.revision if cached else None
+
+        try:
+            task = db.get_task(task_id, raise_errors=True)
+        except Exception as e:
+            # Ошибка чтения - не удаление: оставляем задачу в кэше как есть
+            logger.error(f"❌ Задача {task_id} не перечитана, в кэше оставлена прежняя версия: {e}")
+            return
+
+        with self._lock:
+            current = self._tasks.get(task_id)
+            if not self._loaded or (current.revision if current else None) != revision:
+                # Пока шло чтение, задачу обновили локально или репозиторий
+                # перезагрузили - прочитанная версия может быть старее
+                return
+            self._unindex(task_id)
+            if task:
+                self._index(task)
+
+    def _clear(self):
+        self._tasks = {}
+        self._by_group = {}
+        self._by_chat = {}
+        self._by_creator = {}
+        self._active = set()
+
+    # ===== ИНДЕКСЫ =====
+
+    def _index(self, task):
+        self.version += 1
+        task.revision = self.version
+        self._tasks[task.id] = task
+        self._by_group.setdefault(task.group_name, set()).add(task.id)
+        self._by_chat.setdefault(task.target_chat_id, set()).add(task.id)
+        self._by_creator.setdefault(task.created_by, set()).add(task.id)
+        if task.is_active:
+            self._active.add(task.id)
+
+    def _unindex(self, task_id):
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return
+        self.version += 1
+        for index, key in (
+            (self._by_group, task.group_name),
+            (self._by_chat, task.target_chat_id),
+            (self._by_creator, task.created_by),
+        ):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del index[key]
+        self._active.discard(task_id)
+
+    # ===== ЗАПИСЬ (WRITE-THROUGH) =====
+
+    def put(self, task):
+        """Кладет в репозиторий задачу, уже сохраненную в базе"""
+        # Проверка под блокировкой: запись, пришедшая во время загрузки, дождется
+        # ее окончания и применится поверх, а не потеряется
+        with self._lock:
+            if not self._loaded:
+                # Репозиторий еще не загружен - задача придет вместе с остальными
+                return
+            self._unindex(task.id)
+            self._index(_copy_task(task))
+
+    def apply_execution(self, task_id, last_executed=None, next_execution=MISSING, is_active=None):
+        """
+        Отмечает выполнение задачи в памяти до того, как отметка будет записана
+        в базу фоновым писателем (None/MISSING - поле не меняется)
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            task = self._tasks.get(task_id)
+            if task is None:
+                return
+            task = _copy_task(task)
+            if last_executed is not None:
+                task.last_executed = last_executed
+            if next_execution is not MISSING:
+                task.next_execution = next_execution
+            if is_active is not None:
+                task.is_active = is_active
+            self._unindex(task_id)
+            self._index(task)
+
+    def remove(self, task_id):
+        """Убирает задачу, удаленную из базы"""
+        with self._lock:
+            self._unindex(task_id)
+
+    # ===== ЧТЕНИЕ =====
+
+    def _select(self, ids, active_only):
+        if active_only:
+            ids = ids & self._active
+        tasks = [self._tasks[task_id] for task_id in ids]
+        # Порядок как в базе: новые задачи первыми
+        tasks.sort(key=lambda task: task.created_at or '', reverse=True)
+        return {task.id: _copy_task(task) for task in tasks}
+
+    def get(self, task_id):
+        """Возвращает задачу по ID или None"""
+        self.ensure_loaded()
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return _copy_task(task) if task else None
+
+    def get_active(self):
+        """Возвращает все активные задачи"""
+        self.ensure_loaded()
+        with self._lock:
+            return self._select(self._active, False)
+
+    def get_by_group(self, group_id, active_only=True):
+        """Возвращает задачи группы"""
+        self.ensure_loaded()
+        with self._lock:
+            return self._select(self._by_group.get(group_id, set()), active_only)
+
+    def get_by_groups(self, group_ids, active_only=True):
+        """Возвращает задачи нескольких групп"""
+        self.ensure_loaded()
+        with self._lock:
+            ids = set()
+            for group_id in group_ids:
+                ids |= self._by_group.get(group_id, set())
+            return self._select(ids, active_only)
+
+    def get_by_chat(self, chat_id, active_only=True):
+        """Возвращает задачи, отправляющие сообщения в чат"""
+        self.ensure_loaded()
+        with self._lock:
+            return self._select(self._by_chat.get(chat_id, set()), active_only)
+
+    def get_by_creator(self, user_id, active_only=True):
+        """Возвращает задачи, созданные пользователем"""
+        self.ensure_loaded()
+        with self._lock:
+            return self._select(self._by_creator.get(user_id, set()), active_only)
+
+    def stats(self):
+        """Размеры репозитория и индексов"""
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'version': self.version,
+                'size': len(self._tasks),
+                'hits': self.hits,
+                'misses': self.misses,
+                'active': len(self._active),
+                'groups': len(self._by_group),
+                'chats': len(self._by_chat),
+                'creators': len(self._by_creator),
+            }
+
+
+# Глобальный экземпляр репозитория задач
+task_repository = TaskRepository()
+
+cache_registry.register(
+    'tasks',
+    task_repository.stats,
+    task_repository.reload,
+    lambda: task_repository._tasks
+)
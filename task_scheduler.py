@@ -1,16 +1,19 @@
 import logging
 import os
 import asyncio
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.date import DateTrigger
-import pytz
 from datetime import datetime, timedelta
-from telegram.error import TelegramError
+from telegram.error import TelegramError, RetryAfter
 
-from task_manager import get_all_active_tasks, update_task_execution_time, deactivate_task
+from task_bookkeeping import task_bookkeeper
+from task_repository import task_repository
 from task_models import TaskData
 from task_calculators import TaskScheduleCalculator
+from task_dispatcher import TaskDispatcher, now_local
+from database import db
+from database_async import async_db
+from telegram_file_cache import send_photo
+from send_queue import send_queue
+from image_path_cache import image_path_cache
 
 # Глобальный планировщик
 task_scheduler = None
@@ -23,14 +26,11 @@ def init_scheduler(application):
     global task_scheduler, bot_instance
     
     if task_scheduler is None:
-        # Создаем планировщик с правильной конфигурацией для Render
-        task_scheduler = AsyncIOScheduler(
-            timezone=pytz.timezone('Europe/Moscow'),
-            job_defaults={
-                'misfire_grace_time': 300,
-                'coalesce': True,
-                'max_instances': 1
-            }
+        # Одна запись на задачу в куче по времени запуска вместо cron-задания на каждое время
+        task_scheduler = TaskDispatcher(
+            execute_task,
+            load_due=load_due_tasks,
+            on_reschedule=task_bookkeeper.mark_next_execution
         )
         bot_instance = application.bot
         logger.info("✅ Планировщик задач инициализирован")
@@ -38,29 +38,8 @@ def init_scheduler(application):
     return task_scheduler
 
 def validate_image_path(image_path):
-    """Проверяет существование файла изображения и возвращает корректный путь"""
-    if not image_path:
-        return None
-    
-    # Проверяем существование файла
-    if os.path.exists(image_path):
-        return image_path
-    
-    # Пробуем найти файл в разных директориях
-    possible_paths = [
-        image_path,
-        os.path.join('images', os.path.basename(image_path)),
-        os.path.join('task_images', os.path.basename(image_path)),
-        image_path.replace('\\', '/'),  # Для Windows путей
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            logger.info(f"✅ Изображение найдено по альтернативному пути: {path}")
-            return path
-    
-    logger.warning(f"⚠️ Файл изображения не найден: {image_path}")
-    return None
+    """Проверяет существование файла изображения и возвращает корректный путь (результат кэшируется)"""
+    return image_path_cache.validate(image_path)
 
 async def execute_task(task_id, task_data):
     """Выполняет задачу - отправляет сообщение в указанный чат"""
@@ -69,6 +48,18 @@ async def execute_task(task_id, task_data):
     try:
         logger.info(f"🔄 Выполнение задачи: {task_data.template_name} (ID: {task_id})")
         
+        # Диспетчер хранит снимок задачи: удаленная или отключенная после
+        # планирования задача не отправляется
+        try:
+            current = task_repository.get(task_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось проверить задачу {task_id} в репозитории, отправляем по расписанию: {e}")
+        else:
+            if current is None or not current.is_active:
+                logger.info(f"⏭️ Задача {task_id} удалена или отключена, отправка пропущена")
+                unschedule_task(task_id)
+                return
+        
         # Определяем чат для отправки
         target_chat_id = task_data.target_chat_id
         
@@ -84,7 +75,8 @@ async def execute_task(task_id, task_data):
         
         # ПОДГОТАВЛИВАЕМ СООБЩЕНИЕ
         message_text = task_data.template_text
-        image_path = validate_image_path(task_data.template_image)
+        # Путь найден при планировании задачи - без обращения к диску
+        image_path, image_signature = image_path_cache.lookup(task_data.template_image)
         
         logger.info(f"📊 Данные для отправки: текст='{message_text[:50]}...', изображение='{image_path}'")
         
@@ -97,31 +89,48 @@ async def execute_task(task_id, task_data):
             chat_ids_to_try.append(abs(target_chat_id))
         
         success = False
+        rate_limited = False
         last_error = None
         
+        # Все отправки идут через очередь с лимитами Telegram
         for chat_id in chat_ids_to_try:
             try:
                 # ПРОВЕРЯЕМ И ОТПРАВЛЯЕМ ИЗОБРАЖЕНИЕ С ТЕКСТОМ
                 if image_path:
                     logger.info(f"🖼️ Попытка отправки изображения: {image_path}")
-                    with open(image_path, 'rb') as photo:
-                        await bot_instance.send_photo(
+                    try:
+                        # Повторные отправки идут по file_id без загрузки файла
+                        await send_queue.send(chat_id, lambda: send_photo(
+                            bot_instance, chat_id, image_path, message_text, image_signature
+                        ))
+                        logger.info(f"✅ Отправлено фото + текст в чат {chat_id}")
+                    except FileNotFoundError:
+                        # Файл удалили после планирования - отправляем только текст
+                        logger.warning(f"⚠️ Файл изображения не найден: {image_path}")
+                        image_path_cache.invalidate(image_path)
+                        image_path = None
+                        await send_queue.send(chat_id, lambda: bot_instance.send_message(
                             chat_id=chat_id,
-                            photo=photo,
-                            caption=message_text
-                        )
-                    logger.info(f"✅ Отправлено фото + текст в чат {chat_id}")
+                            text=message_text
+                        ))
+                        logger.info(f"✅ Отправлен текст в чат {chat_id}")
                 else:
                     # Если изображения нет, отправляем только текст
-                    await bot_instance.send_message(
+                    await send_queue.send(chat_id, lambda: bot_instance.send_message(
                         chat_id=chat_id,
                         text=message_text
-                    )
+                    ))
                     logger.info(f"✅ Отправлен текст в чат {chat_id}")
                 
                 success = True
                 break
                 
+            except RetryAfter as e:
+                # Чат доступен, но Telegram ограничил частоту - это не ошибка чата
+                last_error = e
+                rate_limited = True
+                logger.warning(f"⚠️ Чат {chat_id}: лимит Telegram не снят после повторов: {e}")
+                break
             except TelegramError as e:
                 last_error = e
                 logger.warning(f"⚠️ Не удалось отправить в чат {chat_id}: {e}")
@@ -132,26 +141,24 @@ async def execute_task(task_id, task_data):
                 continue
         
         if success:
-            # Обновляем время выполнения
-            update_task_execution_time(task_id)
-            
-            # Обновляем следующее выполнение
-            from task_manager import update_task_next_execution
-            update_task_next_execution(task_id)
-            
-            # ДЛЯ ТЕСТОВЫХ ЗАДАЧ: деактивируем после выполнения
+            # ДЛЯ ТЕСТОВЫХ ЗАДАЧ: деактивируем после выполнения,
+            # для обычных - пересчитываем следующее выполнение.
+            # В базу отметка уходит пачкой фоновой записью, не задерживая отправки
             if task_data.is_test:
-                success_deactivate, message = deactivate_task(task_id)
-                if success_deactivate:
-                    logger.info(f"✅ Тестовая задача {task_id} деактивирована после выполнения")
-                    unschedule_task(task_id)
-                else:
-                    logger.error(f"❌ Ошибка деактивации тестовой задачи {task_id}: {message}")
+                task_bookkeeper.mark_executed(task_id, deactivate=True)
+                logger.info(f"✅ Тестовая задача {task_id} деактивирована после выполнения")
+                unschedule_task(task_id)
+            else:
+                # Следующий запуск диспетчер уже отметил сам
+                task_bookkeeper.mark_executed(task_id)
             
             logger.info(f"✅ Задача выполнена: {task_data.template_name}")
+        elif rate_limited:
+            # Задача остается активной и будет отправлена в следующий запуск
+            logger.error(f"❌ Задача {task_id} не отправлена из-за лимитов Telegram: {last_error}")
         else:
             logger.error(f"❌ Не удалось отправить сообщение ни в один вариант чата. Последняя ошибка: {last_error}")
-            deactivate_task(task_id)
+            task_bookkeeper.mark_inactive(task_id)
             unschedule_task(task_id)
         
     except Exception as e:
@@ -168,29 +175,26 @@ async def execute_test_task(template, update, context, target_chat_id=None):
         logger.info(f"🧪 Выполнение тестовой задачи: {template['name']} в чат {target_chat_id}")
         
         message_text = template.get('text', '')
-        image_path = template.get('image')
+        image_path, image_signature = image_path_cache.lookup(template.get('image'))
         
         logger.info(f"📊 Тестовые данные: текст='{message_text[:50]}...', изображение='{image_path}'")
 
         # ПРОВЕРЯЕМ И ОТПРАВЛЯЕМ ИЗОБРАЖЕНИЕ С ТЕКСТОМ
-        if image_path and os.path.exists(image_path):
+        if image_path:
             logger.info(f"🖼️ Попытка отправки тестового изображения: {image_path}")
-            with open(image_path, 'rb') as photo:
-                await context.bot.send_photo(
-                    chat_id=target_chat_id,
-                    photo=photo,
-                    caption=message_text
-                )
+            await send_queue.send(target_chat_id, lambda: send_photo(
+                context.bot, target_chat_id, image_path, message_text, image_signature
+            ))
             logger.info(f"✅ Тест: отправлено фото + текст в чат {target_chat_id}")
         else:
             # Если изображения нет или файл не существует, отправляем только текст
-            if image_path:
-                logger.warning(f"⚠️ Файл тестового изображения не найден: {image_path}")
+            if template.get('image'):
+                logger.warning(f"⚠️ Файл тестового изображения не найден: {template.get('image')}")
             
-            await context.bot.send_message(
+            await send_queue.send(target_chat_id, lambda: context.bot.send_message(
                 chat_id=target_chat_id,
                 text=message_text
-            )
+            ))
             logger.info(f"✅ Тест: отправлен текст в чат {target_chat_id}")
         
     except Exception as e:
@@ -201,24 +205,37 @@ async def execute_test_task(template, update, context, target_chat_id=None):
             reply_markup=get_tasks_main_keyboard()
         )
 
+def load_due_tasks(until):
+    """
+    Задачи из базы с запуском не позже until: [(task_id, время запуска, task_data)].
+    Список собирается целиком, поэтому при ошибке чтения не возвращается неполное окно.
+    """
+    return [
+        (task.id, datetime.strptime(task.next_execution, "%Y-%m-%d %H:%M:%S"), task)
+        for task in db.iter_due_tasks(until)
+    ]
+
 def schedule_existing_tasks():
-    """Планирует существующие активные задачи"""
+    """
+    Готовит расписание к запуску: задачам без рассчитанного next_execution
+    (созданным до появления индекса расписания) он рассчитывается и
+    записывается. Сами запуски диспетчер подгружает из базы окнами.
+    """
     global task_scheduler
     
     if not task_scheduler:
         logger.error("❌ Планировщик не инициализирован")
         return
     
-    active_tasks = get_all_active_tasks()
-    scheduled_count = 0
-    
-    for task_id, task in active_tasks.items():
-        if task.is_active and not task.is_test:
-            success = schedule_task(task_id, task)
-            if success:
-                scheduled_count += 1
+    rows = []
+    for task in db.iter_unscheduled_tasks():
+        next_execution = TaskScheduleCalculator.calculate_next_execution(task)
+        if next_execution:
+            rows.append((task.id, None, next_execution.strftime("%Y-%m-%d %H:%M:%S"), True, None))
     
-    logger.info(f"✅ Запланировано задач: {scheduled_count}")
+    if rows:
+        db.update_task_executions(rows)
+        logger.info(f"✅ Рассчитан следующий запуск для задач без расписания: {len(rows)}")
 
 def schedule_test_task(task_id, task_data):
     """Планирует выполнение тестовой задачи через 5 секунд"""
@@ -229,16 +246,10 @@ def schedule_test_task(task_id, task_data):
         return False
     
     try:
-        execution_time = datetime.now() + timedelta(seconds=5)
+        execution_time = now_local() + timedelta(seconds=5)
+        validate_image_path(task_data.template_image)
         
-        task_scheduler.add_job(
-            execute_task,
-            trigger=DateTrigger(run_date=execution_time),
-            args=[task_id, task_data],
-            id=f"test_{task_id}",
-            name=f"test_task_{task_id}",
-            replace_existing=True
-        )
+        task_scheduler.schedule_once(task_id, task_data, execution_time)
         
         logger.info(f"✅ Тестовая задача запланирована на: {execution_time}")
         return True
@@ -260,57 +271,28 @@ def schedule_task(task_id, task_data):
             logger.warning(f"⚠️ Не могу запланировать задачу {task_id}: нет времени")
             return False
         
-        # Создаем триггеры для каждого времени
-        for time_str in task_data.schedule.times:
-            hour, minute = map(int, time_str.split(':'))
-            
-            if task_data.schedule.schedule_type == 'week_days':
-                # Расписание по дням недели
-                if not task_data.schedule.week_days:
-                    logger.warning(f"⚠️ Не могу запланировать задачу {task_id}: нет дней недели")
-                    return False
-                
-                days_str = ','.join(map(str, task_data.schedule.week_days))
-                
-                trigger = CronTrigger(
-                    day_of_week=days_str,
-                    hour=hour,
-                    minute=minute,
-                    timezone=pytz.timezone('Europe/Moscow')
-                )
-                
-            elif task_data.schedule.schedule_type == 'month_days':
-                # Расписание по числам месяца
-                if not task_data.schedule.month_days:
-                    logger.warning(f"⚠️ Не могу запланировать задачу {task_id}: нет чисел месяца")
-                    return False
-                
-                days_str = ','.join(map(str, task_data.schedule.month_days))
-                
-                trigger = CronTrigger(
-                    day=days_str,
-                    hour=hour,
-                    minute=minute,
-                    timezone=pytz.timezone('Europe/Moscow')
-                )
-                
-            else:
-                logger.warning(f"⚠️ Неизвестный тип расписания для задачи {task_id}")
+        if task_data.schedule.schedule_type == 'week_days':
+            if not task_data.schedule.week_days:
+                logger.warning(f"⚠️ Не могу запланировать задачу {task_id}: нет дней недели")
                 return False
-            
-            # Добавляем задачу в планировщик с уникальным ID для каждого времени
-            job_id = f"{task_id}_{time_str.replace(':', '')}"
-            
-            task_scheduler.add_job(
-                execute_task,
-                trigger=trigger,
-                args=[task_id, task_data],
-                id=job_id,
-                name=f"task_{task_id}_{time_str}",
-                replace_existing=True
-            )
+        elif task_data.schedule.schedule_type == 'month_days':
+            if not task_data.schedule.month_days:
+                logger.warning(f"⚠️ Не могу запланировать задачу {task_id}: нет чисел месяца")
+                return False
+        else:
+            logger.warning(f"⚠️ Неизвестный тип расписания для задачи {task_id}")
+            return False
+        
+        # Путь к изображению ищется сейчас, чтобы при отправке не обращаться к диску
+        validate_image_path(task_data.template_image)
         
-        logger.info(f"✅ Задача запланирована: {task_data.template_name}")
+        # Ближайший запуск кладется в кучу диспетчера; следующие он рассчитает сам
+        next_run = task_scheduler.schedule(task_id, task_data)
+        if next_run is None:
+            logger.warning(f"⚠️ Не удалось рассчитать время запуска задачи {task_id}")
+            return False
+        
+        logger.info(f"✅ Задача запланирована: {task_data.template_name} (ближайший запуск {next_run})")
         return True
         
     except Exception as e:
@@ -325,15 +307,8 @@ def unschedule_task(task_id):
         return False
     
     try:
-        # Удаляем все задания для этой задачи
-        jobs_removed = 0
-        for job in task_scheduler.get_jobs():
-            if job.id.startswith(task_id) or job.id.startswith(f"test_{task_id}"):
-                task_scheduler.remove_job(job.id)
-                jobs_removed += 1
-        
-        if jobs_removed > 0:
-            logger.info(f"✅ Задача {task_id} удалена из планировщика ({jobs_removed} заданий)")
+        if task_scheduler.unschedule(task_id):
+            logger.info(f"✅ Задача {task_id} удалена из планировщика")
             return True
         else:
             logger.warning(f"⚠️ Задача {task_id} не найдена в планировщике")
@@ -351,15 +326,17 @@ def start_scheduler():
         task_scheduler.start()
         schedule_existing_tasks()
         
-        jobs = task_scheduler.get_jobs()
-        logger.info(f"✅ Планировщик задач запущен. Запланировано jobs: {len(jobs)}")
+        logger.info(
+            f"✅ Планировщик задач запущен. Расписание подгружается из базы "
+            f"на {int(task_scheduler.horizon.total_seconds() // 60)} мин вперед"
+        )
 
 def stop_scheduler():
     """Останавливает планировщик"""
     global task_scheduler
     
     if task_scheduler and task_scheduler.running:
-        task_scheduler.shutdown(wait=False)
+        task_scheduler.shutdown()
         logger.info("✅ Планировщик задач остановлен")
 
 def get_scheduler_status():
@@ -370,11 +347,10 @@ def get_scheduler_status():
         return "❌ Планировщик не инициализирован"
     
     status = "✅ Планировщик запущен\n" if task_scheduler.running else "❌ Планировщик остановлен\n"
-    jobs = task_scheduler.get_jobs()
-    status += f"📊 Запланировано задач: {len(jobs)}\n"
+    entries = task_scheduler.get_entries()
+    status += f"📊 Запусков в ближайшие {int(task_scheduler.horizon.total_seconds() // 60)} мин: {len(entries)}\n"
     
-    for job in jobs:
-        next_run = job.next_run_time.strftime("%Y-%m-%d %H:%M:%S") if job.next_run_time else "Не запланировано"
-        status += f"  - {job.name}: {next_run}\n"
+    for next_run, task_id, task_data in entries:
+        status += f"  - task_{task_id} ({task_data.template_name}): {next_run.strftime('%Y-%m-%d %H:%M:%S')}\n"
     
-    return status
\ No newline at end of file
+    return status
@@ -121,7 +121,12 @@ class TimeCalculator:
             return "Не запланировано"
         
         from datetime import datetime
-        now = datetime.now()
+        from task_calculators import now_local
+        now = now_local()
+        
+        # Задачи из базы хранят время строкой
+        if isinstance(next_execution, str):
+            next_execution = datetime.strptime(next_execution, "%Y-%m-%d %H:%M:%S")
         
         if next_execution <= now:
             return "Сейчас"
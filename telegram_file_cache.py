@@ -0,0 +1,132 @@
+"""
+Кэш file_id изображений, уже загруженных в Telegram
+
+При первой отправке изображение загружается файлом, а file_id из ответа
+Telegram сохраняется в таблицу telegram_files вместе с размером и mtime файла.
+Следующие отправки ссылаются на file_id и не передают байты повторно. Если файл
+на диске заменили (редактирование изображения шаблона), размер или mtime не
+совпадут и изображение будет загружено заново.
+"""
+
+import logging
+import os
+import threading
+
+from telegram.error import BadRequest
+
+from database import db
+from cache_registry import cache_registry
+
+logger = logging.getLogger(__name__)
+
+
+def _file_signature(image_path):
+    """(размер, mtime) файла или None, если файла нет"""
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class TelegramFileCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._files = {}
+        self.hits = 0
+        self.uploads = 0
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._files = db.load_telegram_files()
+                self._loaded = True
+
+    def get(self, image_path, signature=None):
+        """
+        Возвращает file_id для неизмененного файла или None.
+        signature - уже известные (размер, mtime) файла, чтобы не обращаться к диску.
+        """
+        self._ensure_loaded()
+        entry = self._files.get(image_path)
+        if entry is None:
+            return None
+        if signature is None:
+            signature = _file_signature(image_path)
+        if signature is None or tuple(signature) != (entry[0], entry[1]):
+            return None
+        return entry[2]
+
+    def remember(self, image_path, file_id):
+        """Сохраняет file_id только что загруженного файла"""
+        signature = _file_signature(image_path)
+        if signature is None:
+            return False
+        self._ensure_loaded()
+        with self._lock:
+            self._files[image_path] = (signature[0], signature[1], file_id)
+        return db.save_telegram_file(image_path, signature[0], signature[1], file_id)
+
+    def invalidate(self, image_path):
+        """Удаляет file_id изображения (файл заменен или удален)"""
+        self.forget(image_path)
+        return db.delete_telegram_file(image_path)
+
+    def forget(self, image_path):
+        """Убирает file_id только из памяти процесса"""
+        with self._lock:
+            self._files.pop(image_path, None)
+
+    def reload(self):
+        """Сбрасывает кэш; file_id будут перечитаны при следующем обращении"""
+        with self._lock:
+            self._files = {}
+            self._loaded = False
+
+    def stats(self):
+        """Размер кэша и счетчики"""
+        return {
+            'size': len(self._files),
+            'hits': self.hits,
+            'misses': self.uploads,
+        }
+
+
+# Глобальный экземпляр кэша file_id
+telegram_file_cache = TelegramFileCache()
+
+cache_registry.register(
+    'file_ids',
+    telegram_file_cache.stats,
+    telegram_file_cache.reload,
+    lambda: telegram_file_cache._files
+)
+
+
+async def send_photo(bot, chat_id, image_path, caption=None, signature=None):
+    """
+    Отправляет изображение по сохраненному file_id, а при его отсутствии
+    загружает файл и запоминает file_id из ответа Telegram
+    """
+    from database_async import async_db
+
+    file_id = await async_db.run(telegram_file_cache.get, image_path, signature)
+    if file_id:
+        try:
+            message = await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption)
+            telegram_file_cache.hits += 1
+            return message
+        except BadRequest as e:
+            # file_id мог стать недействительным - пробуем загрузить файл заново
+            logger.warning(f"⚠️ Отправка по file_id не удалась ({image_path}): {e}")
+
+    with open(image_path, 'rb') as photo:
+        message = await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption)
+    telegram_file_cache.uploads += 1
+
+    if message.photo:
+        await async_db.run(telegram_file_cache.remember, image_path, message.photo[-1].file_id)
+    return message
@@ -0,0 +1,158 @@
+"""
+Кэш шаблонов в памяти процесса
+
+Шаблоны загружаются из базы один раз и индексируются по ID, по группе и по
+паре (группа, имя). Запись шаблона в базу (DatabaseManager.save_template,
+save_templates, delete_template) помечает шаблон устаревшим: при следующем
+чтении перечитывается только он. Каждое изменение увеличивает version, по
+которому зависимые кэши понимают, что их данные устарели.
+"""
+
+import logging
+import threading
+
+from database import db
+from cache_registry import cache_registry
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateCache:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._templates = {}
+        self._by_group = {}
+        self._by_name = {}
+        self._ordered = []
+        self._dirty = set()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ===== ЗАГРУЗКА И ИНВАЛИДАЦИЯ =====
+
+    def _ensure_fresh(self):
+        """
+        Загружает шаблоны при первом обращении и перечитывает устаревшие.
+        Ошибка полной загрузки пробрасывается, кэш остается незагруженным;
+        шаблон, который не удалось перечитать, остается в кэше и помеченным
+        устаревшим до следующего чтения
+        """
+        if self._loaded and not self._dirty:
+            self.hits += 1
+            return
+        self.misses += 1
+        with self._lock:
+            if not self._loaded:
+                templates = {template['id']: template for template in db.iter_templates(raise_errors=True)}
+                self._templates = templates
+                self._dirty.clear()
+                self._rebuild_indexes()
+                self._loaded = True
+                logger.info(f"✅ Кэш шаблонов загружен: {len(self._templates)} шаблонов")
+                return
+
+            if self._dirty:
+                dirty, self._dirty = self._dirty, set()
+                for template_id in dirty:
+                    try:
+                        template = db.get_template(template_id, raise_errors=True)
+                    except Exception as e:
+                        logger.error(f"❌ Шаблон {template_id} не перечитан, в кэше оставлена прежняя версия: {e}")
+                        self._dirty.add(template_id)
+                        continue
+                    if template:
+                        self._templates[template_id] = template
+                    else:
+                        self._templates.pop(template_id, None)
+                self._rebuild_indexes()
+
+    def _rebuild_indexes(self):
+        # Порядок как в базе: новые шаблоны первыми
+        ordered = sorted(
+            self._templates.values(),
+            key=lambda template: template.get('created_at') or '',
+            reverse=True
+        )
+        by_group = {}
+        by_name = {}
+        self._ordered = [template['id'] for template in ordered]
+        for template in ordered:
+            by_group.setdefault(template['group'], []).append(template['id'])
+            by_name.setdefault((template['group'], template['name']), template['id'])
+        self._by_group = by_group
+        self._by_name = by_name
+
+    def invalidate(self, template_id=None):
+        """
+        Помечает шаблон устаревшим (перечитается при следующем чтении);
+        без template_id сбрасывает весь кэш
+        """
+        with self._lock:
+            if template_id is None:
+                self._loaded = False
+                self._templates = {}
+                self._by_group = {}
+                self._by_name = {}
+                self._ordered = []
+                self._dirty.clear()
+            elif self._loaded:
+                self._dirty.add(template_id)
+            self.version += 1
+
+    # ===== ЧТЕНИЕ =====
+
+    def get(self, template_id):
+        """Возвращает шаблон по ID или None"""
+        self._ensure_fresh()
+        with self._lock:
+            template = self._templates.get(template_id)
+            return dict(template) if template else None
+
+    def get_all(self):
+        """Возвращает все шаблоны {ID: шаблон}, новые первыми"""
+        self._ensure_fresh()
+        with self._lock:
+            return {template_id: dict(self._templates[template_id]) for template_id in self._ordered}
+
+    def get_by_group(self, group_id):
+        """Возвращает шаблоны группы списком пар (ID, шаблон)"""
+        self._ensure_fresh()
+        with self._lock:
+            return [
+                (template_id, dict(self._templates[template_id]))
+                for template_id in self._by_group.get(group_id, [])
+            ]
+
+    def find(self, name, group_id):
+        """Возвращает шаблон по имени внутри группы или None"""
+        self._ensure_fresh()
+        with self._lock:
+            template_id = self._by_name.get((group_id, name))
+            return dict(self._templates[template_id]) if template_id else None
+
+    def stats(self):
+        """Размеры кэша"""
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'templates': len(self._templates),
+                'groups': len(self._by_group),
+                'size': len(self._templates),
+                'dirty': len(self._dirty),
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Глобальный экземпляр кэша шаблонов
+template_cache = TemplateCache()
+
+cache_registry.register(
+    'templates',
+    template_cache.stats,
+    template_cache.invalidate,
+    lambda: template_cache._templates
+)
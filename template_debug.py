@@ -43,6 +43,8 @@ def debug_delete_template(template_id):
         if deleted_count > 0:
             logger.info(f"✅ Удалено записей: {deleted_count}")
             conn.commit()
+            from template_cache import template_cache
+            template_cache.invalidate(template_id)
             result = True
         else:
             logger.error("❌ Не удалось удалить запись (rowcount = 0)")
@@ -4,6 +4,9 @@ import uuid
 import shutil
 from datetime import datetime
 from database import db
+from template_cache import template_cache
+from telegram_file_cache import telegram_file_cache
+from image_path_cache import image_path_cache
 
 # Дни недели для отображения
 DAYS_OF_WEEK = {
@@ -109,161 +112,26 @@ def init_database():
 
 def save_template(template_data):
     """Сохраняет шаблон в базу данных"""
-    print(f"💾 Попытка сохранения шаблона в базу данных: {template_data.get('name')}")
-    
-    conn = db.get_connection()
-    if not conn:
-        print("❌ Не удалось подключиться к базе данных для сохранения шаблона")
-        return False
-        
     try:
-        cursor = conn.cursor()
-        
-        # Подготавливаем данные
-        template_id = template_data.get('id')
-        name = template_data.get('name', '')
-        group_name = template_data.get('group', '')
-        text = template_data.get('text', '')
-        image_path = template_data.get('image')
-        time_str = template_data.get('time', '')
-        
-        # Обрабатываем дни - гарантируем что это JSON строка
-        days_data = template_data.get('days', [])
-        if isinstance(days_data, list):
-            days_json = json.dumps(days_data, ensure_ascii=False)
-        else:
-            days_json = '[]'
-            
-        frequency = template_data.get('frequency', '')
-        created_by = template_data.get('created_by')
-        subgroup = template_data.get('subgroup')
-        
-        print(f"📊 Данные для сохранения:")
-        print(f"   ID: {template_id}")
-        print(f"   Name: {name}")
-        print(f"   Group: {group_name}")
-        print(f"   Text: {text[:50]}...")
-        print(f"   Time: {time_str}")
-        print(f"   Days: {days_data}")
-        print(f"   Frequency: {frequency}")
-        print(f"   Created_by: {created_by}")
-        
-        cursor.execute('''
-            INSERT INTO templates (id, name, group_name, text, image_path, time, days, frequency, created_by, subgroup)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO UPDATE SET
-                name = EXCLUDED.name,
-                group_name = EXCLUDED.group_name,
-                text = EXCLUDED.text,
-                image_path = EXCLUDED.image_path,
-                time = EXCLUDED.time,
-                days = EXCLUDED.days,
-                frequency = EXCLUDED.frequency,
-                subgroup = EXCLUDED.subgroup
-        ''', (
-            template_id,
-            name,
-            group_name,
-            text,
-            image_path,
-            time_str,
-            days_json,
-            frequency,
-            created_by,
-            subgroup
-        ))
-        
-        conn.commit()
-        
-        # Проверим что действительно сохранилось
-        cursor.execute('SELECT COUNT(*) FROM templates WHERE id = %s', (template_id,))
-        count = cursor.fetchone()[0]
-        
-        cursor.close()
-        conn.close()
-        
-        if count > 0:
-            print(f"✅ Шаблон {template_id} успешно сохранен в базе данных (проверено: {count} записей)")
-            return True
-        else:
-            print(f"❌ Шаблон {template_id} не был сохранен в базу данных")
-            return False
-        
+        return db.save_template(template_data)
     except Exception as e:
         print(f"❌ Ошибка сохранения шаблона: {e}")
-        import traceback
-        traceback.print_exc()
-        try:
-            conn.rollback()
-            conn.close()
-        except:
-            pass
         return False
 
+def save_templates(templates):
+    """Сохраняет список шаблонов одним пакетом, возвращает ID сохраненных"""
+    try:
+        return db.save_templates(templates)
+    except Exception as e:
+        print(f"❌ Ошибка пакетного сохранения шаблонов: {e}")
+        return []
+
 def load_templates():
-    """Загружает все шаблоны из базы данных"""
-    print("📂 Загрузка шаблонов из базы данных...")
-    
-    conn = db.get_connection()
-    if not conn:
-        print("❌ Не удалось подключиться к базе данных для загрузки шаблонов")
-        return {}
-        
+    """Возвращает все шаблоны (из кэша шаблонов)"""
     try:
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM templates ORDER BY created_at DESC')
-        rows = cursor.fetchall()
-        
-        templates = {}
-        for row in rows:
-            try:
-                # Обрабатываем дни
-                days_data = []
-                if row[6]:  # days field
-                    try:
-                        if isinstance(row[6], (str, bytes, bytearray)):
-                            days_data = json.loads(row[6])
-                        else:
-                            days_data = row[6]
-                    except Exception as e:
-                        print(f"⚠️ Ошибка парсинга дней для шаблона {row[0]}: {e}")
-                        days_data = []
-                
-                template = {
-                    'id': row[0],
-                    'name': row[1],
-                    'group': row[2],
-                    'text': row[3],
-                    'image': row[4],
-                    'time': row[5],
-                    'days': days_data,
-                    'frequency': row[7],
-                    'created_by': row[8],
-                    'created_at': row[9].strftime("%Y-%m-%d %H:%M:%S") if row[9] else None,
-                    'subgroup': row[10]
-                }
-                templates[template['id']] = template
-                print(f"📥 Загружен шаблон: {template['name']} (ID: {template['id']})")
-                
-            except Exception as e:
-                print(f"❌ Ошибка обработки строки шаблона: {e}")
-                continue
-        
-        cursor.close()
-        conn.close()
-        
-        print(f"✅ Загружено {len(templates)} шаблонов из базы данных")
-        return templates
-        
+        return template_cache.get_all()
     except Exception as e:
         print(f"❌ Ошибка загрузки шаблонов: {e}")
-        import traceback
-        traceback.print_exc()
-        try:
-            conn.close()
-        except:
-            pass
         return {}
 
 def get_all_templates():
@@ -272,57 +140,16 @@ def get_all_templates():
 
 def load_groups():
     """Загружает группы из базы данных"""
-    print("📂 Загрузка групп из базы данных...")
-    
-    conn = db.get_connection()
-    if not conn:
-        print("❌ Не удалось подключиться к базе данных для загрузки групп")
-        return {"groups": {}}
-        
     try:
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM template_groups')
-        rows = cursor.fetchall()
-        
-        groups = {"groups": {}}
-        for row in rows:
-            # Исправляем обработку JSON данных
-            allowed_users = []
-            if row[2]:
-                try:
-                    if isinstance(row[2], (str, bytes, bytearray)):
-                        allowed_users = json.loads(row[2])
-                    else:
-                        allowed_users = row[2]  # Уже список
-                except:
-                    allowed_users = []
-            
-            groups["groups"][row[0]] = {
-                "name": row[1],
-                "allowed_users": allowed_users
-            }
-            print(f"📥 Загружена группа: {row[1]} (ID: {row[0]})")
-        
-        cursor.close()
-        conn.close()
-        
-        print(f"✅ Загружено {len(groups['groups'])} групп из базе данных")
-        return groups
-        
+        return db.load_groups()
     except Exception as e:
         print(f"❌ Ошибка загрузки групп: {e}")
-        try:
-            conn.close()
-        except:
-            pass
         return {"groups": {}}
 
 def get_template_by_id(template_id):
     """Возвращает шаблон по ID"""
     try:
-        templates = load_templates()
-        return templates.get(template_id)
+        return template_cache.get(template_id)
     except Exception as e:
         print(f"❌ Ошибка получения шаблона по ID {template_id}: {e}")
         return None
@@ -330,30 +157,17 @@ def get_template_by_id(template_id):
 def delete_template(template_id):
     """Удаляет шаблон (совместимость)"""
     try:
-        from database import db
+        from template_manager_simplified import simplified_template_manager
         
         # Сначала получаем шаблон, чтобы удалить изображение если есть
-        templates_data = simplified_template_manager.load_templates()
-        template = templates_data.get(template_id)
+        template = template_cache.get(template_id)
         
         if template and template.get('image'):
             # Удаляем изображение
             simplified_template_manager.delete_image(template['image'])
         
         # Удаляем шаблон из базы данных
-        conn = db.get_connection()
-        if not conn:
-            return False
-            
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM templates WHERE id = %s', (template_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        print(f"✅ Шаблон {template_id} удален из базы данных")
-        return True
+        return db.delete_template(template_id)
         
     except Exception as e:
         print(f"❌ Ошибка удаления шаблона {template_id}: {e}")
@@ -374,9 +188,10 @@ def get_user_accessible_groups(user_id):
         groups_data = load_groups()
         accessible_groups = {}
         
-        for group_id in accessible_group_ids:
-            if group_id in groups_data.get('groups', {}):
-                accessible_groups[group_id] = groups_data['groups'][group_id]
+        # Порядок групп как в базе, доступ проверяется по множеству
+        for group_id, group in groups_data.get('groups', {}).items():
+            if group_id in accessible_group_ids:
+                accessible_groups[group_id] = group
         
         return accessible_groups
     except Exception as e:
@@ -386,15 +201,7 @@ def get_user_accessible_groups(user_id):
 def get_templates_by_group(group_id):
     """Возвращает шаблоны определенной группы (совместимость)"""
     try:
-        from template_manager_simplified import simplified_template_manager
-        templates_data = simplified_template_manager.load_templates()
-        group_templates = []
-        
-        for template_id, template in templates_data.items():
-            if template.get('group') == group_id:
-                group_templates.append((template_id, template))
-        
-        return group_templates
+        return template_cache.get_by_group(group_id)
     except Exception as e:
         print(f"❌ Ошибка получения шаблонов группы {group_id}: {e}")
         return []
@@ -540,12 +347,9 @@ def update_template_field(template_id, field_name, field_value):
 def get_template_by_name_and_group(template_name, group_id):
     """Возвращает шаблон по имени и группе (совместимость)"""
     try:
-        from template_manager_simplified import simplified_template_manager
-        templates_data = simplified_template_manager.load_templates()
-        
-        for template_id, template in templates_data.items():
-            if template.get('name') == template_name and template.get('group') == group_id:
-                return template_id, template
+        template = template_cache.find(template_name, group_id)
+        if template:
+            return template['id'], template
         return None, None
     except Exception as e:
         print(f"❌ Ошибка поиска шаблона по имени {template_name} в группе {group_id}: {e}")
@@ -584,6 +388,10 @@ def save_image(image_bytes, template_id):
         with open(image_path, 'wb') as f:
             f.write(image_bytes)
         
+        # Файл перезаписан - старый file_id в Telegram больше не подходит
+        telegram_file_cache.invalidate(image_path)
+        image_path_cache.invalidate(image_path)
+        
         print(f"✅ Изображение сохранено: {image_path}")
         return image_path
         
@@ -596,6 +404,8 @@ def delete_image(image_path):
     try:
         if image_path and os.path.exists(image_path):
             os.remove(image_path)
+            telegram_file_cache.invalidate(image_path)
+            image_path_cache.invalidate(image_path)
             print(f"✅ Изображение удалено: {image_path}")
             return True
         return False
@@ -656,13 +466,7 @@ def get_template_by_name(template_name):
 def template_exists(template_name, group_id):
     """Проверяет, существует ли шаблон с таким именем в группе (совместимость)"""
     try:
-        from template_manager_simplified import simplified_template_manager
-        templates_data = simplified_template_manager.load_templates()
-        
-        for template in templates_data.values():
-            if template.get('name') == template_name and template.get('group') == group_id:
-                return True
-        return False
+        return template_cache.find(template_name, group_id) is not None
     except Exception as e:
         print(f"❌ Ошибка проверки существования шаблона {template_name}: {e}")
         return False
@@ -845,67 +649,82 @@ def get_user_template_access(user_id):
 def format_all_templates_info(user_id):
     """Форматирует информацию о всех шаблонах пользователя"""
     try:
-        access_info = get_user_template_access(user_id)
-        
-        if not access_info['user_templates']:
-            return "📭 У вас нет доступных шаблонов"
-        
-        message = "📋 **Все ваши шаблоны:**\n\n"
-        
-        # Группируем по группам для лучшего отображения
-        for group_id, templates in access_info['templates_by_group'].items():
-            group_name = access_info['accessible_groups'].get(group_id, {}).get('name', group_id)
-            message += f"**🏷️ {group_name}:**\n"
-            
-            for i, (template_id, template) in enumerate(templates, 1):
-                days_count = len(safe_get_template_value(template, 'days', []))
-                has_image = "🖼️" if template.get('image') else ""
-                template_name = safe_get_template_value(template, 'name', 'Без названия')
-                template_time = safe_get_template_value(template, 'time', 'Не указано')
-                
-                message += f"  {i}. **{template_name}** {has_image}\n"
-                message += f"     ⏰ {template_time} | 📅 {days_count} дней\n"
-                message += f"     📄 {template['text'][:50]}...\n\n"
+        from acl_manager import acl
+        from render_cache import cached_render
         
-        message += f"**Всего:** {access_info['total_templates']} шаблонов в {access_info['total_groups']} группах"
-        
-        return message
+        # Текст зависит только от шаблонов и прав пользователя
+        key = ('templates_all', user_id, acl.get_user_version(user_id), template_cache.version)
+        return cached_render(key, lambda: _format_all_templates_info(user_id))
     except Exception as e:
         print(f"❌ Ошибка форматирования всех шаблонов: {e}")
         return "❌ Ошибка загрузки информации о шаблонах"
 
-def format_group_templates_detailed(group_id):
-    """Детальная информация о шаблонах группы"""
-    try:
-        templates = get_templates_by_group(group_id)
-        
-        if not templates:
-            return f"📭 В этой группе нет шаблонов"
-        
-        groups_data = load_groups()
-        group_name = groups_data['groups'].get(group_id, {}).get('name', group_id)
-        
-        message = f"**🏷️ Группа: {group_name}**\n\n"
+def _format_all_templates_info(user_id):
+    """Отрисовка всех шаблонов пользователя (без кэша)"""
+    access_info = get_user_template_access(user_id)
+    
+    if not access_info['user_templates']:
+        return "📭 У вас нет доступных шаблонов"
+    
+    message = "📋 **Все ваши шаблоны:**\n\n"
+    
+    # Группируем по группам для лучшего отображения
+    for group_id, templates in access_info['templates_by_group'].items():
+        group_name = access_info['accessible_groups'].get(group_id, {}).get('name', group_id)
+        message += f"**🏷️ {group_name}:**\n"
         
         for i, (template_id, template) in enumerate(templates, 1):
-            days_names = safe_format_days_list(template.get('days', []))
-            frequency = safe_get_frequency_name(template.get('frequency', 'Не указана'))
-            has_image = "✅ Есть" if template.get('image') else "❌ Нет"
+            days_count = len(safe_get_template_value(template, 'days', []))
+            has_image = "🖼️" if template.get('image') else ""
+            template_name = safe_get_template_value(template, 'name', 'Без названия')
+            template_time = safe_get_template_value(template, 'time', 'Не указано')
             
-            message += f"**{i}. {template['name']}**\n"
-            message += f"   📄 Текст: {template['text'][:80]}...\n"
-            message += f"   🖼️ Изображение: {has_image}\n"
-            message += f"   ⏰ Время: {template.get('time', 'Не указано')}\n"
-            message += f"   📅 Дни: {', '.join(days_names) if days_names else 'Не указаны'}\n"
-            message += f"   🔄 Периодичность: {frequency}\n\n"
+            message += f"  {i}. **{template_name}** {has_image}\n"
+            message += f"     ⏰ {template_time} | 📅 {days_count} дней\n"
+            message += f"     📄 {template['text'][:50]}...\n\n"
+    
+    message += f"**Всего:** {access_info['total_templates']} шаблонов в {access_info['total_groups']} группах"
+    
+    return message
+
+def format_group_templates_detailed(group_id):
+    """Детальная информация о шаблонах группы"""
+    try:
+        from render_cache import cached_render
         
-        return message
+        key = ('templates_group', group_id, template_cache.version)
+        return cached_render(key, lambda: _format_group_templates_detailed(group_id))
     except Exception as e:
         print(f"❌ Ошибка форматирования детальной информации группы {group_id}: {e}")
         return f"❌ Ошибка загрузки информации о группе"
 
+def _format_group_templates_detailed(group_id):
+    """Отрисовка шаблонов группы (без кэша)"""
+    templates = get_templates_by_group(group_id)
+    
+    if not templates:
+        return f"📭 В этой группе нет шаблонов"
+    
+    groups_data = load_groups()
+    group_name = groups_data['groups'].get(group_id, {}).get('name', group_id)
+    
+    message = f"**🏷️ Группа: {group_name}**\n\n"
+    
+    for i, (template_id, template) in enumerate(templates, 1):
+        days_names = safe_format_days_list(template.get('days', []))
+        frequency = safe_get_frequency_name(template.get('frequency', 'Не указана'))
+        has_image = "✅ Есть" if template.get('image') else "❌ Нет"
+        
+        message += f"**{i}. {template['name']}**\n"
+        message += f"   📄 Текст: {template['text'][:80]}...\n"
+        message += f"   🖼️ Изображение: {has_image}\n"
+        message += f"   ⏰ Время: {template.get('time', 'Не указано')}\n"
+        message += f"   📅 Дни: {', '.join(days_names) if days_names else 'Не указаны'}\n"
+        message += f"   🔄 Периодичность: {frequency}\n\n"
+    
+    return message
+
 # Инициализация при импорте
 print("📥 Template_manager загружен")
 init_files()
-init_database()
 print("✅ Template_manager инициализирован")
\ No newline at end of file
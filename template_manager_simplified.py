@@ -8,6 +8,9 @@ import uuid
 import shutil
 from datetime import datetime
 from database import db
+from template_cache import template_cache
+from telegram_file_cache import telegram_file_cache
+from image_path_cache import image_path_cache
 
 # Директория для изображений
 IMAGES_DIR = "images"
@@ -42,125 +45,18 @@ class SimplifiedTemplateManager:
 
     def save_template(self, template_data):
         """Сохраняет упрощенный шаблон в базу данных"""
-        print(f"💾 Сохранение упрощенного шаблона: {template_data.get('name')}")
-        
-        conn = db.get_connection()
-        if not conn:
-            print("❌ Не удалось подключиться к базе данных")
-            return False
-            
-        try:
-            cursor = conn.cursor()
-            
-            # Подготавливаем данные (только основные поля)
-            template_id = template_data.get('id')
-            name = template_data.get('name', '')
-            group_name = template_data.get('group', '')
-            text = template_data.get('text', '')
-            image_path = template_data.get('image')
-            created_by = template_data.get('created_by')
-            
-            print(f"📊 Данные упрощенного шаблона:")
-            print(f"   ID: {template_id}")
-            print(f"   Name: {name}")
-            print(f"   Group: {group_name}")
-            print(f"   Text: {text[:50]}...")
-            print(f"   Image: {image_path}")
-            print(f"   Created_by: {created_by}")
-            
-            cursor.execute('''
-                INSERT INTO templates (id, name, group_name, text, image_path, created_by)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    name = EXCLUDED.name,
-                    group_name = EXCLUDED.group_name,
-                    text = EXCLUDED.text,
-                    image_path = EXCLUDED.image_path,
-                    created_by = EXCLUDED.created_by
-            ''', (
-                template_id,
-                name,
-                group_name,
-                text,
-                image_path,
-                created_by
-            ))
-            
-            conn.commit()
-            
-            # Проверим что действительно сохранилось
-            cursor.execute('SELECT COUNT(*) FROM templates WHERE id = %s', (template_id,))
-            count = cursor.fetchone()[0]
-            
-            cursor.close()
-            conn.close()
-            
-            if count > 0:
-                print(f"✅ Упрощенный шаблон {template_id} успешно сохранен")
-                return True
-            else:
-                print(f"❌ Упрощенный шаблон {template_id} не был сохранен")
-                return False
-            
-        except Exception as e:
-            print(f"❌ Ошибка сохранения упрощенного шаблона: {e}")
-            import traceback
-            traceback.print_exc()
-            try:
-                conn.rollback()
-                conn.close()
-            except:
-                pass
-            return False
+        return db.save_template(template_data)
+
+    def save_templates(self, templates):
+        """Сохраняет список упрощенных шаблонов одним пакетом"""
+        return db.save_templates(templates)
 
     def load_templates(self):
-        """Загружает все упрощенные шаблоны из базы данных"""
-        print("📂 Загрузка упрощенных шаблонов из базы данных...")
-        
-        conn = db.get_connection()
-        if not conn:
-            print("❌ Не удалось подключиться к базе данных")
-            return {}
-            
+        """Возвращает все упрощенные шаблоны (из кэша шаблонов)"""
         try:
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT id, name, group_name, text, image_path, created_by, created_at FROM templates ORDER BY created_at DESC')
-            rows = cursor.fetchall()
-            
-            templates = {}
-            for row in rows:
-                try:
-                    template = {
-                        'id': row[0],
-                        'name': row[1],
-                        'group': row[2],
-                        'text': row[3],
-                        'image': row[4],
-                        'created_by': row[5],
-                        'created_at': row[6].strftime("%Y-%m-%d %H:%M:%S") if row[6] else None
-                    }
-                    templates[template['id']] = template
-                    print(f"📥 Загружен упрощенный шаблон: {template['name']}")
-                    
-                except Exception as e:
-                    print(f"❌ Ошибка обработки упрощенного шаблона: {e}")
-                    continue
-            
-            cursor.close()
-            conn.close()
-            
-            print(f"✅ Загружено {len(templates)} упрощенных шаблонов")
-            return templates
-            
+            return template_cache.get_all()
         except Exception as e:
             print(f"❌ Ошибка загрузки упрощенных шаблонов: {e}")
-            import traceback
-            traceback.print_exc()
-            try:
-                conn.close()
-            except:
-                pass
             return {}
 
     def create_template(self, template_data):
@@ -230,30 +126,21 @@ class SimplifiedTemplateManager:
     def delete_template(self, template_id):
         """Удаляет шаблон и связанное с ним изображение"""
         try:
-        # Сначала загружаем шаблон, чтобы получить путь к изображению
-            templates = self.load_templates()
-            template = templates.get(template_id)
-        
+            # Сначала получаем шаблон, чтобы узнать путь к изображению
+            template = template_cache.get(template_id)
+            
             if not template:
                 print(f"❌ Шаблон {template_id} не найден")
-            return False
-        
+                return False
+            
             # Удаляем изображение если есть
             if template.get('image'):
                 self.delete_image(template['image'])
-        
-        # Удаляем шаблон из базы данных
-            conn = db.get_connection()
-            if not conn:
+            
+            # Удаляем шаблон из базы данных
+            if not db.delete_template(template_id):
                 return False
             
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM templates WHERE id = %s', (template_id,))
-        
-            conn.commit()
-            cursor.close()
-            conn.close()
-        
             print(f"✅ Шаблон {template_id} успешно удален")
             return True
         
@@ -262,7 +149,7 @@ class SimplifiedTemplateManager:
             import traceback
             traceback.print_exc()
             return False
-            
+
     def save_image(self, image_bytes, template_id):
         """Сохраняет изображение для шаблона"""
         try:
@@ -275,6 +162,10 @@ class SimplifiedTemplateManager:
             with open(image_path, 'wb') as f:
                 f.write(image_bytes)
             
+            # Файл перезаписан - старый file_id в Telegram больше не подходит
+            telegram_file_cache.invalidate(image_path)
+            image_path_cache.invalidate(image_path)
+            
             print(f"✅ Изображение сохранено: {image_path}")
             return image_path
             
@@ -287,6 +178,8 @@ class SimplifiedTemplateManager:
         try:
             if image_path and os.path.exists(image_path):
                 os.remove(image_path)
+                telegram_file_cache.invalidate(image_path)
+                image_path_cache.invalidate(image_path)
                 print(f"✅ Изображение удалено: {image_path}")
                 return True
             return False
@@ -0,0 +1,67 @@
+"""
+Тесты версий кэша ролей: сброс во время чтения роли из базы
+"""
+
+import pytest
+
+import auth_manager
+from auth_manager import AuthManager
+
+
+@pytest.fixture
+def manager():
+    return AuthManager()
+
+
+def test_role_read_is_cached_without_invalidation(manager):
+    token = manager._begin_role_read()
+
+    assert manager._cache_role(1, 'admin', token)
+    assert manager.role_cache.get(1, None) == 'admin'
+
+
+def test_invalidation_during_read_is_not_overwritten(manager):
+    token = manager._begin_role_read()
+    # Роль изменили, пока чтение шло в базу: прочитанное значение устарело
+    manager.invalidate_role(1)
+
+    assert not manager._cache_role(1, 'user', token)
+    assert manager.role_cache.get(1, None) is None
+
+
+def test_invalidation_of_other_user_does_not_block_caching(manager):
+    token = manager._begin_role_read()
+    manager.invalidate_role(2)
+
+    assert manager._cache_role(1, 'user', token)
+
+
+def test_full_flush_during_read_is_not_overwritten(manager):
+    token = manager._begin_role_read()
+    manager.invalidate_role()
+
+    assert not manager._cache_role(1, 'user', token)
+
+
+def test_read_started_after_invalidation_is_cached(manager):
+    manager.invalidate_role(1)
+    token = manager._begin_role_read()
+
+    assert manager._cache_role(1, 'admin', token)
+
+
+def test_versions_are_pruned_without_losing_recent_invalidations(manager, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(auth_manager.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(auth_manager, 'ROLE_CACHE_SIZE', 3)
+
+    for user_id in range(3):
+        manager.invalidate_role(user_id)
+    token = manager._begin_role_read()
+    clock[0] += auth_manager.ROLE_CACHE_TTL + 1
+    manager.invalidate_role(10)
+
+    # Старые записи удалены, свежая осталась
+    assert set(manager._role_invalidated) == {10}
+    # Чтение старше TTL в кэш не попадает, даже если его записи уже удалены
+    assert not manager._cache_role(0, 'user', token)
@@ -0,0 +1,66 @@
+"""
+Тесты token bucket очереди отправки (без Telegram и базы данных)
+"""
+
+import pytest
+
+import send_queue
+from send_queue import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(send_queue.time, 'monotonic', fake)
+    return fake
+
+
+def test_burst_then_delay(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        assert bucket.delay() == 0
+        bucket.take()
+    # Токен появится через 1 / rate секунд
+    assert bucket.delay() == pytest.approx(0.5)
+
+
+def test_refill_is_capped_by_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.take()
+    bucket.take()
+    clock.now += 100
+    assert bucket.delay() == 0
+    assert bucket.tokens == 2
+    assert bucket.is_idle()
+
+
+def test_reserve_spaces_waiters_by_rate(clock):
+    bucket = TokenBucket(rate=10, capacity=1)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits == pytest.approx([0, 0.1, 0.2, 0.3])
+
+
+def test_block_overrides_available_tokens(clock):
+    bucket = TokenBucket(rate=1, capacity=5)
+    bucket.block(30)
+    assert bucket.delay() == pytest.approx(30)
+    assert bucket.reserve() == pytest.approx(30)
+    assert not bucket.is_idle()
+
+    clock.now += 30
+    assert bucket.delay() == 0
+
+
+def test_block_keeps_the_longest_pause(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.block(30)
+    bucket.block(5)
+    assert bucket.delay() == pytest.approx(30)
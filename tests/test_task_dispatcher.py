@@ -0,0 +1,153 @@
+"""
+Тесты кучи диспетчера задач: снятие наступивших запусков (без базы данных)
+"""
+
+from datetime import datetime, timedelta
+
+from task_dispatcher import TaskDispatcher
+from task_models import TaskData
+
+
+async def _execute(task_id, task_data):
+    pass
+
+
+def make_task(times=('10:00',), misfire_policy='once'):
+    """Ежедневная задача на указанное время"""
+    task = TaskData()
+    task.schedule.schedule_type = 'week_days'
+    task.schedule.week_days = list(range(7))
+    task.schedule.times = list(times)
+    task.schedule.misfire_policy = misfire_policy
+    return task
+
+
+def make_dispatcher():
+    return TaskDispatcher(_execute, horizon=timedelta(days=2))
+
+
+MONDAY = datetime(2026, 10, 12)
+
+
+def test_pop_due_fires_and_reschedules_next_run():
+    dispatcher = make_dispatcher()
+    task = make_task()
+    fire_at = MONDAY.replace(hour=10)
+    dispatcher._push('t1', fire_at, task, False)
+
+    due, rescheduled = dispatcher._pop_due(fire_at + timedelta(seconds=1))
+
+    assert [(item[0], item[1], item[3], item[4]) for item in due] == [(fire_at, 't1', 1, False)]
+    assert rescheduled == [('t1', fire_at + timedelta(days=1))]
+    assert dispatcher.next_fire_time('t1') == fire_at + timedelta(days=1)
+
+
+def test_pop_due_leaves_future_entries():
+    dispatcher = make_dispatcher()
+    fire_at = MONDAY.replace(hour=10)
+    dispatcher._push('t1', fire_at, make_task(), False)
+
+    due, rescheduled = dispatcher._pop_due(fire_at - timedelta(minutes=1))
+
+    assert due == []
+    assert rescheduled == []
+    assert dispatcher.next_fire_time('t1') == fire_at
+
+
+def test_pop_due_skips_stale_heap_records():
+    dispatcher = make_dispatcher()
+    task = make_task()
+    first = MONDAY.replace(hour=10)
+    dispatcher._push('moved', first, task, False)
+    # Перепланирование оставляет в куче старую запись - она пропускается
+    dispatcher._push('moved', first + timedelta(hours=2), task, False)
+    dispatcher._push('removed', first, task, False)
+    dispatcher.unschedule('removed')
+
+    due, _ = dispatcher._pop_due(first + timedelta(minutes=1))
+
+    assert due == []
+    assert dispatcher.next_fire_time('moved') == first + timedelta(hours=2)
+    assert dispatcher.next_fire_time('removed') is None
+
+
+def test_pop_due_drops_one_shot_entries():
+    dispatcher = make_dispatcher()
+    fire_at = MONDAY.replace(hour=10)
+    dispatcher.schedule_once('test', make_task(), fire_at)
+
+    due, rescheduled = dispatcher._pop_due(fire_at)
+
+    assert [item[1] for item in due] == ['test']
+    assert rescheduled == []
+    assert dispatcher.next_fire_time('test') is None
+
+
+def test_pop_due_does_not_keep_runs_beyond_horizon():
+    dispatcher = TaskDispatcher(_execute, horizon=timedelta(hours=1))
+    fire_at = MONDAY.replace(hour=10)
+    dispatcher._push('t1', fire_at, make_task(), False)
+
+    due, rescheduled = dispatcher._pop_due(fire_at)
+
+    assert [item[1] for item in due] == ['t1']
+    # Следующий запуск (через сутки) запишется в базу, но в памяти не держится
+    assert rescheduled == [('t1', fire_at + timedelta(days=1))]
+    assert dispatcher.next_fire_time('t1') is None
+
+
+def test_pop_due_orders_by_fire_time():
+    dispatcher = make_dispatcher()
+    task = make_task(times=('09:00', '10:00', '11:00'))
+    for task_id, hour in (('c', 11), ('a', 9), ('b', 10)):
+        dispatcher._push(task_id, MONDAY.replace(hour=hour), task, False)
+
+    due, _ = dispatcher._pop_due(MONDAY.replace(hour=11, minute=1))
+
+    assert [item[1] for item in due] == ['a', 'b', 'c']
+
+
+# ===== ПРОПУЩЕННЫЕ ЗАПУСКИ =====
+
+def test_missed_runs_policies():
+    fire_at = MONDAY.replace(hour=10)
+    # Простой с понедельника до четверга 11:00: пропущены пн, вт, ср, чт
+    now = fire_at + timedelta(days=3, hours=1)
+
+    assert TaskDispatcher._missed_runs(make_task(misfire_policy='all'), fire_at, now) == 4
+    assert TaskDispatcher._missed_runs(make_task(misfire_policy='once'), fire_at, now) == 1
+    assert TaskDispatcher._missed_runs(make_task(misfire_policy='skip'), fire_at, now) == 0
+
+
+def test_missed_runs_all_is_capped(monkeypatch):
+    import task_dispatcher
+
+    monkeypatch.setattr(task_dispatcher, 'CATCHUP_MAX_RUNS', 3)
+    fire_at = MONDAY.replace(hour=10)
+    now = fire_at + timedelta(days=30)
+
+    assert TaskDispatcher._missed_runs(make_task(misfire_policy='all'), fire_at, now) == 3
+
+
+def test_missed_runs_unknown_policy_sends_once():
+    fire_at = MONDAY.replace(hour=10)
+    task = make_task()
+    task.schedule.misfire_policy = None
+
+    assert TaskDispatcher._missed_runs(task, fire_at, fire_at + timedelta(days=2)) == 1
+
+
+def test_pop_due_applies_misfire_policy_to_late_entries():
+    dispatcher = make_dispatcher()
+    fire_at = MONDAY.replace(hour=10)
+    now = fire_at + timedelta(days=1, hours=1)
+    dispatcher._push('all', fire_at, make_task(misfire_policy='all'), False)
+    dispatcher._push('skip', fire_at, make_task(misfire_policy='skip'), False)
+    dispatcher._push('on_time', now - timedelta(minutes=1), make_task(times=('10:59',)), False)
+
+    due, _ = dispatcher._pop_due(now)
+    runs = {item[1]: (item[3], item[4]) for item in due}
+
+    assert runs == {'all': (2, True), 'skip': (0, True), 'on_time': (1, False)}
+    # После догоняющих отправок задача снова идет по расписанию: со следующего запуска после now
+    assert dispatcher.next_fire_time('all') == fire_at + timedelta(days=2)